@@ -1,11 +1,19 @@
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for
+from flask import Flask, render_template, request, jsonify, flash, redirect, url_for, Response, stream_with_context, g
+import requests
 import os
 import pandas as pd
 from werkzeug.utils import secure_filename
 import json
 from mindsdb_handler import MindsDBHandler
+from cache import make_agent_key
+from metrics import REGISTRY, HTTP_REQUEST_SECONDS
+from upload_jobs import UploadJobManager, UPLOAD_MODES
+from ingest import read_csv_header, missing_columns, stream_to_file
+from text_extraction import DocumentExtractor, is_document_upload, extension, pdf_support
+from chunking import worker_pool
 import logging
 import time
+import uuid
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -19,13 +27,71 @@ app = Flask(__name__)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-key-change-in-production')
 app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
 app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB default
+# Only /api/upload accepts large bodies; CSVs are streamed to disk
+app.config['MAX_UPLOAD_LENGTH'] = int(os.getenv('MAX_UPLOAD_LENGTH', 2 * 1024 * 1024 * 1024))  # 2GB default
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Fork the chunking and extraction workers while this process has no other
+# threads: the handler and upload manager below start background threads
+pool_workers = max(int(os.getenv('CHUNK_WORKERS', 0)) or os.cpu_count() or 1,
+                   int(os.getenv('EXTRACT_WORKERS', 0)) or os.cpu_count() or 1)
+if pool_workers > 1:
+    worker_pool(pool_workers)
+
 # Initialize MindsDB handler
 mindsdb_handler = MindsDBHandler()
 
+# Build the category index in the background and keep it reconciled
+mindsdb_handler.category_index.start()
+
+# Poll scheduled job runs into the local job history
+mindsdb_handler.job_history.start()
+
+# Probe MindsDB, Ollama, pgvector and Gemini in the background for /api/status
+mindsdb_handler.health.start()
+
+# Background ingestion workers for uploads
+upload_jobs = UploadJobManager(
+    mindsdb_handler,
+    db_path=os.getenv('UPLOAD_JOB_DB', os.path.join(app.config['UPLOAD_FOLDER'], 'upload_jobs.db')),
+    workers=int(os.getenv('UPLOAD_WORKERS', 2)),
+    chunk_rows=int(os.getenv('INGEST_CHUNK_ROWS', 500)),
+    validation_limits={
+        'max_title_chars': int(os.getenv('MAX_TITLE_CHARS', 500)),
+        'max_category_chars': int(os.getenv('MAX_CATEGORY_CHARS', 100)),
+        'max_content_chars': int(os.getenv('MAX_DOCUMENT_CHARS', 1000000))
+    },
+    # Text extraction for PDF, TXT and zip uploads, on a process pool
+    extractor=DocumentExtractor(
+        workers=int(os.getenv('EXTRACT_WORKERS', 0)) or None,
+        max_member_bytes=int(os.getenv('MAX_EXTRACT_FILE_BYTES', 256 * 1024 * 1024)),
+        default_category=os.getenv('DEFAULT_DOCUMENT_CATEGORY', 'General')
+    )
+)
+
+UPLOAD_EXTENSIONS = ('csv', 'txt', 'pdf', 'zip')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Label by route pattern, not raw path, to keep the series count bounded
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint,
+                                     method=request.method, status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def index():
     """Main dashboard page"""
@@ -59,12 +125,20 @@ def api_search():
         query = data.get('query', '').strip()
         category = data.get('category', '').strip()
         limit = data.get('limit', 5)
+        mode = data.get('mode', 'semantic')
+        rerank = data.get('rerank') or mindsdb_handler.rerank_mode
         
         if not query:
             return jsonify({'error': 'Query is required'}), 400
         
+        if mode not in mindsdb_handler.SEARCH_MODES:
+            return jsonify({'error': f'Mode must be one of: {", ".join(mindsdb_handler.SEARCH_MODES)}'}), 400
+        
+        if rerank not in mindsdb_handler.RERANK_MODES:
+            return jsonify({'error': f'Rerank must be one of: {", ".join(mindsdb_handler.RERANK_MODES)}'}), 400
+        
         # Perform semantic search
-        results = mindsdb_handler.semantic_search(query, category, limit)
+        results = mindsdb_handler.semantic_search(query, category, limit, mode=mode, rerank=rerank)
         
         # Get the last executed query for transparency
         last_queries = mindsdb_handler.get_last_queries(1)
@@ -74,6 +148,9 @@ def api_search():
             'results': results,
             'query': query,
             'category': category if category else 'All Categories',
+            'mode': mode,
+            'rerank': rerank,
+            'reranked': any(result.get('reranked') for result in results),
             'executed_query': last_queries[0] if last_queries else None
         })
         
@@ -81,6 +158,52 @@ def api_search():
         logger.error(f"Search API error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/search/batch', methods=['POST'])
+def api_search_batch():
+    """API endpoint for many semantic searches in one request"""
+    try:
+        data = request.get_json()
+        queries = data.get('queries', [])
+        max_queries = int(os.getenv('SEARCH_BATCH_MAX_QUERIES', 500))
+        
+        if not queries:
+            return jsonify({'error': 'At least one query is required'}), 400
+        if len(queries) > max_queries:
+            return jsonify({'error': f'At most {max_queries} queries are allowed per batch'}), 400
+        
+        searches = []
+        for item in queries:
+            if isinstance(item, str):
+                item = {'query': item}
+            query = (item.get('query') or '').strip()
+            if not query:
+                return jsonify({'error': 'Every batch entry needs a query'}), 400
+            mode = item.get('mode', data.get('mode', 'semantic'))
+            if mode not in mindsdb_handler.SEARCH_MODES:
+                return jsonify({'error': f'Mode must be one of: {", ".join(mindsdb_handler.SEARCH_MODES)}'}), 400
+            rerank = item.get('rerank', data.get('rerank')) or mindsdb_handler.rerank_mode
+            if rerank not in mindsdb_handler.RERANK_MODES:
+                return jsonify({'error': f'Rerank must be one of: {", ".join(mindsdb_handler.RERANK_MODES)}'}), 400
+            searches.append({
+                'query': query,
+                'category': (item.get('category') or data.get('category') or '').strip(),
+                'limit': item.get('limit', data.get('limit', 5)),
+                'mode': mode,
+                'rerank': rerank
+            })
+        
+        batch = mindsdb_handler.semantic_search_batch(searches)
+        
+        return jsonify({
+            'success': True,
+            'count': len(searches),
+            **batch
+        })
+        
+    except Exception as e:
+        logger.error(f"Batch search API error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/agent', methods=['POST'])
 def api_agent():
     """API endpoint for AI agent queries"""
@@ -90,8 +213,8 @@ def api_agent():
         
         if not question:
             return jsonify({'error': 'Question is required'}), 400
-          # Get AI agent response
-        response = mindsdb_handler.ask_agent(question)
+        # Get AI agent response, served from the answer cache when possible
+        response, source = mindsdb_handler.ask_agent_cached(question)
         
         # Get the last executed query for transparency
         last_queries = mindsdb_handler.get_last_queries(1)
@@ -100,6 +223,8 @@ def api_agent():
             'success': True,
             'answer': response,
             'question': question,
+            'cached': source == 'cache',
+            'source': source,
             'executed_query': last_queries[0] if last_queries else None
         })
         
@@ -107,64 +232,165 @@ def api_agent():
         logger.error(f"Agent API error: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/upload', methods=['POST'])
-def api_upload():
-    """API endpoint for file upload"""
+def sse_event(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/agent/stream', methods=['GET', 'POST'])
+def api_agent_stream():
+    """API endpoint streaming agent answers and citations over Server-Sent Events"""
+    if request.method == 'POST':
+        question = ((request.get_json(silent=True) or {}).get('question') or '').strip()
+    else:
+        question = request.args.get('question', '').strip()
+    
+    if not question:
+        return jsonify({'error': 'Question is required'}), 400
+    
+    citation_limit = int(os.getenv('AGENT_STREAM_CITATIONS', 3))
+    
+    def generate():
+        # Sent at once so the client sees the first byte immediately
+        yield sse_event('start', {'question': question})
+        
+        try:
+            results = mindsdb_handler.semantic_search(question, limit=citation_limit, rerank='off')
+            yield sse_event('citations', {'results': results})
+        except Exception as e:
+            logger.warning(f"Citation search for streamed answer failed: {e}")
+        
+        try:
+            hit, answer = mindsdb_handler.agent_cache.get(make_agent_key(question))
+            if hit:
+                yield sse_event('answer', {'text': answer})
+                yield sse_event('done', {'cached': True, 'source': 'cache'})
+                return
+            
+            # Flask closes this generator when the client disconnects; closing the
+            # agent stream in turn cancels the upstream completion
+            stream = mindsdb_handler.stream_agent(question)
+            try:
+                for text in stream:
+                    yield sse_event('answer', {'text': text})
+            finally:
+                stream.close()
+            yield sse_event('done', {'cached': False, 'source': 'agent'})
+        except GeneratorExit:
+            logger.info("Client disconnected, agent stream cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Agent stream error: {e}")
+            yield sse_event('agent_error', {'error': str(e)})
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/agent/cache', methods=['DELETE'])
+def api_agent_cache_purge():
+    """API endpoint to purge cached agent answers (one question or all)"""
     try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file selected'}), 400
+        data = request.get_json(silent=True) or {}
+        question = (data.get('question') or request.args.get('question', '')).strip()
         
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+        mindsdb_handler.purge_agent_cache(question or None)
         
-        if not file.filename.endswith('.csv'):
-            return jsonify({'error': 'Only CSV files are allowed'}), 400
+        return jsonify({
+            'success': True,
+            'message': f'Purged cached answer for "{question}"' if question else 'Purged all cached answers'
+        })
+    except Exception as e:
+        logger.error(f"Agent cache purge API error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/upload', methods=['POST'])
+def api_upload():
+    """API endpoint for file upload; ingestion runs as a background job.
+    
+    Accepts either a multipart form with a ``file`` field or a raw ``text/csv``
+    request body (``?filename=`` names it), which is streamed to disk in blocks.
+    Besides CSVs, the file can be a PDF, a text file or a zip archive of them;
+    their text is extracted into documents (``category`` sets the category of
+    files outside an archive folder).
+    ``mode=delta`` re-ingests only documents that changed since the last upload;
+    ``mode=validate`` only reports the rows that would be rejected.
+    """
+    request.max_content_length = app.config['MAX_UPLOAD_LENGTH']
+    try:
+        mode = request.args.get('mode', 'full')
+        category = request.args.get('category')
+        if request.mimetype == 'text/csv':
+            filename = secure_filename(request.args.get('filename', 'upload.csv'))
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
+            stream_to_file(request.stream, filepath)
+        else:
+            if 'file' not in request.files:
+                return jsonify({'error': 'No file selected'}), 400
+            
+            file = request.files['file']
+            if file.filename == '':
+                return jsonify({'error': 'No file selected'}), 400
+            
+            if extension(file.filename) not in UPLOAD_EXTENSIONS:
+                return jsonify({'error': 'Only CSV, PDF, TXT and ZIP files are allowed'}), 400
+            if extension(file.filename) == 'pdf' and not pdf_support():
+                return jsonify({'error': 'PDF uploads need the pypdf package on the server'}), 400
+            
+            # Save uploaded file under a unique name so concurrent uploads don't collide
+            filename = secure_filename(file.filename)
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
+            file.save(filepath)
+            mode = request.form.get('mode', mode)
+            category = request.form.get('category', category)
         
-        # Save uploaded file
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        if mode not in UPLOAD_MODES:
+            os.remove(filepath)
+            return jsonify({'error': 'Mode must be "full", "delta" or "validate"'}), 400
         
-        # Process CSV and insert into knowledge base
         try:
-            df = pd.read_csv(filepath)
-            
-            # Validate CSV structure
-            required_columns = ['doc_id', 'title', 'category', 'content']
-            missing_columns = [col for col in required_columns if col not in df.columns]
+            # Validate CSV structure from the header only; documents are checked as they're extracted
+            missing = [] if is_document_upload(filename) else missing_columns(read_csv_header(filepath))
             
-            if missing_columns:
+            if missing:
                 os.remove(filepath)  # Clean up
                 return jsonify({
-                    'error': f'CSV missing required columns: {", ".join(missing_columns)}'
+                    'error': f'CSV missing required columns: {", ".join(missing)}'
                 }), 400
-              # Insert data into knowledge base
-            inserted_count = mindsdb_handler.insert_documents(df)
-            
-            # Get sample queries for transparency
-            sample_queries = mindsdb_handler.get_last_queries(3)
-            
-            # Clean up uploaded file
-            os.remove(filepath)
-            
-            return jsonify({
-                'success': True,
-                'message': f'Successfully inserted {inserted_count} documents into knowledge base',
-                'inserted_count': inserted_count,
-                'sample_queries': sample_queries
-            })
-            
         except Exception as e:
             # Clean up on error
             if os.path.exists(filepath):
                 os.remove(filepath)
             raise e
         
+        # Hand the insert work to the ingestion worker pool
+        job_id = upload_jobs.submit(filepath, filename, mode, category=category or None)
+        
+        return jsonify({
+            'success': True,
+            'message': f'Upload accepted, ingesting {filename} in the background',
+            'job_id': job_id,
+            'status_url': url_for('api_upload_status', job_id=job_id)
+        }), 202
+        
     except Exception as e:
         logger.error(f"Upload API error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/upload/<job_id>')
+def api_upload_status(job_id):
+    """API endpoint for background ingestion progress"""
+    try:
+        job = upload_jobs.get(job_id)
+        if job is None:
+            return jsonify({'error': f'Upload job "{job_id}" not found'}), 404
+        
+        job['sample_queries'] = mindsdb_handler.get_last_queries(3)
+        return jsonify({'success': True, 'job': job})
+    except Exception as e:
+        logger.error(f"Upload status API error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/status')
 def api_status():
     """API endpoint to check system status"""
@@ -177,17 +403,95 @@ def api_status():
 
 @app.route('/api/categories')
 def api_categories():
-    """API endpoint to get available categories"""
+    """API endpoint to get available categories, served from the in-memory index"""
     try:
-        categories = mindsdb_handler.get_categories()
-        return jsonify({
+        category_index = mindsdb_handler.category_index
+        category_index.ensure_loaded()
+        
+        if not category_index.ready:
+            # MindsDB unreachable and nothing indexed yet
+            return jsonify({
+                'success': True,
+                'categories': mindsdb_handler.get_categories()
+            })
+        
+        categories, counts, etag = category_index.snapshot()
+        response = jsonify({
             'success': True,
-            'categories': categories
+            'categories': categories,
+            'counts': counts
         })
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
     except Exception as e:
         logger.error(f"Categories API error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/cache', methods=['GET'])
+def api_cache_stats():
+    """API endpoint for result cache statistics"""
+    try:
+        return jsonify({
+            'success': True,
+            'search': mindsdb_handler.search_cache.stats(),
+            'rerank': mindsdb_handler.rerank_cache.stats(),
+            'agent': dict(
+                mindsdb_handler.agent_cache.stats(),
+                coalesced=mindsdb_handler.agent_flight.coalesced,
+                in_flight=mindsdb_handler.agent_flight.in_flight()
+            ),
+            'embedding': mindsdb_handler.embedder.cache.stats()
+        })
+    except Exception as e:
+        logger.error(f"Cache stats API error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cache', methods=['DELETE'])
+def api_cache_clear():
+    """API endpoint to invalidate the search and agent caches"""
+    try:
+        mindsdb_handler.invalidate_caches()
+        return jsonify({'success': True, 'message': 'Search and agent caches cleared'})
+    except Exception as e:
+        logger.error(f"Cache clear API error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/ollama/api/embed', methods=['POST'])
+def ollama_embed_proxy():
+    """Ollama-compatible batch embedding endpoint served through the embedding cache"""
+    try:
+        data = request.get_json()
+        texts = data.get('input', [])
+        if isinstance(texts, str):
+            texts = [texts]
+        
+        vectors = mindsdb_handler.embedder.embed(texts, model=data.get('model'))
+        return jsonify({
+            'model': data.get('model') or mindsdb_handler.embedding_model,
+            'embeddings': [vector.tolist() for vector in vectors]
+        })
+    except requests.RequestException as e:
+        logger.error(f"Embedding proxy upstream error: {e}")
+        return jsonify({'error': f'Ollama request failed: {e}'}), 502
+    except Exception as e:
+        logger.error(f"Embedding proxy error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/ollama/api/embeddings', methods=['POST'])
+def ollama_embeddings_proxy():
+    """Legacy single-prompt Ollama embedding endpoint served through the embedding cache"""
+    try:
+        data = request.get_json()
+        vector = mindsdb_handler.embedder.embed([data.get('prompt', '')], model=data.get('model'))[0]
+        return jsonify({'embedding': vector.tolist()})
+    except requests.RequestException as e:
+        logger.error(f"Embedding proxy upstream error: {e}")
+        return jsonify({'error': f'Ollama request failed: {e}'}), 502
+    except Exception as e:
+        logger.error(f"Embedding proxy error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/initialize', methods=['POST'])
 def api_initialize():
     """API endpoint to initialize knowledge base and agent"""
@@ -202,7 +506,7 @@ def api_initialize():
 def api_get_jobs():
     """API endpoint to get list of jobs"""
     try:
-        jobs = mindsdb_handler.list_jobs()
+        jobs = mindsdb_handler.list_jobs(refresh=request.args.get('refresh') == '1')
         return jsonify({'success': True, 'jobs': jobs})
     except Exception as e:
         logger.error(f"Get jobs API error: {e}")
@@ -258,7 +562,7 @@ def api_delete_job(job_id):
     """API endpoint to stop/delete a job"""
     try:
         # Extract job name from job_id (assuming format job_name or similar)
-        job_name = job_id.replace('job_', '') if job_id.startswith('job_') else job_id
+        job_name = job_id.removeprefix('job_')
         
         result = mindsdb_handler.stop_job(job_name)
         
@@ -278,6 +582,23 @@ def api_delete_job(job_id):
         logger.error(f"Delete job API error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs/<job_id>/runs', methods=['GET'])
+def api_job_runs(job_id):
+    """API endpoint for a job's run history, run-time statistics, trend and alerts"""
+    try:
+        job_name = job_id.removeprefix('job_')
+        if job_name.startswith('legalease.'):
+            job_name = job_name.split('.', 1)[1]
+        limit = request.args.get('limit', 50, type=int)
+        if not 1 <= limit <= 1000:
+            return jsonify({'error': 'limit must be between 1 and 1000'}), 400
+        
+        report = mindsdb_handler.get_job_runs(job_name, limit=limit, refresh=request.args.get('refresh') == '1')
+        return jsonify(dict(report, success=True, job=job_name))
+    except Exception as e:
+        logger.error(f"Job runs API error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.errorhandler(404)
 def not_found(error):
     return render_template('404.html'), 404
@@ -0,0 +1,332 @@
+"""
+LegalEase AI asyncio serving mode for the read-only API endpoints.
+
+Serves /api/search, /api/agent, /api/status and /api/categories with async
+HTTP calls to MindsDB and Ollama, so one process can hold hundreds of
+in-flight requests to slow LLM calls. Run it next to the Flask app, e.g.::
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5001
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import time
+
+import httpx
+import pandas as pd
+from dotenv import load_dotenv
+
+from cache import make_search_key, make_agent_key, make_rerank_key
+from mindsdb_handler import MindsDBHandler
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamTimeout(Exception):
+    """Raised when an upstream call exceeds its deadline"""
+
+
+class AsyncUpstream:
+    """Async HTTP client for one upstream with a concurrency limit and timeout"""
+
+    def __init__(self, name, base_url, concurrency, timeout):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.semaphore = None
+        self.client = None
+
+    async def start(self):
+        # Created inside the running loop so the semaphore binds to it
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+
+    async def request(self, method, path, timeout=None, **kwargs):
+        """Send a request, waiting for a concurrency slot within the same deadline"""
+        timeout = timeout or self.timeout
+        try:
+            return await asyncio.wait_for(self._request(method, path, timeout, **kwargs), timeout)
+        except asyncio.TimeoutError:
+            raise UpstreamTimeout(f"{self.name} did not respond within {timeout}s")
+
+    async def _request(self, method, path, timeout, **kwargs):
+        async with self.semaphore:
+            return await self.client.request(method, path, timeout=timeout, **kwargs)
+
+
+class AsyncMindsDB(AsyncUpstream):
+    """MindsDB HTTP SQL API client"""
+
+    async def query(self, sql, timeout=None):
+        """Run a SQL statement and return the result as a DataFrame"""
+        response = await self.request('POST', '/api/sql/query', timeout=timeout, json={'query': sql})
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get('type') == 'error':
+            raise Exception(payload.get('error_message', 'MindsDB query failed'))
+        return pd.DataFrame(payload.get('data') or [], columns=payload.get('column_names') or None)
+
+
+class AsyncLegalEase:
+    """Async implementations of the read-only LegalEase API operations"""
+
+    def __init__(self):
+        # Shares SQL builders and result caches with the Flask handler
+        self.handler = MindsDBHandler()
+        self.mindsdb = AsyncMindsDB(
+            'mindsdb',
+            f'http://{self.handler.mindsdb_host}:{self.handler.mindsdb_port}',
+            concurrency=int(os.getenv('ASYNC_MINDSDB_CONCURRENCY', 64)),
+            timeout=self.handler.query_timeout
+        )
+        self._agent_calls = {}
+
+    async def start(self):
+        await self.mindsdb.start()
+        self.handler.category_index.start()
+        self.handler.health.start()
+
+    async def close(self):
+        await self.mindsdb.close()
+
+    async def _cache_get(self, cache, key):
+        # Persistent stores do blocking I/O, keep it off the event loop
+        if cache.store is not None:
+            return await asyncio.get_running_loop().run_in_executor(None, cache.get, key)
+        return cache.get(key)
+
+    async def _cache_set(self, cache, key, value):
+        if cache.store is not None:
+            await asyncio.get_running_loop().run_in_executor(None, cache.set, key, value)
+        else:
+            cache.set(key, value)
+
+    async def semantic_search(self, query, category=None, limit=5, mode='semantic', rerank=None):
+        rerank = rerank or self.handler.rerank_mode
+        if mode != 'semantic':
+            # Lexical and hybrid search run on the in-process BM25 index and are blocking
+            return await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(self.handler.semantic_search, query, category, limit,
+                                        mode=mode, rerank=rerank)
+            )
+        cache_key = make_search_key(query, category, limit, mode='semantic', rerank=rerank)
+        hit, results = await self._cache_get(self.handler.search_cache, cache_key)
+        if hit:
+            return results
+
+        if self.handler.search_backend == 'mindsdb':
+            results = await self._knowledge_base_search(query, category, limit, rerank)
+        else:
+            # Local and fallback backends are in-process and blocking
+            results = await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(self.handler._semantic_search, query, category, limit, rerank=rerank)
+            )
+        await self._cache_set(self.handler.search_cache, cache_key, results)
+        return results
+
+    async def _knowledge_base_search(self, query, category, limit, rerank):
+        """Async mirror of MindsDBHandler._knowledge_base_search sharing its rerank cache"""
+        handler = self.handler
+        kb_limit = handler.knowledge_base_limit(limit)
+        if rerank == 'off':
+            search_query = handler.build_search_query(query, category, kb_limit, reranking=False)
+            handler._log_query(search_query, "semantic_search")
+            results = handler.parse_search_results(await self.mindsdb.query(search_query))
+            return handler.mark_reranked(handler.resolve_chunks(results, limit), False)
+
+        pool_query = handler.build_search_query(query, category, max(kb_limit, handler.rerank_candidates),
+                                                reranking=False)
+        handler._log_query(pool_query, "semantic_search")
+        candidates = handler.parse_search_results(await self.mindsdb.query(pool_query))
+        if not handler.needs_rerank(candidates, limit, rerank):
+            return handler.mark_reranked(handler.resolve_chunks(candidates, limit), False)
+
+        cache_key = make_rerank_key(query, [result['id'] for result in candidates], limit)
+        hit, results = await self._cache_get(handler.rerank_cache, cache_key)
+        if not hit:
+            rerank_query = handler.build_rerank_query(query, candidates, kb_limit)
+            handler._log_query(rerank_query, "rerank")
+            results = handler.parse_search_results(await self.mindsdb.query(rerank_query))
+            await self._cache_set(handler.rerank_cache, cache_key, results)
+        return handler.mark_reranked(handler.resolve_chunks(results, limit), True)
+
+    async def ask_agent(self, question):
+        """Ask the agent, sharing one upstream call between identical in-flight questions"""
+        cache_key = make_agent_key(question)
+        hit, answer = await self._cache_get(self.handler.agent_cache, cache_key)
+        if hit:
+            return answer, 'cache'
+
+        pending = self._agent_calls.get(cache_key)
+        if pending is not None:
+            return await asyncio.shield(pending), 'coalesced'
+
+        task = asyncio.ensure_future(self._ask_agent(question, cache_key))
+        self._agent_calls[cache_key] = task
+        task.add_done_callback(lambda _: self._agent_calls.pop(cache_key, None))
+        return await asyncio.shield(task), 'agent'
+
+    async def _ask_agent(self, question, cache_key):
+        agent_query = self.handler.build_agent_query(question)
+        self.handler._log_query(agent_query, "ask_agent")
+        df = await self.mindsdb.query(agent_query, timeout=self.handler.agent_timeout)
+        if df.empty:
+            return self.handler.NO_ANSWER
+        answer = df.iloc[0]['answer']
+        await self._cache_set(self.handler.agent_cache, cache_key, answer)
+        return answer
+
+    async def get_categories(self):
+        category_index = self.handler.category_index
+        if category_index.ready:
+            return category_index.snapshot()[0]
+        try:
+            df = await self.mindsdb.query(self.handler.CATEGORY_QUERY)
+            return [row['category'] for _, row in df.iterrows() if row['category']]
+        except Exception as e:
+            logger.warning(f"Could not fetch categories: {e}")
+            return list(self.handler.DEFAULT_CATEGORIES)
+
+    async def check_status(self):
+        """Last health monitor snapshot; the probes run in the background, not per request"""
+        # Only the very first call can wait on a health check; keep it off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self.handler.check_status)
+
+
+service = AsyncLegalEase()
+
+
+async def read_json(receive):
+    """Read and decode a JSON request body"""
+    body = b''
+    more = True
+    while more:
+        message = await receive()
+        body += message.get('body', b'')
+        more = message.get('more_body', False)
+    return json.loads(body or b'{}')
+
+
+async def send_json(send, payload, status=200):
+    """Send a JSON response"""
+    body = json.dumps(payload, default=str).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def api_search(receive):
+    data = await read_json(receive)
+    query = (data.get('query') or '').strip()
+    category = (data.get('category') or '').strip()
+    limit = data.get('limit', 5)
+    mode = data.get('mode', 'semantic')
+    rerank = data.get('rerank') or service.handler.rerank_mode
+
+    if not query:
+        return {'error': 'Query is required'}, 400
+
+    if mode not in service.handler.SEARCH_MODES:
+        return {'error': f'Mode must be one of: {", ".join(service.handler.SEARCH_MODES)}'}, 400
+
+    if rerank not in service.handler.RERANK_MODES:
+        return {'error': f'Rerank must be one of: {", ".join(service.handler.RERANK_MODES)}'}, 400
+
+    results = await service.semantic_search(query, category, limit, mode=mode, rerank=rerank)
+    last_queries = service.handler.get_last_queries(1)
+    return {
+        'success': True,
+        'results': results,
+        'query': query,
+        'category': category if category else 'All Categories',
+        'mode': mode,
+        'rerank': rerank,
+        'reranked': any(result.get('reranked') for result in results),
+        'executed_query': last_queries[0] if last_queries else None
+    }, 200
+
+
+async def api_agent(receive):
+    data = await read_json(receive)
+    question = (data.get('question') or '').strip()
+
+    if not question:
+        return {'error': 'Question is required'}, 400
+
+    answer, source = await service.ask_agent(question)
+    last_queries = service.handler.get_last_queries(1)
+    return {
+        'success': True,
+        'answer': answer,
+        'question': question,
+        'cached': source == 'cache',
+        'source': source,
+        'executed_query': last_queries[0] if last_queries else None
+    }, 200
+
+
+async def api_status(receive):
+    return await service.check_status(), 200
+
+
+async def api_categories(receive):
+    return {'success': True, 'categories': await service.get_categories()}, 200
+
+
+ROUTES = {
+    ('POST', '/api/search'): api_search,
+    ('POST', '/api/agent'): api_agent,
+    ('GET', '/api/status'): api_status,
+    ('GET', '/api/categories'): api_categories,
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await service.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await service.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    route = ROUTES.get((scope['method'], scope['path'].rstrip('/') or '/'))
+    if route is None:
+        await send_json(send, {'error': 'Not found'}, 404)
+        return
+
+    started = time.time()
+    try:
+        payload, status = await route(receive)
+    except UpstreamTimeout as e:
+        logger.error(f"{scope['path']} upstream timeout: {e}")
+        payload, status = {'error': str(e)}, 504
+    except Exception as e:
+        logger.error(f"{scope['path']} API error: {e}")
+        payload, status = {'error': str(e)}, 500
+    logger.debug(f"{scope['method']} {scope['path']} {status} in {time.time() - started:.3f}s")
+    await send_json(send, payload, status)
@@ -0,0 +1,3 @@
+"""
+LegalEase AI benchmark suite: fake MindsDB/Ollama servers, corpus generators and scenarios
+"""
@@ -0,0 +1,84 @@
+"""
+Synthetic legal corpus generators for benchmarks
+"""
+import numpy as np
+import pandas as pd
+
+CATEGORIES = ('Criminal Law', 'Civil Rights', 'Constitutional Law', 'Contract Law', 'Corporate Law')
+
+PARTIES = (
+    'Smith', 'Johnson', 'Miller', 'Garcia', 'Brown', 'Davis', 'Wilson', 'Moore', 'Taylor', 'Anderson',
+    'Thomas', 'Jackson', 'White', 'Harris', 'Martin', 'Thompson', 'Lee', 'Walker', 'Hall', 'Allen',
+    'United States', 'State', 'Board of Education', 'City Council', 'Acme Corp', 'Federal Trade Commission'
+)
+
+VOCABULARY = {
+    'Criminal Law': ('defendant', 'prosecution', 'miranda', 'custodial', 'interrogation', 'suppression', 'evidence',
+                     'warrant', 'search', 'seizure', 'counsel', 'indictment', 'sentencing', 'jury', 'verdict'),
+    'Civil Rights': ('discrimination', 'equal', 'protection', 'segregation', 'voting', 'speech', 'assembly',
+                     'petition', 'remedy', 'injunction', 'damages', 'section', 'statute', 'plaintiff', 'class'),
+    'Constitutional Law': ('amendment', 'clause', 'commerce', 'due', 'process', 'federalism', 'separation',
+                           'powers', 'judicial', 'review', 'executive', 'congress', 'sovereignty', 'treaty', 'tax'),
+    'Contract Law': ('offer', 'acceptance', 'consideration', 'breach', 'damages', 'performance', 'warranty',
+                     'rescission', 'estoppel', 'parol', 'evidence', 'covenant', 'merger', 'clause', 'remedy'),
+    'Corporate Law': ('shareholder', 'fiduciary', 'duty', 'merger', 'acquisition', 'derivative', 'board',
+                      'directors', 'business', 'judgment', 'securities', 'disclosure', 'insider', 'trading', 'veil')
+}
+COMMON_WORDS = ('the', 'court', 'held', 'that', 'and', 'of', 'in', 'a', 'to', 'was', 'appeal', 'opinion',
+                'reversed', 'affirmed', 'remanded', 'argued', 'decided', 'majority', 'dissent', 'holding')
+
+
+def generate_corpus(count, seed=0, start_id=1, words_per_doc=(80, 400)):
+    """Return a DataFrame of ``count`` synthetic cases with doc_id, title, category, content"""
+    rng = np.random.default_rng(seed)
+    categories = rng.choice(len(CATEGORIES), size=count)
+    plaintiffs = rng.choice(len(PARTIES), size=count)
+    defendants = rng.choice(len(PARTIES), size=count)
+    lengths = rng.integers(words_per_doc[0], words_per_doc[1], size=count)
+
+    common = np.array(COMMON_WORDS)
+    titles, contents = [], []
+    for i in range(count):
+        category = CATEGORIES[categories[i]]
+        titles.append(f"{PARTIES[plaintiffs[i]]} v. {PARTIES[defendants[i]]} ({1900 + (start_id + i) % 125})")
+        topical = np.array(VOCABULARY[category])
+        # Roughly one topical word in three, the rest filler
+        words = np.where(rng.random(lengths[i]) < 0.35,
+                         topical[rng.integers(len(topical), size=lengths[i])],
+                         common[rng.integers(len(common), size=lengths[i])])
+        contents.append(' '.join(words).capitalize() + '.')
+
+    return pd.DataFrame({
+        'doc_id': np.arange(start_id, start_id + count),
+        'title': titles,
+        'category': [CATEGORIES[c] for c in categories],
+        'content': contents
+    })
+
+
+def iter_corpus(count, chunk_rows=10000, seed=0, **kwargs):
+    """Yield the corpus in DataFrame chunks so 1M-document runs stay in bounded memory"""
+    for offset in range(0, count, chunk_rows):
+        rows = min(chunk_rows, count - offset)
+        yield generate_corpus(rows, seed=seed + offset, start_id=offset + 1, **kwargs)
+
+
+def write_csv(path, count, chunk_rows=10000, seed=0):
+    """Write a corpus CSV in the upload format (doc_id, title, category, content)"""
+    for index, chunk in enumerate(iter_corpus(count, chunk_rows, seed)):
+        chunk.to_csv(path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+    return path
+
+
+def generate_queries(count, seed=0, repeat_ratio=0.0):
+    """Return search queries; ``repeat_ratio`` of them repeat earlier ones to exercise caches"""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(count):
+        if queries and rng.random() < repeat_ratio:
+            queries.append(queries[rng.integers(len(queries))])
+            continue
+        category = CATEGORIES[rng.integers(len(CATEGORIES))]
+        terms = rng.choice(VOCABULARY[category], size=rng.integers(2, 5), replace=False)
+        queries.append(' '.join(terms))
+    return queries
@@ -0,0 +1,366 @@
+"""
+Local stand-ins for the MindsDB HTTP API and the Ollama embedding API.
+
+Both servers speak just enough of the real protocols for ``mindsdb_sdk`` and
+``CachedEmbedder`` to work against them, and inject configurable latency and
+errors so benchmarks exercise retries, polling and tail behaviour.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+@dataclass
+class LatencyProfile:
+    """Injected latency and failures for one kind of upstream call (times in ms)"""
+    base_ms: float = 0.0
+    jitter_ms: float = 0.0
+    per_item_ms: float = 0.0
+    tail_prob: float = 0.0
+    tail_ms: float = 0.0
+    error_rate: float = 0.0
+
+    def delay(self, rng, items=1):
+        delay = self.base_ms + rng.uniform(0, self.jitter_ms) + self.per_item_ms * items
+        if self.tail_prob and rng.random() < self.tail_prob:
+            delay += self.tail_ms
+        return delay / 1000.0
+
+    def fails(self, rng):
+        return self.error_rate > 0 and rng.random() < self.error_rate
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 makes concurrent clients hit SYN retransmits
+    request_queue_size = 1024
+
+
+class _FakeServer:
+    """Threaded HTTP server running in the background on a free local port"""
+
+    handler_class = None
+
+    def __init__(self, host='127.0.0.1', port=0, seed=0):
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self._counter_lock = threading.Lock()
+        self.httpd = _HTTPServer((host, port), self.handler_class)
+        self.httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def simulate(self, profile, items=1):
+        """Sleep for the profile's latency; return True when this call should fail"""
+        with self._rng_lock:
+            delay = profile.delay(self._rng, items)
+            failed = profile.fails(self._rng)
+        with self._counter_lock:
+            self.requests += 1
+            self.errors += failed
+        if delay:
+            time.sleep(delay)
+        return failed
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def fail(self, mode):
+        """Fail the way a struggling upstream does: drop the connection or answer 503"""
+        if mode == 'drop':
+            self.close_connection = True
+            self.connection.close()
+        else:
+            self.send_json({'type': 'error', 'error_message': 'Service unavailable: injected failure'}, 503)
+
+
+# MindsDB ------------------------------------------------------------------------------
+
+LIMIT_PATTERN = re.compile(r'LIMIT\s+(\d+)', re.IGNORECASE)
+ID_LIST_PATTERN = re.compile(r"\bid IN \(([^)]*)\)", re.IGNORECASE)
+CATEGORY_PATTERN = re.compile(r"'\$\.category'\) = '((?:[^']|'')*)'")
+QUESTION_PATTERN = re.compile(r"question = '((?:[^']|'')*)'", re.IGNORECASE | re.DOTALL)
+INSERT_ROW_PATTERN = re.compile(r"\),\s*\(")
+
+JOB_PROBES = (
+    "SHOW JOBS FROM legalease;",
+    "SHOW JOBS;",
+    "SHOW JOBS FROM mindsdb;",
+    "SELECT * FROM legalease.information_schema.jobs;",
+    "SELECT * FROM information_schema.jobs;",
+    "SELECT * FROM mindsdb.information_schema.jobs;",
+    "SELECT * FROM mindsdb.jobs;",
+    "SHOW FULL JOBS;"
+)
+
+
+class FakeMindsDB(_FakeServer):
+    """Fake MindsDB: SQL over ``/api/sql/query`` plus the agent REST endpoints.
+
+    Knowledge base searches return synthetic rows drawn from ``documents`` ids,
+    inserts are acknowledged and counted, and only ``jobs_probe`` (an index into
+    ``JOB_PROBES``) succeeds among the job listing queries, mimicking MindsDB
+    versions that reject the earlier probes.
+    """
+
+    def __init__(self, documents=10000, categories=None, jobs=5, jobs_probe=4,
+                 search=None, insert=None, agent=None, other=None, agent_chunks=20,
+                 error_mode='http', **kwargs):
+        self.documents = documents
+        self.categories = list(categories or ('Criminal Law', 'Civil Rights', 'Constitutional Law',
+                                              'Contract Law', 'Corporate Law'))
+        self.jobs = jobs
+        self.jobs_probe = jobs_probe
+        self.profiles = {
+            'search': search or LatencyProfile(),
+            'insert': insert or LatencyProfile(),
+            'agent': agent or LatencyProfile(),
+            'other': other or LatencyProfile()
+        }
+        self.agent_chunks = agent_chunks
+        self.error_mode = error_mode
+        self.inserted_rows = 0
+        self.queries = {}
+        super().__init__(**kwargs)
+
+    def count(self, kind):
+        with self._counter_lock:
+            self.queries[kind] = self.queries.get(kind, 0) + 1
+
+    def execute(self, sql):
+        """Return ``(kind, response, items)`` for a SQL statement"""
+        text = ' '.join(sql.split())
+        upper = text.upper()
+
+        if upper.startswith('INSERT INTO'):
+            return 'insert', {'type': 'ok'}, len(INSERT_ROW_PATTERN.findall(text)) + 1
+        if 'LEGAL_GEMINI_AGENT' in upper and upper.startswith('SELECT'):
+            match = QUESTION_PATTERN.search(text)
+            question = match.group(1).replace("''", "'") if match else ''
+            return 'agent', self._table(['answer'], [[self.answer(question)]]), 1
+        if 'LEGAL_KB_PG' in upper and 'RELEVANCE' in upper:
+            return 'search', self._search(text), 1
+        if 'GROUP BY' in upper and 'CATEGORY' in upper:
+            share = max(1, self.documents // len(self.categories))
+            return 'other', self._table(['category', 'documents'], [[c, share] for c in self.categories]), 1
+        if 'DISTINCT' in upper and 'CATEGORY' in upper:
+            return 'other', self._table(['category'], [[c] for c in self.categories]), 1
+        if "TYPE='PROJECT'" in upper.replace(' ', ''):
+            return 'other', self._table(['NAME'], [['mindsdb'], ['legalease']]), 1
+        if upper in (probe.upper() for probe in JOB_PROBES):
+            if upper != JOB_PROBES[self.jobs_probe].upper():
+                return 'jobs', {'type': 'error', 'error_message': f"Unsupported statement: {text}"}, 1
+            return 'jobs', self._jobs(), 1
+        if upper.startswith('SELECT DATABASE()'):
+            return 'other', self._table(['database'], [['legalease']]), 1
+        if upper.startswith('SELECT 1'):
+            return 'other', self._table(['1'], [[1]]), 1
+        if upper.startswith('SELECT'):
+            return 'other', self._table(['result'], []), 1
+        return 'other', {'type': 'ok'}, 1
+
+    @staticmethod
+    def _table(columns, rows):
+        return {'type': 'table', 'column_names': columns, 'data': rows}
+
+    def _search(self, text):
+        limit = int(LIMIT_PATTERN.search(text).group(1)) if LIMIT_PATTERN.search(text) else 10
+        id_match = ID_LIST_PATTERN.search(text)
+        category = CATEGORY_PATTERN.search(text)
+        digest = int(hashlib.md5(text.encode('utf-8')).hexdigest(), 16)
+        rng = random.Random(digest)
+
+        if id_match:
+            ids = [item.strip().strip("'") for item in id_match.group(1).split(',')][:limit]
+        else:
+            ids = [str(rng.randrange(max(1, self.documents)) + 1) for _ in range(limit)]
+
+        rows = []
+        relevance = 0.9
+        for doc_id in ids:
+            relevance -= rng.uniform(0, 0.03)
+            doc_category = category.group(1).replace("''", "'") if category else rng.choice(self.categories)
+            rows.append([
+                doc_id,
+                json.dumps({'title': f'Case {doc_id}', 'category': doc_category}),
+                f'Synthetic excerpt for document {doc_id}.',
+                round(relevance, 6)
+            ])
+        return self._table(['id', 'metadata', 'chunk_content', 'relevance'], rows)
+
+    def _jobs(self):
+        rows = [
+            [f'job_{i}', 'legalease', 'every 1 hour', 'SELECT 1', 'active', '2024-01-01 00:00:00', '']
+            for i in range(self.jobs)
+        ]
+        return self._table(['NAME', 'PROJECT', 'SCHEDULE_STR', 'QUERY', 'STATUS', 'START_AT', 'NEXT_RUN_AT'], rows)
+
+    def answer(self, question):
+        return (f"Synthetic answer to '{question}'. " * 4).strip()
+
+    def answer_chunks(self, question):
+        words = self.answer(question).split(' ')
+        size = max(1, len(words) // self.agent_chunks)
+        return [' '.join(words[i:i + size]) + ' ' for i in range(0, len(words), size)]
+
+
+class _MindsDBHandler(_JSONHandler):
+    def do_GET(self):
+        fake = self.server.fake
+        if fake.simulate(fake.profiles['other']):
+            return self.fail(fake.error_mode)
+        parts = self.path.strip('/').split('/')
+        # /api/projects/<project>/agents/<name>
+        if len(parts) == 5 and parts[:2] == ['api', 'projects'] and parts[3] == 'agents':
+            return self.send_json({
+                'name': parts[4], 'created_at': '2024-01-01', 'updated_at': '2024-01-01',
+                'model_name': 'gemini-2.0-flash', 'provider': 'google', 'data': {}, 'params': {}
+            })
+        if self.path == '/api/status':
+            return self.send_json({'mindsdb_version': 'fake'})
+        self.send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        fake = self.server.fake
+        if self.path == '/api/sql/query':
+            sql = self.read_json().get('query', '')
+            kind, payload, items = fake.execute(sql)
+            fake.count(kind)
+            if fake.simulate(fake.profiles.get(kind, fake.profiles['other']), items):
+                return self.fail(fake.error_mode)
+            if kind == 'insert':
+                with fake._counter_lock:
+                    fake.inserted_rows += items
+            return self.send_json(payload)
+
+        if self.path.endswith('/completions/stream'):
+            messages = self.read_json().get('messages', [{}])
+            question = messages[-1].get('question', '')
+            fake.count('agent_stream')
+            profile = fake.profiles['agent']
+            chunks = fake.answer_chunks(question)
+            # The agent's total latency is spread over the streamed chunks
+            per_chunk = LatencyProfile(base_ms=profile.base_ms / max(1, len(chunks)))
+            if fake.simulate(LatencyProfile(error_rate=profile.error_rate)):
+                return self.fail(fake.error_mode)
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            try:
+                self._event({'type': 'start'})
+                for chunk in chunks:
+                    fake.simulate(per_chunk)
+                    self._event({'output': chunk})
+                self._event({'type': 'end'})
+            except (BrokenPipeError, ConnectionResetError):
+                fake.count('agent_stream_cancelled')
+            return
+
+        self.send_json({'error': 'not found'}, 404)
+
+    def _event(self, data):
+        self.wfile.write(f"data: {json.dumps(data)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+
+FakeMindsDB.handler_class = _MindsDBHandler
+
+
+# Ollama -------------------------------------------------------------------------------
+
+class FakeOllama(_FakeServer):
+    """Fake Ollama embedding API returning deterministic unit vectors per text"""
+
+    def __init__(self, dim=1024, embed=None, error_mode='http', **kwargs):
+        self.dim = dim
+        self.profile = embed or LatencyProfile()
+        self.error_mode = error_mode
+        self.embedded_texts = 0
+        super().__init__(**kwargs)
+
+    def vector(self, text):
+        seed = int(hashlib.sha256(text.encode('utf-8')).hexdigest()[:16], 16)
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+
+class _OllamaHandler(_JSONHandler):
+    def do_GET(self):
+        if self.path == '/api/tags':
+            return self.send_json({'models': [{'name': 'mxbai-embed-large:latest'}]})
+        self.send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        fake = self.server.fake
+        data = self.read_json()
+        if self.path == '/api/embed':
+            texts = data.get('input', [])
+            texts = [texts] if isinstance(texts, str) else texts
+        elif self.path == '/api/embeddings':
+            texts = [data.get('prompt', '')]
+        else:
+            return self.send_json({'error': 'not found'}, 404)
+
+        if fake.simulate(fake.profile, len(texts)):
+            return self.fail(fake.error_mode)
+        with fake._counter_lock:
+            fake.embedded_texts += len(texts)
+
+        vectors = [fake.vector(text) for text in texts]
+        if self.path == '/api/embed':
+            return self.send_json({'model': data.get('model'), 'embeddings': vectors})
+        self.send_json({'embedding': vectors[0]})
+
+
+FakeOllama.handler_class = _OllamaHandler
@@ -0,0 +1,215 @@
+"""
+Run the LegalEase AI benchmark suite against local fake upstreams.
+
+Example:
+    python -m benchmarks.run --docs 10000 --queries 500 --concurrency 16 --output bench.json
+    python -m benchmarks.run --baseline bench.json   # exits 1 on regressions
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import iter_corpus, generate_queries
+from benchmarks.fake_servers import FakeMindsDB, FakeOllama, LatencyProfile
+from benchmarks import scenarios
+
+SCENARIOS = ('ingest', 'search', 'hybrid_search', 'agent', 'agent_stream', 'jobs', 'app_search')
+
+# (metric, higher_is_better) pairs compared against a baseline run
+COMPARED_METRICS = (
+    ('p95_ms', False),
+    ('p99_ms', False),
+    ('docs_per_sec', True),
+    ('throughput_qps', True)
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--docs', type=int, default=10000, help='synthetic documents to ingest')
+    parser.add_argument('--chunk-rows', type=int, default=10000, help='corpus rows generated per chunk')
+    parser.add_argument('--queries', type=int, default=500, help='searches per search scenario')
+    parser.add_argument('--questions', type=int, default=50, help='agent questions per agent scenario')
+    parser.add_argument('--job-listings', type=int, default=20, help='list_jobs calls')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--repeat-ratio', type=float, default=0.2, help='share of repeated (cacheable) queries')
+    parser.add_argument('--search-ms', type=float, default=40.0, help='fake knowledge base search latency')
+    parser.add_argument('--insert-ms', type=float, default=50.0, help='fake INSERT base latency')
+    parser.add_argument('--insert-row-ms', type=float, default=0.5, help='fake INSERT latency per row')
+    parser.add_argument('--agent-ms', type=float, default=1500.0, help='fake agent answer latency')
+    parser.add_argument('--other-ms', type=float, default=5.0, help='fake latency of other statements')
+    parser.add_argument('--embed-ms', type=float, default=15.0, help='fake Ollama latency per request')
+    parser.add_argument('--jitter', type=float, default=0.25, help='uniform jitter as a fraction of base latency')
+    parser.add_argument('--tail-prob', type=float, default=0.01, help='probability of a tail-latency spike')
+    parser.add_argument('--tail-ms', type=float, default=500.0, help='extra latency of a spike')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='injected upstream failure rate')
+    parser.add_argument('--error-mode', choices=('http', 'drop'), default='http',
+                        help='answer 503 or drop the connection on injected failures')
+    parser.add_argument('--jobs-probe', type=int, default=4, help='index of the job listing query that works')
+    parser.add_argument('--search-backend', choices=('mindsdb', 'local', 'auto'), default='mindsdb',
+                        help='SEARCH_BACKEND for the handler; local benchmarks retrieval without MindsDB')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    return parser.parse_args(argv)
+
+
+def profile(args, base_ms, per_item_ms=0.0):
+    return LatencyProfile(base_ms=base_ms, jitter_ms=base_ms * args.jitter, per_item_ms=per_item_ms,
+                          tail_prob=args.tail_prob, tail_ms=args.tail_ms, error_rate=args.error_rate)
+
+
+def configure_environment(workdir, mindsdb, ollama, search_backend='mindsdb'):
+    """Point the handler at the fakes and keep all local state in a scratch directory"""
+    os.environ.update({
+        'MINDSDB_HOST': '127.0.0.1',
+        'MINDSDB_PORT': str(mindsdb.port),
+        'OLLAMA_BASE_URL': ollama.url,
+        'EMBEDDING_PROXY_URL': '',
+        'EMBEDDING_CACHE_DIR': os.path.join(workdir, 'embeddings'),
+        'INGEST_MANIFEST_PATH': os.path.join(workdir, 'ingest_manifest.db'),
+        'LEXICAL_INDEX_PATH': os.path.join(workdir, 'lexical_index.pkl'),
+        'VECTOR_STORE_DIR': os.path.join(workdir, 'vector_store'),
+        'JOB_HISTORY_PATH': os.path.join(workdir, 'job_history.db'),
+        'CHUNK_MAP_PATH': os.path.join(workdir, 'chunk_map.db'),
+        'GEMINI_HEALTH_URL': '',
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+        'UPLOAD_JOB_DB': os.path.join(workdir, 'upload_jobs.db'),
+        'SEARCH_CACHE_BACKEND': 'memory',
+        'SEARCH_BACKEND': search_backend,
+    })
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of metrics that regressed beyond ``tolerance`` relative to the baseline"""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS:
+            if metric not in current or not previous.get(metric):
+                continue
+            change = (current[metric] - previous[metric]) / previous[metric]
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append({
+                    'scenario': name,
+                    'metric': metric,
+                    'baseline': previous[metric],
+                    'current': current[metric],
+                    'change': round(change, 4)
+                })
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    selected = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # Handler warnings (e.g. rejected job probes) are expected noise here
+    logging.basicConfig(level=logging.ERROR)
+    workdir = tempfile.mkdtemp(prefix='legalease-bench-')
+
+    mindsdb = FakeMindsDB(
+        documents=max(args.docs, 1),
+        jobs_probe=args.jobs_probe,
+        search=profile(args, args.search_ms),
+        insert=profile(args, args.insert_ms, args.insert_row_ms),
+        agent=profile(args, args.agent_ms),
+        other=profile(args, args.other_ms),
+        error_mode=args.error_mode,
+        seed=args.seed
+    ).start()
+    ollama = FakeOllama(embed=profile(args, args.embed_ms), error_mode=args.error_mode, seed=args.seed).start()
+    configure_environment(workdir, mindsdb, ollama, args.search_backend)
+
+    # Imported after the environment is set: configuration is read at construction
+    from mindsdb_handler import MindsDBHandler
+    handler = MindsDBHandler()
+
+    queries = generate_queries(args.queries, seed=args.seed, repeat_ratio=args.repeat_ratio)
+    questions = [f"What did the court hold about {query}?"
+                 for query in generate_queries(args.questions, seed=args.seed + 1)]
+
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args)
+        },
+        'scenarios': {}
+    }
+
+    try:
+        for name in selected:
+            started = time.perf_counter()
+            if name == 'ingest':
+                result = scenarios.ingest_throughput(
+                    handler, iter_corpus(args.docs, chunk_rows=args.chunk_rows, seed=args.seed)
+                )
+            elif name == 'search':
+                result = scenarios.search_latency(handler, queries, args.concurrency)
+            elif name == 'hybrid_search':
+                result = scenarios.search_latency(handler, queries, args.concurrency, mode='hybrid')
+            elif name == 'agent':
+                result = scenarios.agent_latency(handler, questions, args.concurrency)
+            elif name == 'agent_stream':
+                result = scenarios.agent_latency(handler, questions, args.concurrency, stream=True)
+            elif name == 'jobs':
+                result = scenarios.job_listing(handler, args.job_listings)
+            else:
+                import app as flask_app
+                result = scenarios.app_search_latency(flask_app.app, queries, args.concurrency)
+            result['wall_s'] = round(time.perf_counter() - started, 3)
+            results['scenarios'][name] = result
+            print(f"{name}: {json.dumps(result)}", file=sys.stderr)
+    finally:
+        results['upstream'] = {
+            'mindsdb': {'requests': mindsdb.requests, 'errors': mindsdb.errors,
+                        'queries': mindsdb.queries, 'inserted_rows': mindsdb.inserted_rows},
+            'ollama': {'requests': ollama.requests, 'errors': ollama.errors,
+                       'embedded_texts': ollama.embedded_texts}
+        }
+        mindsdb.stop()
+        ollama.stop()
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as handle:
+            regressions = compare(results, json.load(handle), args.tolerance)
+        results['regressions'] = regressions
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(results, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output)
+    else:
+        print(output)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Benchmark scenarios run against a MindsDBHandler (or the Flask app) backed by fake upstreams
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def summarize(samples, errors=0):
+    """Latency summary in milliseconds for a list of durations in seconds"""
+    summary = {'count': len(samples), 'errors': errors}
+    if samples:
+        values = np.asarray(samples) * 1000.0
+        summary.update({
+            'mean_ms': round(float(values.mean()), 3),
+            'p50_ms': round(float(np.percentile(values, 50)), 3),
+            'p95_ms': round(float(np.percentile(values, 95)), 3),
+            'p99_ms': round(float(np.percentile(values, 99)), 3),
+            'max_ms': round(float(values.max()), 3)
+        })
+    return summary
+
+
+def run_concurrent(fn, items, concurrency):
+    """Call ``fn(item)`` for every item on ``concurrency`` threads.
+
+    Returns ``(latencies, errors, elapsed_seconds, results)``; failed calls
+    count as errors and are left out of the latencies.
+    """
+    def timed(item):
+        started = time.perf_counter()
+        try:
+            result = fn(item)
+        except Exception as e:
+            return None, e
+        return time.perf_counter() - started, result
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(timed, items))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in outcomes if latency is not None]
+    results = [result for latency, result in outcomes if latency is not None]
+    return latencies, len(outcomes) - len(latencies), elapsed, results
+
+
+def ingest_throughput(handler, chunks):
+    """Insert corpus chunks through ``insert_documents`` and report documents per second"""
+    batch_latencies = []
+    totals = {'documents': 0, 'inserted': 0, 'failed': 0}
+
+    started = time.perf_counter()
+    for chunk in chunks:
+        report = handler.insert_documents(chunk)
+        totals['documents'] += len(chunk)
+        totals['inserted'] += report['inserted']
+        totals['failed'] += report['failed']
+        batch_latencies.extend(batch['duration_ms'] / 1000.0 for batch in report['batches'])
+    elapsed = time.perf_counter() - started
+
+    return dict(
+        totals,
+        elapsed_s=round(elapsed, 3),
+        docs_per_sec=round(totals['inserted'] / elapsed, 1) if elapsed else 0.0,
+        batches=summarize(batch_latencies)
+    )
+
+
+def search_latency(handler, queries, concurrency, mode='semantic', rerank=None, limit=5):
+    """Concurrent ``semantic_search`` calls starting from cold result caches"""
+    handler.invalidate_caches()
+    before = handler.search_cache.stats()
+
+    latencies, errors, elapsed, _ = run_concurrent(
+        lambda query: handler.semantic_search(query, limit=limit, mode=mode, rerank=rerank),
+        queries, concurrency
+    )
+
+    after = handler.search_cache.stats()
+    hits = after['hits'] - before['hits']
+    return dict(
+        summarize(latencies, errors),
+        mode=mode,
+        rerank=rerank or handler.rerank_mode,
+        concurrency=concurrency,
+        throughput_qps=round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        cache_hit_ratio=round(hits / len(queries), 4) if queries else 0.0
+    )
+
+
+def agent_latency(handler, questions, concurrency, stream=False):
+    """Agent answers end to end; with ``stream`` also time to the first streamed chunk"""
+    handler.agent_cache.invalidate()
+    first_chunk = []
+
+    def ask(question):
+        if not stream:
+            return handler.ask_agent_cached(question)
+        started = time.perf_counter()
+        chunks = 0
+        for _ in handler.stream_agent(question):
+            if not chunks:
+                first_chunk.append(time.perf_counter() - started)
+            chunks += 1
+        return chunks
+
+    latencies, errors, elapsed, _ = run_concurrent(ask, questions, concurrency)
+    result = dict(summarize(latencies, errors), concurrency=concurrency, stream=stream)
+    if stream:
+        result['first_chunk'] = summarize(first_chunk)
+    return result
+
+
+def job_listing(handler, iterations):
+    """Sequential ``list_jobs`` calls; the first one (timed separately) detects the listing query"""
+    started = time.perf_counter()
+    handler.list_jobs(refresh=True)
+    first = time.perf_counter() - started
+
+    latencies, errors, _, results = run_concurrent(lambda _: handler.list_jobs(), range(iterations), 1)
+    return dict(summarize(latencies, errors), first_ms=round(first * 1000, 3),
+                jobs_found=len(results[-1]) if results else 0)
+
+
+def app_search_latency(flask_app, queries, concurrency, limit=5):
+    """Concurrent POST /api/search through the Flask app, including routing and JSON overhead"""
+    def search(query):
+        response = flask_app.test_client().post('/api/search', json={'query': query, 'limit': limit})
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/search returned {response.status_code}")
+        return response
+
+    latencies, errors, elapsed, _ = run_concurrent(search, queries, concurrency)
+    return dict(
+        summarize(latencies, errors),
+        concurrency=concurrency,
+        throughput_qps=round(len(latencies) / elapsed, 1) if elapsed else 0.0
+    )
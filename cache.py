@@ -0,0 +1,271 @@
+"""
+LegalEase AI result caches
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    """Normalize free text for use in a cache key"""
+    return ' '.join(str(text or '').lower().split())
+
+
+def make_search_key(query, category=None, limit=5, **options):
+    """Build the cache key for a semantic search; ``options`` are extra search settings"""
+    return json.dumps(['search', normalize_text(query), normalize_text(category), int(limit),
+                       sorted(options.items())])
+
+
+def make_rerank_key(query, candidate_ids, limit):
+    """Build the cache key for reranking a candidate set; candidate order does not matter"""
+    return json.dumps(['rerank', normalize_text(query), sorted(str(doc_id) for doc_id in candidate_ids), int(limit)])
+
+
+def make_agent_key(question):
+    """Build the cache key for an agent question"""
+    return json.dumps(['agent', normalize_text(question)])
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one upstream call"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Run ``fn`` once per key at a time; returns ``(result, shared)``"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        """Return the number of keys currently being fetched"""
+        with self._lock:
+            return len(self._calls)
+
+
+class SQLiteStore:
+    """File-backed persistence for cache entries, shared by processes on one host"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries (key TEXT PRIMARY KEY, expires_at REAL, value TEXT)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, time.time() + ttl, json.dumps(value, default=str))
+            )
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache_entries")
+
+
+class RedisStore:
+    """Persistence for cache entries in Redis or any server speaking its protocol"""
+
+    def __init__(self, url, prefix='legalease:cache:'):
+        import redis  # optional dependency, only needed for this backend
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.setex(self.prefix + key, max(1, int(ttl)), json.dumps(value, default=str))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+
+def create_store(backend, path=None, redis_url=None, prefix='legalease:cache:'):
+    """Create the optional persistence store for a cache backend name"""
+    backend = (backend or 'memory').lower()
+    try:
+        if backend == 'file':
+            return SQLiteStore(path)
+        if backend == 'redis':
+            return RedisStore(redis_url, prefix=prefix)
+    except Exception as e:
+        logger.warning(f"Cache backend '{backend}' unavailable, using memory only: {e}")
+    return None
+
+
+class LRUTTLCache:
+    """Thread-safe LRU cache with per-entry TTL, bounded by entry count and bytes.
+
+    An optional store (see ``create_store``) persists entries so they survive
+    restarts and can be shared between worker processes.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300, store=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.store = store
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """Return ``(hit, value)`` for a key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[2]
+                self._remove(key)
+
+        if self.store is not None:
+            try:
+                value = self.store.get(key)
+            except Exception as e:
+                logger.warning(f"Cache store read failed: {e}")
+                value = None
+            if value is not None:
+                self._put(key, value, self.ttl)
+                with self._lock:
+                    self.hits += 1
+                return True, value
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting least recently used entries to stay in bounds"""
+        ttl = self.ttl if ttl is None else ttl
+        self._put(key, value, ttl)
+        if self.store is not None:
+            try:
+                self.store.set(key, value, ttl)
+            except Exception as e:
+                logger.warning(f"Cache store write failed: {e}")
+
+    def _put(self, key, value, ttl):
+        size = len(key) + len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Remove a single entry"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+        if self.store is not None:
+            try:
+                self.store.delete(key)
+            except Exception as e:
+                logger.warning(f"Cache store delete failed: {e}")
+
+    def invalidate(self):
+        """Drop every entry, e.g. after the knowledge base changed"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+        if self.store is not None:
+            try:
+                self.store.clear()
+            except Exception as e:
+                logger.warning(f"Cache store clear failed: {e}")
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'persistent': self.store is not None
+            }
@@ -0,0 +1,92 @@
+"""
+LegalEase AI in-memory category index
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CategoryIndex:
+    """Per-category document counts served from memory.
+
+    Built once from MindsDB, kept current by ``apply_changes`` as documents
+    are inserted or deleted, and reconciled with MindsDB by a background
+    refresh every ``refresh_interval`` seconds to pick up scheduled job writes.
+    """
+
+    def __init__(self, loader, refresh_interval=600):
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self._counts = {}
+        self._etag = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.loaded_at = None
+
+    @property
+    def ready(self):
+        return self.loaded_at is not None
+
+    def _set_counts(self, counts):
+        with self._lock:
+            self._store(counts)
+
+    def _store(self, counts):
+        # Caller holds _lock
+        self._counts = {category: count for category, count in counts.items() if category and count}
+        self._etag = hashlib.sha1(json.dumps(sorted(self._counts.items())).encode('utf-8')).hexdigest()[:16]
+
+    def refresh(self):
+        """Reload counts from MindsDB; returns True on success"""
+        try:
+            counts = self.loader()
+        except Exception as e:
+            logger.warning(f"Category index refresh failed: {e}")
+            return False
+        self._set_counts(counts)
+        self.loaded_at = time.time()
+        logger.info(f"Category index refreshed with {len(counts)} categories")
+        return True
+
+    def ensure_loaded(self):
+        if not self.ready:
+            self.refresh()
+
+    def apply_changes(self, added=(), removed=()):
+        """Adjust counts for inserted categories and categories of replaced or deleted documents"""
+        with self._lock:
+            counts = dict(self._counts)
+            for category in added:
+                if category:
+                    counts[category] = counts.get(category, 0) + 1
+            for category in removed:
+                if category and category in counts:
+                    counts[category] -= 1
+            self._store(counts)
+
+    def snapshot(self):
+        """Return ``(categories, counts, etag)``"""
+        with self._lock:
+            counts = dict(self._counts)
+            etag = self._etag
+        return sorted(counts), counts, etag
+
+    def start(self):
+        """Load the index in the background and keep reconciling it on a schedule"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='category-index', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        self.refresh()
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
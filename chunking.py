@@ -0,0 +1,309 @@
+"""
+LegalEase AI structure-aware chunking of long legal documents
+"""
+import bisect
+import logging
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Knowledge base ids for chunks are '<doc_id>#<chunk index>' strings, which can
+# never equal a plain (integer) doc_id
+CHUNK_ID_SEPARATOR = '#'
+
+WORD_PATTERN = re.compile(r'\S+')
+PARAGRAPH_BREAK = re.compile(r'\n[ \t]*\n')
+SENTENCE_END = re.compile(r'(?<=[.!?;:])["\')\]]*\s+(?=[\["(A-Z0-9§])')
+# Lines that open a new unit of a legal opinion: section and article markers,
+# numbered or lettered headings, headnote numbers, and all-caps captions
+HEADING_PATTERN = re.compile(
+    r'(?:§+\s*\d|(?:section|sec\.|article|art\.|part|chapter|title|rule)\s+[\dIVXLC]+'
+    r'|[IVXLC]+\.(?:\s|$)|[A-Z]\.\s|\d+\.\s|\[\d+\]|headnotes?\b|syllabus\b|held:|opinion\b'
+    r'|(?:mr\.\s+)?(?:chief\s+)?(?:justice|judge)\b.*\b(?:delivered|dissenting|concurring))',
+    re.IGNORECASE
+)
+ALL_CAPS = re.compile(r'[A-Z][A-Z0-9,.:;\'&()\- ]+')
+MAX_HEADING_CHARS = 80
+
+
+def is_heading(paragraph):
+    """Whether a paragraph opens a new section, judged by its (short) first line"""
+    line = paragraph.strip().split('\n', 1)[0].strip()
+    if not line or len(line) > MAX_HEADING_CHARS:
+        return False
+    return bool(ALL_CAPS.fullmatch(line) or HEADING_PATTERN.match(line))
+
+
+def _units(text, starts, max_tokens, piece_tokens):
+    """Yield ``(first_word, end_word, starts_section)`` units no longer than ``max_tokens`` words.
+
+    Units are paragraphs; oversized paragraphs fall back to sentences and
+    oversized sentences to word windows of ``piece_tokens`` words.
+    """
+    offsets = [0] + [match.end() for match in PARAGRAPH_BREAK.finditer(text)] + [len(text)]
+    for begin, end in zip(offsets, offsets[1:]):
+        lo, hi = bisect.bisect_left(starts, begin), bisect.bisect_left(starts, end)
+        if lo == hi:
+            continue
+        heading = is_heading(text[begin:end])
+        if hi - lo <= max_tokens:
+            yield lo, hi, heading
+            continue
+
+        cuts = [bisect.bisect_left(starts, match.end()) for match in SENTENCE_END.finditer(text, begin, end)]
+        first = True
+        for s_lo, s_hi in zip([lo] + cuts, cuts + [hi]):
+            if s_lo == s_hi:
+                continue
+            if s_hi - s_lo <= max_tokens:
+                yield s_lo, s_hi, heading and first
+                first = False
+                continue
+            for w_lo in range(s_lo, s_hi, piece_tokens):
+                yield w_lo, min(s_hi, w_lo + piece_tokens), heading and first
+                first = False
+
+
+def split_offsets(text, max_tokens=350, overlap_tokens=50):
+    """Return ``[(start, end), ...]`` character spans of the chunks of ``text``.
+
+    Tokens are whitespace-separated words. Paragraphs and sentences are packed
+    into windows of at most ``max_tokens`` words; a heading always starts a
+    new window, and consecutive windows within a section share up to
+    ``overlap_tokens`` words.
+    """
+    if len(text.split()) <= max_tokens:
+        return [(0, len(text))] if text.strip() else []
+    starts = [match.start() for match in WORD_PATTERN.finditer(text)]
+
+    windows = []
+    current = None  # [first_word, end_word]
+    # Cut runs of text without sentence breaks so the overlap still fits the budget
+    piece_tokens = max(max_tokens - overlap_tokens, 1)
+    for lo, hi, heading in _units(text, starts, max_tokens, piece_tokens):
+        if current is not None and (heading or hi - current[0] > max_tokens):
+            windows.append(tuple(current))
+            if heading:
+                current = None
+            else:
+                overlap = max(0, min(overlap_tokens, max_tokens - (hi - lo)))
+                current = [max(current[1] - overlap, current[0] + 1), current[1]]
+        if current is None:
+            current = [lo, hi]
+        current[1] = hi
+    if current is not None:
+        windows.append(tuple(current))
+    return [(starts[lo], WORD_PATTERN.match(text, starts[hi - 1]).end()) for lo, hi in windows]
+
+
+def chunk_id(doc_id, index):
+    """Knowledge base id of a document's chunk"""
+    return f"{doc_id}{CHUNK_ID_SEPARATOR}{index}"
+
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+
+def pool_context():
+    """Multiprocessing context for worker pools: fork when the platform has it"""
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def _ready():
+    return True
+
+
+def worker_pool(workers=None):
+    """Process pool shared by document chunking and text extraction.
+
+    All workers are forked when the pool starts, never later. A fork copies
+    any lock another thread holds at that moment, so app.py starts the pool
+    before it creates anything that runs a thread. Other callers get a pool
+    forked on first use.
+    """
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            # Forked where possible: spawned workers would re-import the main
+            # module (running all of app.py's setup)
+            _worker_pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                               mp_context=pool_context())
+            _worker_pool.submit(_ready).result()
+        return _worker_pool
+
+
+def split_many(texts, max_tokens=350, overlap_tokens=50):
+    """Process pool entry point: chunk spans for a slice of documents"""
+    return [split_offsets(text, max_tokens, overlap_tokens) for text in texts]
+
+
+class DocumentChunker:
+    """Split document rows into knowledge base chunk rows.
+
+    Splitting runs on the shared worker pool, in about ``workers`` slices per
+    batch, once a batch holds more than ``inline_chars`` characters; smaller
+    batches are split in the calling thread.
+    """
+
+    def __init__(self, max_tokens=350, overlap_tokens=50, workers=None, inline_chars=200000):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.workers = workers or os.cpu_count() or 1
+        self.inline_chars = inline_chars
+
+    def spans(self, texts):
+        """Chunk spans for every text, in order"""
+        total = sum(len(text) for text in texts)
+        if self.workers <= 1 or total <= self.inline_chars or len(texts) < 2:
+            return split_many(texts, self.max_tokens, self.overlap_tokens)
+
+        # Slices of roughly equal character volume, a few per worker
+        target = max(total // (self.workers * 4), 1)
+        slices, current, size = [], [], 0
+        for text in texts:
+            current.append(text)
+            size += len(text)
+            if size >= target:
+                slices.append(current)
+                current, size = [], 0
+        if current:
+            slices.append(current)
+
+        pool = worker_pool(self.workers)
+        futures = [pool.submit(split_many, part, self.max_tokens, self.overlap_tokens) for part in slices]
+        return [spans for future in futures for spans in future.result()]
+
+    def split(self, df):
+        """Return ``(chunks, rejected)`` for a document DataFrame.
+
+        ``chunks`` has one row per chunk: ``doc_id`` (the chunk's knowledge base
+        id), ``parent_id``, ``chunk_index``, ``start``, ``end``, ``title``,
+        ``category`` and ``content``; ``rejected`` lists documents whose doc_id
+        is not an integer.
+        """
+        doc_ids = pd.to_numeric(df['doc_id'], errors='coerce')
+        usable = doc_ids.notna() & (doc_ids == doc_ids.round())
+        rejected = [{'doc_id': doc_id, 'error': 'doc_id is not an integer'} for doc_id in df.loc[~usable, 'doc_id']]
+        df = df[usable].assign(doc_id=doc_ids[usable].astype('int64'))
+
+        contents = df['content'].astype(str).tolist()
+        spans = self.spans(contents)
+        counts = [len(doc_spans) for doc_spans in spans]
+        chunks = df[['doc_id', 'title', 'category']].iloc[np.repeat(np.arange(len(df)), counts)].reset_index(drop=True)
+        chunks = chunks.rename(columns={'doc_id': 'parent_id'})
+        chunks['chunk_index'] = [index for count in counts for index in range(count)]
+        chunks['start'] = [start for doc_spans in spans for start, _ in doc_spans]
+        chunks['end'] = [end for doc_spans in spans for _, end in doc_spans]
+        chunks['content'] = [content[start:end] for content, doc_spans in zip(contents, spans)
+                             for start, end in doc_spans]
+        chunks['doc_id'] = [chunk_id(parent, index) for parent, index in zip(chunks['parent_id'], chunks['chunk_index'])]
+        return chunks, rejected
+
+
+class ChunkMap:
+    """Local chunk id -> (doc_id, chunk index, character offsets) mapping in SQLite"""
+
+    def __init__(self, path='cache/chunk_map.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            # Maps written with numeric chunk ids keep them, as text, under the new key type
+            columns = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(chunks)")}
+            numeric = columns.get('chunk_id', '').upper() == 'INTEGER'
+            if numeric:
+                conn.execute("ALTER TABLE chunks RENAME TO chunks_numeric")
+                conn.execute("DROP INDEX IF EXISTS chunks_doc_id")
+            conn.execute("""CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    doc_id TEXT,
+    chunk_index INTEGER,
+    start INTEGER,
+    end INTEGER
+)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_doc_id ON chunks (doc_id)")
+            if numeric:
+                conn.execute("INSERT INTO chunks SELECT CAST(chunk_id AS TEXT), doc_id, chunk_index, start, end "
+                             "FROM chunks_numeric")
+                conn.execute("DROP TABLE chunks_numeric")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def chunk_ids(self, doc_ids):
+        """Return ``{doc_id: [chunk_id, ...]}`` for known documents"""
+        doc_ids = [str(doc_id) for doc_id in doc_ids]
+        found = {}
+        with self._connect() as conn:
+            for start in range(0, len(doc_ids), 500):
+                part = doc_ids[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT doc_id, chunk_id FROM chunks WHERE doc_id IN ({', '.join('?' for _ in part)}) "
+                    "ORDER BY chunk_index", part
+                ).fetchall()
+                for doc_id, chunk_id in rows:
+                    found.setdefault(doc_id, []).append(chunk_id)
+        return found
+
+    def lookup(self, chunk_ids):
+        """Return ``{chunk_id: (doc_id, chunk_index, start, end)}`` for known chunks"""
+        ids = [str(chunk_id) for chunk_id in chunk_ids if chunk_id is not None]
+        found = {}
+        with self._connect() as conn:
+            for start in range(0, len(ids), 500):
+                part = ids[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT chunk_id, doc_id, chunk_index, start, end FROM chunks "
+                    f"WHERE chunk_id IN ({', '.join('?' for _ in part)})", part
+                ).fetchall()
+                found.update({row[0]: row[1:] for row in rows})
+        return found
+
+    def replace(self, chunks):
+        """Store the chunks of documents, dropping their previous chunks.
+
+        Returns the chunk ids that no longer exist (to delete upstream).
+        """
+        doc_ids = [str(doc_id) for doc_id in chunks['parent_id'].unique()]
+        previous = self.chunk_ids(doc_ids)
+        current = set(chunks['doc_id'].tolist())
+        stale = [chunk_id for ids in previous.values() for chunk_id in ids if chunk_id not in current]
+        with self._lock, self._connect() as conn:
+            conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in stale])
+            self._write(conn, chunks)
+        return stale
+
+    def add(self, chunks):
+        """Store chunks, keeping their documents' other chunks"""
+        with self._lock, self._connect() as conn:
+            self._write(conn, chunks)
+
+    def _write(self, conn, chunks):
+        rows = list(zip(chunks['doc_id'].tolist(), chunks['parent_id'].astype(str).tolist(),
+                        chunks['chunk_index'].tolist(), chunks['start'].tolist(), chunks['end'].tolist()))
+        conn.executemany(
+            "INSERT OR REPLACE INTO chunks (chunk_id, doc_id, chunk_index, start, end) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def remove(self, doc_ids):
+        """Forget documents and return their chunk ids"""
+        removed = self.chunk_ids(doc_ids)
+        with self._lock, self._connect() as conn:
+            conn.executemany("DELETE FROM chunks WHERE doc_id = ?", [(str(doc_id),) for doc_id in doc_ids])
+        return [chunk_id for ids in removed.values() for chunk_id in ids]
@@ -19,18 +19,124 @@ class Config:
     # Upload Configuration
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
-    ALLOWED_EXTENSIONS = {'csv', 'txt', 'pdf'}
+    MAX_UPLOAD_LENGTH = int(os.getenv('MAX_UPLOAD_LENGTH', 2 * 1024 * 1024 * 1024))  # 2GB, uploads are streamed
+    ALLOWED_EXTENSIONS = {'csv', 'txt', 'pdf', 'zip'}
+    
+    # Ingestion Configuration
+    INSERT_BATCH_SIZE = int(os.getenv('INSERT_BATCH_SIZE', 50))
+    INSERT_BATCH_MAX_BYTES = int(os.getenv('INSERT_BATCH_MAX_BYTES', 512 * 1024))
+    INSERT_TARGET_LATENCY = float(os.getenv('INSERT_TARGET_LATENCY', 2.0))
+    INGEST_CHUNK_ROWS = int(os.getenv('INGEST_CHUNK_ROWS', 500))
+    INGEST_MANIFEST_PATH = os.getenv('INGEST_MANIFEST_PATH', 'cache/ingest_manifest.db')
+    UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 2))
+    UPLOAD_JOB_DB = os.getenv('UPLOAD_JOB_DB', os.path.join(UPLOAD_FOLDER, 'upload_jobs.db'))
+    
+    # Text extraction for PDF, TXT and zip uploads (PDFs need the optional pypdf package)
+    EXTRACT_WORKERS = int(os.getenv('EXTRACT_WORKERS', 0))  # 0 = one per CPU
+    MAX_EXTRACT_FILE_BYTES = int(os.getenv('MAX_EXTRACT_FILE_BYTES', 256 * 1024 * 1024))  # per archive member
+    DEFAULT_DOCUMENT_CATEGORY = os.getenv('DEFAULT_DOCUMENT_CATEGORY', 'General')
+    
+    # Structure-aware chunking of long documents ('legal' or 'off')
+    CHUNKING = os.getenv('CHUNKING', 'off')
+    CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', 350))  # words per chunk
+    CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', 50))
+    CHUNK_WORKERS = int(os.getenv('CHUNK_WORKERS', 0))  # 0 = one per CPU
+    CHUNK_MAP_PATH = os.getenv('CHUNK_MAP_PATH', 'cache/chunk_map.db')
+    CHUNK_SEARCH_FANOUT = int(os.getenv('CHUNK_SEARCH_FANOUT', 3))  # chunks fetched per requested result
+    
+    # Row validation limits applied before ingestion
+    MAX_TITLE_CHARS = int(os.getenv('MAX_TITLE_CHARS', 500))  # longer titles are truncated
+    MAX_CATEGORY_CHARS = int(os.getenv('MAX_CATEGORY_CHARS', 100))
+    MAX_DOCUMENT_CHARS = int(os.getenv('MAX_DOCUMENT_CHARS', 1000000))
+    
+    # Background dependency health checks behind /api/status, in seconds
+    HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', 15))
+    HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', 5))
+    HEALTH_FAILURE_THRESHOLD = int(os.getenv('HEALTH_FAILURE_THRESHOLD', 3))  # consecutive failures to open a circuit
+    HEALTH_RESET_TIMEOUT = float(os.getenv('HEALTH_RESET_TIMEOUT', 60))  # open circuit wait before a retry probe
+    PGVECTOR_DATABASE = os.getenv('PGVECTOR_DATABASE', 'my_pgvector')
+    GEMINI_HEALTH_URL = os.getenv('GEMINI_HEALTH_URL', 'https://generativelanguage.googleapis.com/v1beta/models')
+    
+    # Category index reconciliation with MindsDB, in seconds
+    CATEGORY_REFRESH_INTERVAL = float(os.getenv('CATEGORY_REFRESH_INTERVAL', 600))
+    
+    # Lexical (BM25) index for hybrid search
+    LEXICAL_INDEX_PATH = os.getenv('LEXICAL_INDEX_PATH', 'cache/lexical_index.pkl')
+    HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', 50))
+    
+    # Vector search backend: mindsdb, local (offline vector store) or auto (local while MindsDB is degraded)
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'mindsdb')
+    VECTOR_STORE_DIR = os.getenv('VECTOR_STORE_DIR', 'cache/vector_store')
+    VECTOR_INDEX = os.getenv('VECTOR_INDEX', 'flat')  # flat, ivf or hnsw (needs hnswlib)
+    VECTOR_ANN_MIN_ROWS = int(os.getenv('VECTOR_ANN_MIN_ROWS', 20000))
+    
+    # Gemini reranking per search: off, always or auto (only when top scores are within the margin)
+    RERANK_MODE = os.getenv('RERANK_MODE', 'always')
+    RERANK_CANDIDATES = int(os.getenv('RERANK_CANDIDATES', 20))
+    RERANK_SCORE_MARGIN = float(os.getenv('RERANK_SCORE_MARGIN', 0.02))
+    RERANK_CACHE_MAX_ENTRIES = int(os.getenv('RERANK_CACHE_MAX_ENTRIES', 1024))
+    RERANK_CACHE_MAX_BYTES = int(os.getenv('RERANK_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    RERANK_CACHE_TTL = float(os.getenv('RERANK_CACHE_TTL', 3600))
+    
+    # Seconds the jobs list is served from memory before MindsDB is asked again
+    JOBS_CACHE_TTL = float(os.getenv('JOBS_CACHE_TTL', 30))
+    
+    # Scheduled job run history: polling, retention and alert thresholds
+    JOB_HISTORY_PATH = os.getenv('JOB_HISTORY_PATH', 'cache/job_history.db')
+    JOB_HISTORY_INTERVAL = float(os.getenv('JOB_HISTORY_INTERVAL', 60))
+    JOB_HISTORY_RETENTION_DAYS = float(os.getenv('JOB_HISTORY_RETENTION_DAYS', 90))
+    JOB_ALERT_FAILURES = int(os.getenv('JOB_ALERT_FAILURES', 3))
+    JOB_ALERT_INTERVAL_RATIO = float(os.getenv('JOB_ALERT_INTERVAL_RATIO', 0.8))
+    JOB_ALERT_SLOWDOWN_RATIO = float(os.getenv('JOB_ALERT_SLOWDOWN_RATIO', 1.5))
+    
+    # Citations sent ahead of a streamed agent answer
+    AGENT_STREAM_CITATIONS = int(os.getenv('AGENT_STREAM_CITATIONS', 3))
+    
+    # Batch search configuration
+    SEARCH_BATCH_FANOUT = int(os.getenv('SEARCH_BATCH_FANOUT', 8))
+    SEARCH_BATCH_MAX_QUERIES = int(os.getenv('SEARCH_BATCH_MAX_QUERIES', 500))
+    
+    # Cache Configuration
+    SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', 1024))
+    SEARCH_CACHE_MAX_BYTES = int(os.getenv('SEARCH_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    SEARCH_CACHE_TTL = float(os.getenv('SEARCH_CACHE_TTL', 300))
+    SEARCH_CACHE_BACKEND = os.getenv('SEARCH_CACHE_BACKEND', 'memory')  # memory, file or redis
+    SEARCH_CACHE_PATH = os.getenv('SEARCH_CACHE_PATH', 'cache/search_cache.db')
+    AGENT_CACHE_MAX_ENTRIES = int(os.getenv('AGENT_CACHE_MAX_ENTRIES', 512))
+    AGENT_CACHE_MAX_BYTES = int(os.getenv('AGENT_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    AGENT_CACHE_TTL = float(os.getenv('AGENT_CACHE_TTL', 3600))
+    AGENT_CACHE_PATH = os.getenv('AGENT_CACHE_PATH', 'cache/agent_cache.db')
+    REDIS_URL = os.getenv('REDIS_URL', '')
     
     # MindsDB Configuration
     MINDSDB_HOST = os.getenv('MINDSDB_HOST', '127.0.0.1')
     MINDSDB_PORT = os.getenv('MINDSDB_PORT', '47334')
     MINDSDB_DATABASE = os.getenv('MINDSDB_DATABASE', 'legalease')
+    MINDSDB_POOL_SIZE = int(os.getenv('MINDSDB_POOL_SIZE', 8))
+    MINDSDB_POOL_IDLE_TIMEOUT = float(os.getenv('MINDSDB_POOL_IDLE_TIMEOUT', 300))
+    MINDSDB_POOL_HEALTH_INTERVAL = float(os.getenv('MINDSDB_POOL_HEALTH_INTERVAL', 30))
+    MINDSDB_POOL_CHECKOUT_TIMEOUT = float(os.getenv('MINDSDB_POOL_CHECKOUT_TIMEOUT', 30))
+    QUERY_TIMEOUT = float(os.getenv('QUERY_TIMEOUT', 30))
+    AGENT_TIMEOUT = float(os.getenv('AGENT_TIMEOUT', 120))
+    QUERY_POLL_INITIAL_DELAY = float(os.getenv('QUERY_POLL_INITIAL_DELAY', 0.05))
+    QUERY_POLL_MAX_DELAY = float(os.getenv('QUERY_POLL_MAX_DELAY', 2.0))
     
     # Ollama Configuration
     OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'localhost')
     OLLAMA_PORT = os.getenv('OLLAMA_PORT', '11434')
     OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', f'http://{OLLAMA_HOST}:{OLLAMA_PORT}')
     
+    # Embedding cache; set EMBEDDING_PROXY_URL (e.g. http://legalease-embed:5002/ollama, off by
+    # default) so the knowledge base embeds through the cache instead of calling Ollama directly
+    EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'mxbai-embed-large')
+    EMBEDDING_PROXY_URL = os.getenv('EMBEDDING_PROXY_URL', '')
+    EMBEDDING_CACHE_DIR = os.getenv('EMBEDDING_CACHE_DIR', 'cache/embeddings')
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', 100000))
+    EMBEDDING_TIMEOUT = float(os.getenv('EMBEDDING_TIMEOUT', 120))
+    
+    # Async (ASGI) serving mode concurrency limit for MindsDB
+    ASYNC_MINDSDB_CONCURRENCY = int(os.getenv('ASYNC_MINDSDB_CONCURRENCY', 64))
+    
     # Google AI Configuration
     GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY', '')
     
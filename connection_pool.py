@@ -0,0 +1,192 @@
+"""
+LegalEase AI MindsDB connection pool
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import mindsdb_sdk
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_ERROR_HINTS = ('connection', 'timeout', 'timed out', 'broken pipe', 'reset by peer', 'refused')
+
+
+def is_connection_error(error):
+    """Return True when an error means the underlying connection is unusable"""
+    error_msg = str(error).lower()
+    return any(hint in error_msg for hint in CONNECTION_ERROR_HINTS)
+
+
+class PooledConnection:
+    """A MindsDB server handle plus bookkeeping used by the pool"""
+
+    def __init__(self, server):
+        self.server = server
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.last_checked = self.created_at
+
+
+class MindsDBConnectionPool:
+    """Thread-safe pool of MindsDB connections with health checks and idle eviction.
+
+    Connections are checked out per request with ``connection()``. Idle
+    connections older than ``idle_timeout`` are closed, connections idle for
+    longer than ``health_check_interval`` are pinged before reuse, and
+    connections that fail with a connection error are discarded so the next
+    checkout reconnects.
+    """
+
+    def __init__(self, url, size=8, idle_timeout=300, health_check_interval=30,
+                 checkout_timeout=30, connect_fn=None):
+        self.url = url
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        self.connect_fn = connect_fn or mindsdb_sdk.connect
+        self._idle = deque()  # most recently returned connection on the right
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._in_use = 0
+        self._dedicated = {}  # name -> server kept outside the pool for health probes
+        self.healthy = False
+        self.created = 0
+        self.reconnects = 0
+        self.evicted = 0
+        self.failed_checks = 0
+
+    def _create(self):
+        server = self.connect_fn(self.url)
+        with self._lock:
+            self.created += 1
+        self.healthy = True
+        logger.info(f"Opened MindsDB connection to {self.url}")
+        return PooledConnection(server)
+
+    def _ping(self, conn):
+        """Run a trivial query to confirm the connection still works"""
+        try:
+            conn.server.query("SELECT 1;").fetch()
+            conn.last_checked = time.time()
+            return True
+        except Exception as e:
+            with self._lock:
+                self.failed_checks += 1
+            logger.warning(f"MindsDB connection health check failed: {e}")
+            return False
+
+    def _take_idle(self):
+        """Pop a reusable idle connection, evicting stale or dead ones"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn = self._idle.pop()
+            now = time.time()
+            if now - conn.last_used > self.idle_timeout:
+                with self._lock:
+                    self.evicted += 1
+                continue
+            if now - conn.last_checked > self.health_check_interval and not self._ping(conn):
+                with self._lock:
+                    self.reconnects += 1
+                continue
+            return conn
+
+    def _evict_idle(self):
+        """Drop idle connections that exceeded the idle timeout"""
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            fresh = deque(conn for conn in self._idle if conn.last_used >= cutoff)
+            self.evicted += len(self._idle) - len(fresh)
+            self._idle = fresh
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a ``with`` block"""
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise Exception(f"Timed out waiting for a MindsDB connection (pool size {self.size})")
+
+        conn = None
+        try:
+            conn = self._take_idle()
+            if conn is None:
+                try:
+                    conn = self._create()
+                except Exception:
+                    self.healthy = False
+                    raise
+            with self._lock:
+                self._in_use += 1
+
+            try:
+                yield conn.server
+            except Exception as e:
+                if is_connection_error(e):
+                    # Discard the broken connection; the next checkout reconnects
+                    logger.warning(f"Discarding MindsDB connection after error: {e}")
+                    with self._lock:
+                        self.reconnects += 1
+                    conn = None
+                raise
+            finally:
+                with self._lock:
+                    self._in_use -= 1
+        finally:
+            if conn is not None:
+                conn.last_used = time.time()
+                with self._lock:
+                    self._idle.append(conn)
+            self._slots.release()
+            self._evict_idle()
+
+    def check(self):
+        """Check out a connection and ping it; returns True when MindsDB is reachable"""
+        try:
+            with self.connection() as server:
+                server.query("SELECT 1;").fetch()
+            self.healthy = True
+        except Exception as e:
+            logger.error(f"MindsDB connection failed: {e}")
+            self.healthy = False
+        return self.healthy
+
+    @contextmanager
+    def dedicated_connection(self, name):
+        """Use a long-lived connection reserved for ``name`` outside the pool's slots.
+
+        Health probes use these so they never wait for, or take, a slot from
+        requests: a busy pool doesn't look like an unreachable MindsDB. The
+        connection is dropped after an error and reopened on next use.
+        """
+        with self._lock:
+            server = self._dedicated.pop(name, None)
+        if server is None:
+            server = self.connect_fn(self.url)
+        yield server
+        with self._lock:
+            self._dedicated[name] = server
+
+    def close(self):
+        """Forget every idle connection"""
+        with self._lock:
+            self._idle.clear()
+            self._dedicated.clear()
+
+    def stats(self):
+        """Return pool size and usage counters"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'created': self.created,
+                'reconnects': self.reconnects,
+                'evicted': self.evicted,
+                'failed_health_checks': self.failed_checks,
+                'healthy': self.healthy
+            }
@@ -0,0 +1,234 @@
+"""
+LegalEase AI embedding cache in front of the Ollama embedding provider
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import requests
+
+from metrics import OPERATION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(model, text):
+    """Hash a (model, text) pair into a cache key"""
+    return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Content-hash keyed embedding store backed by a memory-mapped float32 matrix.
+
+    Vectors live in ``vectors.f32`` (one row per slot) and a SQLite index maps
+    content hashes to slots. When every slot is taken the least recently used
+    entry is evicted and its slot reused. Slots are claimed in a write
+    transaction before their vector is written, and entries are only served
+    once marked ready, so processes sharing the directory never collide.
+    """
+
+    def __init__(self, directory='cache/embeddings', max_entries=100000):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.dim = None
+        self._vectors = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, 'index.db'), timeout=30, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, slot INTEGER UNIQUE, last_used REAL)"
+        )
+        # Column added after the table was first created
+        existing = {row[1] for row in self._db.execute("PRAGMA table_info(embeddings)")}
+        if 'ready' not in existing:
+            self._db.execute("ALTER TABLE embeddings ADD COLUMN ready INTEGER NOT NULL DEFAULT 1")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        if row:
+            self._open(int(row[0]))
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.directory, 'vectors.f32')
+
+    def _open(self, dim):
+        """Map the vector file, creating or resizing it to ``max_entries`` rows"""
+        size = self.max_entries * dim * np.dtype(np.float32).itemsize
+        with open(self._vectors_path, 'ab') as handle:
+            if handle.tell() != size:
+                handle.truncate(size)
+        # Rows past a lowered max_entries were cut off with the file
+        self._db.execute("DELETE FROM embeddings WHERE slot >= ?", (self.max_entries,))
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode='r+',
+                                  shape=(self.max_entries, dim))
+        self.dim = dim
+        self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)", (str(dim),))
+        self._db.commit()
+
+    def get_many(self, keys):
+        """Return a dict of key -> vector for the keys that are cached"""
+        if self._vectors is None or not keys:
+            with self._lock:
+                self.misses += len(keys)
+            return {}
+
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ', '.join('?' for _ in chunk)
+                rows = self._db.execute(
+                    f"SELECT key, slot FROM embeddings WHERE ready = 1 AND key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, slot in rows:
+                    found[key] = np.array(self._vectors[slot])
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._db.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Store ``{key: vector}`` pairs, evicting least recently used entries when full"""
+        if not items:
+            return
+        with self._lock:
+            if self._vectors is None:
+                self._open(len(next(iter(items.values()))))
+
+            vectors = {}
+            for key, vector in items.items():
+                vector = np.asarray(vector, dtype=np.float32)
+                if vector.shape != (self.dim,):
+                    logger.warning(f"Skipping embedding with dimension {vector.shape}, cache holds {self.dim}")
+                    continue
+                vectors[key] = vector
+            if not vectors:
+                return
+
+            # Claim every slot under SQLite's write lock before touching the
+            # vector file; the rows stay hidden from readers until written
+            now = time.time()
+            slots = {}
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for key in vectors:
+                    row = self._db.execute("SELECT slot FROM embeddings WHERE key = ?", (key,)).fetchone()
+                    slots[key] = row[0] if row else self._free_slot()
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO embeddings (key, slot, last_used, ready) VALUES (?, ?, ?, 0)",
+                        (key, slots[key], now)
+                    )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
+            for key, slot in slots.items():
+                self._vectors[slot] = vectors[key]
+            self._vectors.flush()
+            self._db.executemany(
+                "UPDATE embeddings SET ready = 1 WHERE key = ? AND slot = ?", list(slots.items())
+            )
+            self._db.commit()
+
+    def _free_slot(self):
+        # Called inside put_many's write transaction. Slots are only freed by
+        # eviction (and reused at once) or by clear(), so occupied slots are
+        # always 0..count-1
+        count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count < self.max_entries:
+            return count
+
+        key, slot = self._db.execute(
+            "SELECT key, slot FROM embeddings ORDER BY last_used ASC LIMIT 1"
+        ).fetchone()
+        self._db.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+        self.evictions += 1
+        return slot
+
+    def clear(self):
+        """Forget every cached embedding"""
+        with self._lock:
+            self._db.execute("DELETE FROM embeddings")
+            self._db.commit()
+
+    def stats(self):
+        """Return hit ratio, size and eviction counters"""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'dim': self.dim,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+
+class CachedEmbedder:
+    """Embed texts through Ollama, serving unchanged texts from the embedding cache"""
+
+    def __init__(self, cache, ollama_base_url, model='mxbai-embed-large', timeout=120):
+        self.cache = cache
+        self.ollama_base_url = ollama_base_url.rstrip('/')
+        self.model = model
+        self.timeout = timeout
+
+    def embed(self, texts, model=None):
+        """Return one float32 vector per text, calling Ollama once for all misses"""
+        model = model or self.model
+        keys = [content_key(model, text) for text in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+
+        if missing:
+            with OPERATION_SECONDS.time(operation='embedding'):
+                vectors = self._embed_upstream(list(missing.values()), model)
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            found.update(fresh)
+
+        return [np.asarray(found[key], dtype=np.float32) for key in keys]
+
+    def _embed_upstream(self, texts, model):
+        """Embed texts with Ollama's batch endpoint, falling back to the legacy one"""
+        response = requests.post(
+            f"{self.ollama_base_url}/api/embed",
+            json={'model': model, 'input': texts},
+            timeout=self.timeout
+        )
+        if response.status_code == 404:
+            # Older Ollama releases only have the single-prompt endpoint
+            vectors = []
+            for text in texts:
+                legacy = requests.post(
+                    f"{self.ollama_base_url}/api/embeddings",
+                    json={'model': model, 'prompt': text},
+                    timeout=self.timeout
+                )
+                legacy.raise_for_status()
+                vectors.append(legacy.json()['embedding'])
+            return vectors
+
+        response.raise_for_status()
+        return response.json()['embeddings']
@@ -0,0 +1,166 @@
+"""
+LegalEase AI background dependency health checks with circuit breakers
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Per-dependency circuit breaker.
+
+    ``closed`` while the dependency answers; ``open`` after
+    ``failure_threshold`` consecutive failures, during which it isn't probed;
+    ``half_open`` once ``reset_timeout`` seconds have passed, letting one
+    probe decide whether to close again.
+    """
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.total_failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self, now=None):
+        """Whether a call may go through now; moves an expired open circuit to half-open"""
+        now = now or time.time()
+        with self._lock:
+            if self.state == 'open' and now - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+            return self.state != 'open'
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self, now=None):
+        with self._lock:
+            self.failures += 1
+            self.total_failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning(f"Circuit for {self.name} opened after {self.failures} consecutive failures")
+                self.state = 'open'
+                self.opened_at = now or time.time()
+
+    def to_dict(self):
+        with self._lock:
+            return {'state': self.state, 'failures': self.failures, 'opened_at': self.opened_at}
+
+
+class HealthMonitor:
+    """Probe dependencies concurrently on an interval and serve the last results.
+
+    ``probes`` maps a dependency name to a callable that raises (or returns
+    False) when the dependency is unavailable; a returned dict is kept as
+    probe details. Probes run in parallel, each bounded by ``timeout``, and
+    skipped while their circuit is open. ``snapshot`` never calls upstream.
+    """
+
+    def __init__(self, probes, interval=15, timeout=5, failure_threshold=3, reset_timeout=60):
+        self.probes = dict(probes)
+        self.interval = interval
+        self.timeout = timeout
+        self.breakers = {name: CircuitBreaker(name, failure_threshold, reset_timeout) for name in self.probes}
+        self._results = {name: {'ok': None, 'latency_ms': None, 'checked_at': None, 'error': None}
+                         for name in self.probes}
+        self._running = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(len(self.probes), 1), thread_name_prefix='health')
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.checked_at = None
+
+    def _probe(self, name):
+        started = time.perf_counter()
+        try:
+            outcome = self.probes[name]()
+        except Exception as e:
+            return False, time.perf_counter() - started, str(e) or type(e).__name__, None
+        elapsed = time.perf_counter() - started
+        if outcome is False:
+            return False, elapsed, 'probe failed', None
+        return True, elapsed, None, outcome if isinstance(outcome, dict) else None
+
+    def check(self):
+        """Probe every dependency whose circuit allows it, in parallel; returns the snapshot"""
+        with self._check_lock:
+            self._check()
+        return self.snapshot()
+
+    def ensure_checked(self):
+        """Run a first check when nothing has been checked yet (e.g. no background thread)"""
+        if self.checked_at is None:
+            with self._check_lock:
+                if self.checked_at is None:
+                    self._check()
+
+    def _check(self):
+        now = time.time()
+        futures = {}
+        for name in self.probes:
+            if not self.breakers[name].allow(now):
+                continue
+            future = self._running.get(name)
+            if future is None or future.done():
+                # A probe still stuck from an earlier check is waited on, not duplicated
+                future = self._running[name] = self._executor.submit(self._probe, name)
+            futures[name] = future
+
+        deadline = time.time() + self.timeout
+        for name, future in futures.items():
+            try:
+                ok, elapsed, error, details = future.result(timeout=max(deadline - time.time(), 0))
+            except FutureTimeout:
+                ok, elapsed, error, details = False, self.timeout, f'no answer within {self.timeout}s', None
+            if ok:
+                self.breakers[name].record_success()
+            else:
+                self.breakers[name].record_failure()
+            result = {'ok': ok, 'latency_ms': round(elapsed * 1000, 1), 'checked_at': time.time(),
+                      'error': error}
+            if details:
+                result['details'] = details
+            with self._lock:
+                self._results[name] = result
+        self.checked_at = time.time()
+
+    def is_up(self, name):
+        """Last known state of a dependency: True, False, or None when never checked"""
+        with self._lock:
+            return self._results[name]['ok']
+
+    def snapshot(self):
+        """Last probe result per dependency with its age and circuit state"""
+        now = time.time()
+        with self._lock:
+            results = {name: dict(result) for name, result in self._results.items()}
+        for name, result in results.items():
+            result['age_seconds'] = round(now - result['checked_at'], 1) if result['checked_at'] else None
+            result['circuit'] = self.breakers[name].to_dict()
+        return results
+
+    def start(self):
+        """Check in the background every ``interval`` seconds"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='health-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        self.check()
+        while not self._stop.wait(self.interval):
+            self.check()
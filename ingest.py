@@ -0,0 +1,120 @@
+"""
+LegalEase AI batched knowledge base ingestion helpers
+"""
+import os
+import time
+import logging
+
+import pandas as pd
+
+from query_builder import INSERT_DOCUMENTS, render_document_values
+
+logger = logging.getLogger(__name__)
+
+KB_COLUMNS = ['doc_id', 'title', 'category', 'content']
+
+
+def read_csv_header(source):
+    """Return the column names of a CSV without reading its rows"""
+    return list(pd.read_csv(source, nrows=0).columns)
+
+
+def missing_columns(columns, required=KB_COLUMNS):
+    """Return required knowledge base columns absent from ``columns``"""
+    return [col for col in required if col not in columns]
+
+
+def iter_csv_chunks(filepath, chunk_rows=500):
+    """Read a CSV in bounded chunks so memory stays flat regardless of file size.
+
+    Yields ``(chunk, bytes_read, bytes_total)``; the byte offsets come from the
+    underlying file handle and are approximate because of read buffering.
+    """
+    bytes_total = os.path.getsize(filepath)
+    with open(filepath, 'rb') as handle:
+        reader = pd.read_csv(handle, chunksize=chunk_rows, usecols=KB_COLUMNS)
+        for chunk in reader:
+            yield chunk, min(handle.tell(), bytes_total), bytes_total
+
+
+def stream_to_file(stream, filepath, buffer_size=1024 * 1024):
+    """Copy a request body stream to disk in fixed-size blocks and return bytes written"""
+    written = 0
+    with open(filepath, 'wb') as out:
+        while True:
+            block = stream.read(buffer_size)
+            if not block:
+                break
+            out.write(block)
+            written += len(block)
+    return written
+
+
+def build_insert_query(table, values):
+    """Build a multi-row INSERT statement from rendered VALUES tuples"""
+    return INSERT_DOCUMENTS.render(table=table, rows=",\n".join(values))
+
+
+def iter_insert_batches(df, max_rows=50, max_bytes=512 * 1024, text_ids=False):
+    """Group DataFrame rows into batches bounded by row count and byte size.
+
+    Yields ``(batch, rejected)`` where ``batch`` is a list of
+    ``(doc_id, values_sql)`` pairs and ``rejected`` lists rows that could not
+    be rendered as SQL at all (reported with the first batch). All rows are
+    escaped and rendered column-wise up front. ``text_ids`` renders doc_ids
+    as string literals (chunk ids).
+    """
+    rows, rejected = render_document_values(df, text_ids=text_ids)
+
+    batch = []
+    batch_bytes = 0
+    for doc_id, values, size in zip(rows['doc_id'], rows['values'], rows['size'].tolist()):
+        if batch and (len(batch) >= max_rows or batch_bytes + size > max_bytes):
+            yield batch, rejected
+            batch, batch_bytes, rejected = [], 0, []
+
+        batch.append((doc_id, values))
+        batch_bytes += size
+
+    if batch or rejected:
+        yield batch, rejected
+
+
+class AdaptiveThrottle:
+    """Backpressure between insert batches based on observed MindsDB latency.
+
+    The delay stays at zero while batches complete under ``target_latency``.
+    Slow batches add a delay proportional to the overshoot and connection
+    errors or timeouts double it; every healthy batch halves it again. Errors
+    caused by the rows themselves are not overload and must not be recorded.
+    """
+
+    def __init__(self, target_latency=2.0, max_delay=30.0, smoothing=0.3):
+        self.target_latency = target_latency
+        self.max_delay = max_delay
+        self.smoothing = smoothing
+        self.latency = None
+        self.delay = 0.0
+
+    def wait(self):
+        """Sleep for the current backpressure delay"""
+        if self.delay > 0:
+            time.sleep(self.delay)
+
+    def record_success(self, elapsed):
+        """Record a successful batch and adjust the delay"""
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency = self.smoothing * elapsed + (1 - self.smoothing) * self.latency
+
+        if self.latency > self.target_latency:
+            overshoot = self.latency - self.target_latency
+            self.delay = min(self.max_delay, max(self.delay / 2, overshoot))
+        else:
+            self.delay = self.delay / 2 if self.delay > 0.01 else 0.0
+
+    def record_error(self):
+        """Record a batch that failed with a connection error or timeout and back off"""
+        self.delay = min(self.max_delay, max(0.5, self.delay * 2))
+        logger.info(f"Insert backpressure increased to {self.delay:.2f}s")
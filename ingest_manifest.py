@@ -0,0 +1,120 @@
+"""
+LegalEase AI ingest manifest for change-detecting re-ingestion
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HASHED_COLUMNS = ['title', 'category', 'content']
+
+
+def content_hashes(df):
+    """Vectorized per-row content hash over the document columns"""
+    hashes = pd.util.hash_pandas_object(df[HASHED_COLUMNS].astype(str), index=False)
+    return hashes.astype(str)
+
+
+class IngestManifest:
+    """Local doc_id -> content hash record of what is in the knowledge base"""
+
+    def __init__(self, path='cache/ingest_manifest.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents (doc_id TEXT PRIMARY KEY, content_hash TEXT, updated_at REAL)"
+            )
+            # Column added after the table was first created
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+            if 'category' not in existing:
+                conn.execute("ALTER TABLE documents ADD COLUMN category TEXT")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _lookup(self, doc_ids, column='content_hash', conn=None):
+        known = {}
+        conn = conn or self._connect()
+        with conn:
+            for start in range(0, len(doc_ids), 500):
+                chunk = doc_ids[start:start + 500]
+                placeholders = ', '.join('?' for _ in chunk)
+                known.update(conn.execute(
+                    f"SELECT doc_id, {column} FROM documents WHERE doc_id IN ({placeholders})", chunk
+                ).fetchall())
+        return known
+
+    def diff(self, df):
+        """Split a DataFrame into inserted, updated and unchanged rows.
+
+        Returns ``(changed_df, inserted_ids, updated_ids, unchanged_count)``;
+        ``changed_df`` keeps a ``content_hash`` column for ``record``.
+        """
+        df = df.assign(doc_id_key=df['doc_id'].astype(str), content_hash=content_hashes(df))
+        known = self._lookup(df['doc_id_key'].tolist())
+
+        previous = df['doc_id_key'].map(known)
+        is_new = previous.isna()
+        is_updated = ~is_new & (previous != df['content_hash'])
+
+        changed = df[is_new | is_updated]
+        return (
+            changed.drop(columns=['doc_id_key']),
+            df.loc[is_new, 'doc_id_key'].tolist(),
+            df.loc[is_updated, 'doc_id_key'].tolist(),
+            int((~is_new & ~is_updated).sum())
+        )
+
+    def record(self, df, failed_ids=()):
+        """Record the content hashes of rows that reached the knowledge base.
+        
+        Returns ``(added_categories, replaced_categories)`` so callers can keep
+        category counts current.
+        """
+        failed = {str(doc_id) for doc_id in failed_ids}
+        hashes = df['content_hash'] if 'content_hash' in df.columns else content_hashes(df)
+        now = time.time()
+        rows = [
+            (str(doc_id), content_hash, category, now)
+            for doc_id, content_hash, category in zip(df['doc_id'], hashes, df['category'])
+            if str(doc_id) not in failed
+        ]
+        with self._lock, self._connect() as conn:
+            replaced = self._lookup([row[0] for row in rows], column='category', conn=conn)
+            conn.executemany(
+                "INSERT OR REPLACE INTO documents (doc_id, content_hash, category, updated_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+        return [row[2] for row in rows], list(replaced.values())
+
+    def missing_from(self, seen_ids):
+        """Return manifest doc_ids that were not seen in a full snapshot"""
+        seen = {str(doc_id) for doc_id in seen_ids}
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute("SELECT doc_id FROM documents") if row[0] not in seen]
+
+    def remove(self, doc_ids):
+        """Forget deleted documents and return their categories"""
+        doc_ids = [str(doc_id) for doc_id in doc_ids]
+        with self._lock, self._connect() as conn:
+            removed = self._lookup(doc_ids, column='category', conn=conn)
+            conn.executemany("DELETE FROM documents WHERE doc_id = ?", [(doc_id,) for doc_id in doc_ids])
+        return list(removed.values())
+
+    def category_counts(self):
+        """Return ``{category: documents}`` for everything recorded"""
+        with self._connect() as conn:
+            return dict(conn.execute(
+                "SELECT category, COUNT(*) FROM documents WHERE category IS NOT NULL GROUP BY category"
+            ).fetchall())
+    
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
@@ -0,0 +1,157 @@
+"""
+LegalEase AI document validation and normalization before ingestion
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CONTROL_CHARACTERS = r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]'
+
+
+def coerce_ids(series):
+    """Integer doc_ids as a nullable Int64 series; non-integers become <NA>"""
+    numbers = pd.to_numeric(series, errors='coerce')
+    numbers = numbers.where((numbers == np.floor(numbers)) & (numbers.abs() < 2 ** 63))
+    return numbers.astype('Int64')
+
+
+def normalize_text(series, multiline=False):
+    """NFKC-normalize, drop control characters and collapse whitespace over a whole column.
+
+    ``multiline`` keeps line breaks (collapsing blank-line runs) for document content.
+    """
+    text = series.astype(str).str.normalize('NFKC').str.replace(CONTROL_CHARACTERS, '', regex=True)
+    if multiline:
+        text = text.str.replace(r'\r\n?', '\n', regex=True)
+        text = text.str.replace(r'[^\S\n]+', ' ', regex=True).str.replace(r' ?\n ?', '\n', regex=True)
+        text = text.str.replace(r'\n{3,}', '\n\n', regex=True)
+    else:
+        text = text.str.replace(r'\s+', ' ', regex=True)
+    return text.str.strip()
+
+
+def category_key(series):
+    """Case, punctuation and spacing-insensitive form of category names"""
+    return (series.str.casefold().str.replace('&', ' and ', regex=False)
+            .str.replace(r'[\W_]+', ' ', regex=True).str.strip())
+
+
+class DocumentValidator:
+    """Validate and normalize document rows column-wise before any upstream work.
+
+    Rows with a non-integer doc_id, missing or empty fields, oversized
+    content or category, or a doc_id already seen in the same upload are
+    rejected with a reason; everything else is normalized (Unicode,
+    whitespace, title length, category spelling). Negative doc_ids are
+    reserved for extracted documents unless ``negative_ids`` is set.
+    """
+
+    def __init__(self, categories=(), max_title_chars=500, max_category_chars=100, max_content_chars=1000000,
+                 negative_ids=False):
+        self.negative_ids = negative_ids
+        self.max_title_chars = max_title_chars
+        self.max_category_chars = max_category_chars
+        self.max_content_chars = max_content_chars
+        self._canonical = {}
+        self.add_categories(categories)
+
+    def add_categories(self, categories):
+        """Register canonical category spellings; the first spelling of a key wins"""
+        categories = pd.Series(list(categories), dtype=object).dropna().astype(str)
+        if categories.empty:
+            return
+        for key, name in zip(category_key(categories), categories):
+            if key:
+                self._canonical.setdefault(key, name)
+
+    def validate(self, df, row_offset=0, seen_ids=None):
+        """Return ``(clean_df, rejected)`` for a chunk of CSV rows.
+
+        ``rejected`` lists ``{'row', 'doc_id', 'reason'}`` where ``row`` is the
+        row number in the CSV (the header is row 1), given the number of rows
+        before this chunk as ``row_offset``.
+        ``seen_ids`` (a set of ints) carries doc_ids across chunks of one
+        upload and is updated with the accepted ids.
+        """
+        reasons = pd.Series(None, index=df.index, dtype=object)
+
+        def reject(mask, reason):
+            reasons[mask & reasons.isna()] = reason
+
+        doc_ids = coerce_ids(df['doc_id'])
+        reject(doc_ids.isna(), 'doc_id is not an integer')
+        if not self.negative_ids:
+            reject((doc_ids < 0).fillna(False).astype(bool), 'negative doc_ids are reserved for PDF and text uploads')
+
+        columns = {}
+        for column, multiline in (('title', False), ('category', False), ('content', True)):
+            missing = df[column].isna()
+            reject(missing, f'missing {column}')
+            text = normalize_text(df[column].where(~missing, ''), multiline=multiline)
+            reject(text == '', f'empty {column}')
+            columns[column] = text
+
+        lengths = columns['content'].str.len()
+        reject(lengths > self.max_content_chars, f'content longer than {self.max_content_chars} characters')
+        reject(columns['category'].str.len() > self.max_category_chars,
+               f'category longer than {self.max_category_chars} characters')
+        columns['title'] = columns['title'].str.slice(0, self.max_title_chars)
+
+        # First occurrence wins, within the chunk and across earlier chunks
+        valid_ids = doc_ids.where(reasons.isna())
+        duplicate = valid_ids.notna() & valid_ids.duplicated(keep='first')
+        if seen_ids:
+            duplicate |= valid_ids.isin(seen_ids).fillna(False).astype(bool)
+        reject(duplicate, 'duplicate doc_id')
+
+        keys = category_key(columns['category'])
+        self.add_categories(columns['category'][reasons.isna()])
+        columns['category'] = keys.map(self._canonical).fillna(columns['category'])
+
+        accepted = reasons.isna()
+        clean = pd.DataFrame({
+            'doc_id': doc_ids[accepted].astype('int64'),
+            'title': columns['title'][accepted],
+            'category': columns['category'][accepted],
+            'content': columns['content'][accepted]
+        })
+        if seen_ids is not None:
+            seen_ids.update(clean['doc_id'].tolist())
+
+        rejected_mask = ~accepted
+        rejected = [
+            {'row': int(row) + 2 + row_offset, 'doc_id': None if pd.isna(doc_id) else str(doc_id), 'reason': reason}
+            for row, doc_id, reason in zip(
+                np.flatnonzero(rejected_mask.to_numpy()), df.loc[rejected_mask, 'doc_id'], reasons[rejected_mask]
+            )
+        ]
+        return clean, rejected
+
+
+class RejectionReport:
+    """Running rejected-rows summary for one upload, with a bounded row sample"""
+
+    def __init__(self, max_rows=1000):
+        self.max_rows = max_rows
+        self.count = 0
+        self.by_reason = {}
+        self.rows = []
+
+    def add(self, rejected):
+        self.count += len(rejected)
+        for row in rejected:
+            self.by_reason[row['reason']] = self.by_reason.get(row['reason'], 0) + 1
+        room = self.max_rows - len(self.rows)
+        if room > 0:
+            self.rows.extend(rejected[:room])
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'by_reason': dict(sorted(self.by_reason.items(), key=lambda item: -item[1])),
+            'rows': self.rows,
+            'truncated': self.count > len(self.rows)
+        }
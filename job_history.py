@@ -0,0 +1,272 @@
+"""
+LegalEase AI scheduled job run history, trends and alerts
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RUN_COLUMNS = ['job_name', 'project', 'run_start', 'run_end', 'started_at', 'finished_at', 'duration_s',
+               'rows_affected', 'error', 'is_ingest']
+
+
+def analyze_runs(runs, failure_alert=3, interval_ratio=0.8, slowdown_ratio=1.5, now=None):
+    """Summarize runs (newest first, as returned by ``JobHistoryStore.runs``).
+
+    Returns ``(stats, trend, alerts)``; alerts are ``{'level', 'code', 'message'}``
+    dicts meant to help size schedules: overlapping or nearly overlapping runs,
+    repeated failures, slowdowns, stuck runs and ingest runs that find nothing new.
+    Also sets ``overlapped`` on every run.
+    """
+    now = now or time.time()
+    ordered = runs[::-1]
+    started = np.array([run['started_at'] or 0.0 for run in ordered], dtype=float)
+    finished = np.array([np.inf if run['finished_at'] is None else run['finished_at'] for run in ordered],
+                        dtype=float)
+    # A run overlaps when it starts before every earlier run has finished
+    latest_end = np.maximum.accumulate(finished) if len(finished) else finished
+    overlapped = np.zeros(len(ordered), dtype=bool)
+    overlapped[1:] = started[1:] < latest_end[:-1]
+    for run, flag in zip(ordered, overlapped):
+        run['overlapped'] = bool(flag)
+
+    durations = np.array([run['duration_s'] for run in ordered if run['duration_s'] is not None], dtype=float)
+    failed = np.array([bool(run['error']) for run in ordered], dtype=bool)
+    intervals = np.diff(np.sort(started[started > 0]))
+    rows = [run['rows_affected'] for run in ordered if run['rows_affected'] is not None]
+    running = [run for run in ordered if run['finished_at'] is None]
+
+    stats = {
+        'runs': len(ordered),
+        'failures': int(failed.sum()),
+        'failure_rate': round(float(failed.mean()), 4) if len(failed) else 0.0,
+        'running': len(running),
+        'overlaps': int(overlapped.sum()),
+        'duration_s': None,
+        'interval_s': round(float(np.median(intervals)), 3) if len(intervals) else None,
+        'rows_affected': {'total': int(sum(rows)), 'mean': round(float(np.mean(rows)), 1)} if rows else None,
+        'last_run_at': float(started.max()) if len(started) else None,
+        'last_error': next((run['error'] for run in runs if run['error']), None)
+    }
+    if len(durations):
+        stats['duration_s'] = {
+            'p50': round(float(np.percentile(durations, 50)), 3),
+            'p95': round(float(np.percentile(durations, 95)), 3),
+            'max': round(float(durations.max()), 3),
+            'mean': round(float(durations.mean()), 3)
+        }
+
+    # Recent half against the older half, by median duration
+    trend = None
+    if len(durations) >= 4:
+        half = len(durations) // 2
+        earlier, recent = np.median(durations[:half]), np.median(durations[half:])
+        ratio = float(recent / earlier) if earlier > 0 else 1.0
+        direction = 'slower' if ratio >= 1.1 else 'faster' if ratio <= 0.9 else 'stable'
+        trend = {'duration_ratio': round(ratio, 3), 'direction': direction}
+
+    alerts = []
+    consecutive = 0
+    for flag in failed[::-1]:
+        if not flag:
+            break
+        consecutive += 1
+    if consecutive >= failure_alert:
+        alerts.append({'level': 'error', 'code': 'consecutive_failures',
+                       'message': f"Last {consecutive} runs failed: {stats['last_error']}"})
+    if stats['overlaps']:
+        alerts.append({'level': 'warning', 'code': 'overlap',
+                       'message': f"{stats['overlaps']} runs started before the previous run finished"})
+    if stats['duration_s'] and stats['interval_s']:
+        share = stats['duration_s']['p95'] / stats['interval_s']
+        if share >= interval_ratio:
+            alerts.append({'level': 'warning', 'code': 'schedule_too_tight',
+                           'message': f"p95 run time is {share:.0%} of the {stats['interval_s']:.0f}s schedule interval"})
+    if trend and trend['duration_ratio'] >= slowdown_ratio:
+        alerts.append({'level': 'warning', 'code': 'slowdown',
+                       'message': f"Recent runs take {trend['duration_ratio']:.1f}x longer than earlier runs"})
+    if running and stats['duration_s']:
+        elapsed = now - (running[0]['started_at'] or now)
+        if elapsed > 3 * max(stats['duration_s']['p95'], 1.0):
+            alerts.append({'level': 'warning', 'code': 'stuck',
+                           'message': f"Current run has been going for {elapsed:.0f}s, "
+                                      f"over 3x the p95 of {stats['duration_s']['p95']:.0f}s"})
+    recent_rows = [run['rows_affected'] for run in runs if run['is_ingest'] and run['rows_affected'] is not None][:5]
+    if len(recent_rows) == 5 and not any(recent_rows):
+        alerts.append({'level': 'info', 'code': 'idle_ingest',
+                       'message': "Last 5 ingest runs added no rows; the schedule can likely run less often"})
+    return stats, trend, alerts
+
+
+class JobHistoryStore:
+    """Per-run job history (one row per job and run start) in SQLite"""
+
+    def __init__(self, path='cache/job_history.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS job_runs (
+    job_name TEXT,
+    project TEXT,
+    run_start TEXT,
+    run_end TEXT,
+    started_at REAL,
+    finished_at REAL,
+    duration_s REAL,
+    rows_affected INTEGER,
+    error TEXT,
+    is_ingest INTEGER DEFAULT 0,
+    PRIMARY KEY (job_name, run_start)
+)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS job_runs_started ON job_runs (job_name, started_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def record(self, runs):
+        """Insert new runs and complete runs that have finished since the last poll.
+
+        Returns the runs that are newly finished.
+        """
+        if not runs:
+            return []
+        with self._lock, self._connect() as conn:
+            keys = [(run['job_name'], run['run_start']) for run in runs]
+            known = {}
+            for job_name, run_start in keys:
+                row = conn.execute("SELECT finished_at FROM job_runs WHERE job_name = ? AND run_start = ?",
+                                   (job_name, run_start)).fetchone()
+                if row is not None:
+                    known[(job_name, run_start)] = row[0]
+            conn.executemany(
+                f"INSERT INTO job_runs ({', '.join(RUN_COLUMNS)}) VALUES ({', '.join('?' for _ in RUN_COLUMNS)}) "
+                "ON CONFLICT (job_name, run_start) DO UPDATE SET run_end = excluded.run_end, "
+                "finished_at = excluded.finished_at, duration_s = excluded.duration_s, error = excluded.error",
+                [tuple(run.get(column) for column in RUN_COLUMNS) for run in runs]
+            )
+        return [
+            run for run, key in zip(runs, keys)
+            if run['finished_at'] is not None and known.get(key, None) is None
+        ]
+
+    def set_rows_affected(self, job_name, run_start, rows):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE job_runs SET rows_affected = ? WHERE job_name = ? AND run_start = ?",
+                         (rows, job_name, run_start))
+
+    def watermark(self):
+        """Earliest run start worth re-reading: the oldest unfinished run, else the newest run"""
+        with self._connect() as conn:
+            pending = conn.execute("SELECT MIN(run_start) FROM job_runs WHERE finished_at IS NULL").fetchone()[0]
+            if pending is not None:
+                return pending
+            return conn.execute("SELECT MAX(run_start) FROM job_runs").fetchone()[0]
+
+    def runs(self, job_name, limit=50):
+        """Return the latest runs of a job, newest first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(RUN_COLUMNS)} FROM job_runs WHERE job_name = ? "
+                "ORDER BY started_at DESC LIMIT ?",
+                (job_name, limit)
+            ).fetchall()
+        runs = [dict(zip(RUN_COLUMNS, row)) for row in rows]
+        for run in runs:
+            run['is_ingest'] = bool(run['is_ingest'])
+        return runs
+
+    def prune(self, older_than):
+        """Drop finished runs that started before ``older_than`` (epoch seconds)"""
+        with self._lock, self._connect() as conn:
+            return conn.execute("DELETE FROM job_runs WHERE started_at < ? AND finished_at IS NOT NULL",
+                                (older_than,)).rowcount
+
+
+class JobHistoryMonitor:
+    """Polls MindsDB job history into a ``JobHistoryStore`` in the background.
+
+    ``fetch_runs(since)`` returns runs starting at or after ``since`` (all runs
+    when None), so each poll only reads what changed. ``count_documents``
+    optionally returns the number of knowledge base rows written outside this
+    app; its growth between polls is attributed to the ingest run that
+    finished in between, when exactly one did. ``on_ingest`` is called after
+    a poll that saw ingest runs finish, since they changed the knowledge base.
+    """
+
+    def __init__(self, fetch_runs, store, interval=60, retention_days=90, count_documents=None, on_ingest=None):
+        self.fetch_runs = fetch_runs
+        self.store = store
+        self.interval = interval
+        self.retention_days = retention_days
+        self.count_documents = count_documents
+        self.on_ingest = on_ingest
+        self._document_count = None
+        self._poll_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.polled_at = None
+        self.last_error = None
+
+    def poll(self):
+        """Read new and still-running runs; returns True on success"""
+        with self._poll_lock:
+            try:
+                runs = self.fetch_runs(self.store.watermark())
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Job history poll failed: {e}")
+                return False
+            finished = self.store.record(runs)
+            finished_ingest = [run for run in finished if run['is_ingest']]
+            self._attribute_rows(finished_ingest)
+            if finished_ingest and self.on_ingest:
+                try:
+                    self.on_ingest()
+                except Exception as e:
+                    logger.warning(f"Job history ingest callback failed: {e}")
+            if self.retention_days:
+                self.store.prune(time.time() - self.retention_days * 86400)
+            self.polled_at = time.time()
+            self.last_error = None
+            return True
+
+    def _attribute_rows(self, finished_ingest):
+        if self.count_documents is None or (not finished_ingest and self._document_count is not None):
+            return
+        try:
+            count = self.count_documents()
+        except Exception as e:
+            logger.debug(f"Could not count knowledge base rows for job history: {e}")
+            return
+        previous, self._document_count = self._document_count, count
+        if previous is not None and count is not None and len(finished_ingest) == 1:
+            run = finished_ingest[0]
+            self.store.set_rows_affected(run['job_name'], run['run_start'], max(count - previous, 0))
+
+    def report(self, job_name, limit=50, **thresholds):
+        """Runs of a job with stats, duration trend and alerts"""
+        runs = self.store.runs(job_name, limit)
+        stats, trend, alerts = analyze_runs(runs, **thresholds)
+        return {'runs': runs, 'stats': stats, 'trend': trend, 'alerts': alerts,
+                'polled_at': self.polled_at, 'poll_error': self.last_error}
+
+    def start(self):
+        """Poll in the background every ``interval`` seconds"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='job-history', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        self.poll()
+        while not self._stop.wait(self.interval):
+            self.poll()
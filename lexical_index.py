@@ -0,0 +1,167 @@
+"""
+LegalEase AI in-process BM25 lexical index over document titles and content
+"""
+import heapq
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    'a an and are as at be by for from has have in is it its of on or that the to was were which with v vs'.split()
+)
+
+
+def tokenize(text):
+    """Lowercase word tokens of a text"""
+    return TOKEN_PATTERN.findall(str(text or '').lower())
+
+
+def title_key(text):
+    """Normalized form used for exact title matches ("Gideon v. Wainwright" == "gideon v wainwright")"""
+    return ' '.join(tokenize(text))
+
+
+class BM25Index:
+    """BM25 inverted index over title and content, with exact-title lookup.
+
+    Title terms are counted ``title_boost`` times so citation-style queries
+    rank the case itself above documents that merely mention it.
+    """
+
+    def __init__(self, path=None, k1=1.5, b=0.75, title_boost=3, snippet_chars=1000):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.title_boost = title_boost
+        self.snippet_chars = snippet_chars
+        self._lock = threading.RLock()
+        self._postings = {}  # term -> {doc_id: tf}
+        self._docs = {}  # doc_id -> {'title', 'category', 'snippet', 'length', 'terms'}
+        self._titles = {}  # title_key -> set(doc_id)
+        self._total_length = 0
+        self.dirty = False
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _remove(self, doc_id):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for term in doc['terms']:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        key = title_key(doc['title'])
+        ids = self._titles.get(key)
+        if ids is not None:
+            ids.discard(doc_id)
+            if not ids:
+                del self._titles[key]
+        self._total_length -= doc['length']
+
+    def add_documents(self, df):
+        """Index (or re-index) the rows of a DataFrame with doc_id, title, category, content"""
+        with self._lock:
+            for doc_id, title, category, content in zip(df['doc_id'], df['title'], df['category'], df['content']):
+                doc_id = str(doc_id)
+                self._remove(doc_id)
+
+                terms = Counter(token for token in tokenize(content) if token not in STOPWORDS)
+                for token in tokenize(title):
+                    if token not in STOPWORDS:
+                        terms[token] += self.title_boost
+                length = sum(terms.values())
+
+                for term, tf in terms.items():
+                    self._postings.setdefault(term, {})[doc_id] = tf
+                self._docs[doc_id] = {
+                    'title': str(title),
+                    'category': str(category),
+                    'snippet': str(content)[:self.snippet_chars],
+                    'length': length,
+                    'terms': tuple(terms)
+                }
+                self._titles.setdefault(title_key(title), set()).add(doc_id)
+                self._total_length += length
+            self.dirty = True
+
+    def remove_documents(self, doc_ids):
+        """Drop documents from the index"""
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove(str(doc_id))
+            self.dirty = True
+
+    def find_title(self, query, category=None):
+        """Return doc_ids whose title exactly matches the query"""
+        with self._lock:
+            ids = self._titles.get(title_key(query), ())
+            return [doc_id for doc_id in ids if not category or self._docs[doc_id]['category'] == category]
+
+    def search(self, query, limit=10, category=None):
+        """Return ``[(doc_id, score), ...]`` ranked by BM25"""
+        with self._lock:
+            count = len(self._docs)
+            if not count:
+                return []
+            average_length = self._total_length / count
+
+            scores = {}
+            for term in set(tokenize(query)) - STOPWORDS:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._docs[doc_id]['length'] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            if category:
+                scores = {doc_id: score for doc_id, score in scores.items()
+                          if self._docs[doc_id]['category'] == category}
+            return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def document(self, doc_id):
+        """Return the stored title, category and snippet for a document"""
+        with self._lock:
+            doc = self._docs.get(str(doc_id))
+            if doc is None:
+                return None
+            return {'title': doc['title'], 'category': doc['category'], 'snippet': doc['snippet']}
+
+    def save(self):
+        """Persist the index so it survives restarts"""
+        if not self.path:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as handle:
+                pickle.dump((self._postings, self._docs, self._titles, self._total_length), handle,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+    def save_if_dirty(self):
+        if self.dirty:
+            self.save()
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as handle:
+                self._postings, self._docs, self._titles, self._total_length = pickle.load(handle)
+            logger.info(f"Loaded lexical index with {len(self._docs)} documents")
+        except Exception as e:
+            logger.warning(f"Could not load lexical index from {self.path}: {e}")
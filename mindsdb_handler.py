@@ -1,17 +1,44 @@
-import mindsdb_sdk
 import pandas as pd
+import json
 import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import wraps
 import requests
 import logging
 import os
 from dotenv import load_dotenv
+from connection_pool import MindsDBConnectionPool, is_connection_error
+from ingest import iter_insert_batches, build_insert_query, AdaptiveThrottle
+from ingest_manifest import IngestManifest
+from category_index import CategoryIndex
+from lexical_index import BM25Index
+from embedding_cache import EmbeddingCache, CachedEmbedder
+from vector_store import LocalVectorStore, LocalSearchBackend
+from job_history import JobHistoryStore, JobHistoryMonitor
+from chunking import DocumentChunker, ChunkMap
+from health import HealthMonitor
+from query_builder import (build_search, escape_text, identifier, AGENT_QUESTION, DELETE_DOCUMENTS, DROP_JOB,
+                           RUN_START_SINCE)
+from metrics import REGISTRY, OPERATION_SECONDS, QUERY_STAGE_SECONDS, UPSTREAM_ERRORS, RETRIES
+from cache import LRUTTLCache, SingleFlight, create_store, make_search_key, make_agent_key, make_rerank_key
 
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+def is_retryable_error(error):
+    """Return True for transient connection/upstream errors that retry_on_error retries"""
+    error_msg = str(error).lower()
+    return ('litellm' in error_msg or 
+            'event loop is closed' in error_msg or 
+            'apiconnectionerror' in error_msg or
+            'connection' in error_msg or
+            'timeout' in error_msg)
+
 def retry_on_error(max_retries=3, delay=2, backoff=2):
     """Decorator to retry function calls when errors occur"""
     def decorator(func):
@@ -23,16 +50,14 @@ def retry_on_error(max_retries=3, delay=2, backoff=2):
                     return func(*args, **kwargs)
                 except Exception as e:
                     error_msg = str(e).lower()
-                    if ('litellm' in error_msg or 
-                        'event loop is closed' in error_msg or 
-                        'apiconnectionerror' in error_msg or
-                        'connection' in error_msg or
-                        'timeout' in error_msg):
+                    if is_retryable_error(e):
                         
+                        UPSTREAM_ERRORS.inc(function=func.__name__, kind='connection')
                         retries += 1
                         if retries < max_retries:
                             wait_time = delay * (backoff ** (retries - 1))
                             logger.warning(f"Connection error occurred (attempt {retries}/{max_retries})")
+                            RETRIES.inc(function=func.__name__)
                             time.sleep(wait_time)
                         else:
                             logger.error(f"Max retries ({max_retries}) reached. Error: {e}")
@@ -41,16 +66,73 @@ def retry_on_error(max_retries=3, delay=2, backoff=2):
                         logger.info(f"Resource already exists: {e}")
                         return {'status': 'exists', 'message': str(e)}
                     else:
+                        UPSTREAM_ERRORS.inc(function=func.__name__, kind='other')
                         raise e
             return None
         return wrapper
     return decorator
 
+def with_connection(func):
+    """Decorator holding one pooled connection for the whole method call"""
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self._connection():
+            return func(self, *args, **kwargs)
+    return wrapper
+
+READINESS_HINTS = ('not ready', 'in progress', 'still processing', 'pending', 'try again')
+READ_ONLY_STATEMENTS = ('SELECT', 'SHOW', 'DESCRIBE')
+
+
+def is_not_ready_error(error):
+    """Return True when an error means the result is not available yet"""
+    error_msg = str(error).lower()
+    return any(hint in error_msg for hint in READINESS_HINTS)
+
+
+def is_read_only(sql):
+    """Return True for statements that are safe to execute more than once"""
+    words = sql.lstrip(' \t\r\n(').split(None, 1)
+    return bool(words) and words[0].upper() in READ_ONLY_STATEMENTS
+
+
 class MindsDBHandler:
+    NO_ANSWER = "No answer received from the agent."
+    DEFAULT_CATEGORIES = ('Criminal Law', 'Civil Rights', 'Constitutional Law', 'Contract Law', 'Corporate Law')
+    CATEGORY_QUERY = """SELECT DISTINCT JSON_EXTRACT(metadata, '$.category') as category
+FROM legalease.legal_kb_pg
+WHERE JSON_EXTRACT(metadata, '$.category') IS NOT NULL
+ORDER BY category;"""
+    CATEGORY_COUNT_QUERY = """SELECT JSON_EXTRACT(metadata, '$.category') as category, COUNT(*) as documents
+FROM legalease.legal_kb_pg
+WHERE JSON_EXTRACT(metadata, '$.category') IS NOT NULL
+GROUP BY JSON_EXTRACT(metadata, '$.category');"""
+    SEARCH_BACKENDS = ('mindsdb', 'local', 'auto')
+    # Job listing statements in order of preference; MindsDB versions differ in
+    # which they accept. Unscoped ones need ``USE legalease;`` on the same session.
+    JOB_LISTING_QUERIES = (
+        ("SHOW JOBS FROM legalease;", False),
+        ("SHOW JOBS;", True),
+        ("SHOW JOBS FROM mindsdb;", False),
+        ("SELECT * FROM legalease.information_schema.jobs;", False),
+        ("SELECT * FROM information_schema.jobs;", True),
+        ("SELECT * FROM mindsdb.information_schema.jobs;", False),
+        ("SELECT * FROM mindsdb.jobs;", False),
+        ("SHOW FULL JOBS;", True)
+    )
+    # Job run history tables by MindsDB version; ``{since}`` narrows to recent runs
+    JOB_HISTORY_QUERIES = (
+        "SELECT * FROM log.jobs_history WHERE project = 'legalease'{since};",
+        "SELECT * FROM legalease.jobs_history WHERE project = 'legalease'{since};",
+        "SELECT * FROM information_schema.jobs_history WHERE project = 'legalease'{since};"
+    )
+    SEARCH_MODES = ('semantic', 'hybrid', 'lexical')
+    RERANK_MODES = ('off', 'always', 'auto')
+    
     def __init__(self):
-        self.server = None
-        self.connected = False
-        self.last_queries = []  # Track executed queries for transparency
+        self.last_queries = deque(maxlen=10)  # Track executed queries for transparency
+        self._queries_lock = threading.Lock()
+        self._local = threading.local()  # Connection checked out by the current thread
         
         # Load configuration from environment variables
         self.mindsdb_host = os.getenv('MINDSDB_HOST', '127.0.0.1')
@@ -59,51 +141,367 @@ class MindsDBHandler:
         self.google_api_key = os.getenv('GOOGLE_API_KEY', '')
         self.database_name = os.getenv('MINDSDB_DATABASE', 'legalease')
         
+        # Pooled MindsDB connections, checked out per request
+        self.pool = MindsDBConnectionPool(
+            f'http://{self.mindsdb_host}:{self.mindsdb_port}',
+            size=int(os.getenv('MINDSDB_POOL_SIZE', 8)),
+            idle_timeout=float(os.getenv('MINDSDB_POOL_IDLE_TIMEOUT', 300)),
+            health_check_interval=float(os.getenv('MINDSDB_POOL_HEALTH_INTERVAL', 30)),
+            checkout_timeout=float(os.getenv('MINDSDB_POOL_CHECKOUT_TIMEOUT', 30))
+        )
+        
+        # Dependency health probed concurrently in the background; status calls
+        # serve the last results instead of reaching out to every upstream
+        self.pgvector_database = os.getenv('PGVECTOR_DATABASE', 'my_pgvector')
+        self.gemini_health_url = os.getenv('GEMINI_HEALTH_URL',
+                                           'https://generativelanguage.googleapis.com/v1beta/models')
+        self.health_timeout = float(os.getenv('HEALTH_CHECK_TIMEOUT', 5))
+        probes = {'mindsdb': self._probe_mindsdb, 'ollama': self._probe_ollama, 'pgvector': self._probe_pgvector}
+        if self.gemini_health_url:
+            probes['gemini'] = self._probe_gemini
+        self.health = HealthMonitor(
+            probes,
+            interval=float(os.getenv('HEALTH_CHECK_INTERVAL', 15)),
+            timeout=self.health_timeout,
+            failure_threshold=int(os.getenv('HEALTH_FAILURE_THRESHOLD', 3)),
+            reset_timeout=float(os.getenv('HEALTH_RESET_TIMEOUT', 60))
+        )
+        
+        # Result readiness polling: exponential backoff capped by a per-call deadline
+        self.query_timeout = float(os.getenv('QUERY_TIMEOUT', 30))
+        self.agent_timeout = float(os.getenv('AGENT_TIMEOUT', 120))
+        self.poll_initial_delay = float(os.getenv('QUERY_POLL_INITIAL_DELAY', 0.05))
+        self.poll_max_delay = float(os.getenv('QUERY_POLL_MAX_DELAY', 2.0))
+        
+        # Batched ingestion settings
+        self.insert_batch_size = int(os.getenv('INSERT_BATCH_SIZE', 50))
+        self.insert_batch_max_bytes = int(os.getenv('INSERT_BATCH_MAX_BYTES', 512 * 1024))
+        self.insert_target_latency = float(os.getenv('INSERT_TARGET_LATENCY', 2.0))
+        
+        # doc_id -> content hash of everything ingested, for delta re-ingestion
+        self.manifest = IngestManifest(os.getenv('INGEST_MANIFEST_PATH', 'cache/ingest_manifest.db'))
+        
+        # Optional structure-aware chunking of long documents before they reach the
+        # knowledge base ('legal' or 'off'); chunk ids map back to doc_ids locally
+        self.chunker = None
+        self.chunk_map = None
+        self.chunk_search_fanout = int(os.getenv('CHUNK_SEARCH_FANOUT', 3))
+        if os.getenv('CHUNKING', 'off').lower() == 'legal':
+            self.chunker = DocumentChunker(
+                max_tokens=int(os.getenv('CHUNK_MAX_TOKENS', 350)),
+                overlap_tokens=int(os.getenv('CHUNK_OVERLAP_TOKENS', 50)),
+                workers=int(os.getenv('CHUNK_WORKERS', 0)) or None
+            )
+            self.chunk_map = ChunkMap(os.getenv('CHUNK_MAP_PATH', 'cache/chunk_map.db'))
+        
+        # Vector search backend: 'mindsdb' (knowledge base), 'local' (offline vector
+        # store, no MindsDB needed) or 'auto' (MindsDB, local store while it is degraded)
+        self.search_backend = os.getenv('SEARCH_BACKEND', 'mindsdb').lower()
+        if self.search_backend not in self.SEARCH_BACKENDS:
+            logger.warning(f"Unknown SEARCH_BACKEND '{self.search_backend}', using mindsdb")
+            self.search_backend = 'mindsdb'
+        
+        # Category counts served from memory and reconciled with MindsDB on a schedule
+        self.category_index = CategoryIndex(
+            self._load_category_counts,
+            refresh_interval=float(os.getenv('CATEGORY_REFRESH_INTERVAL', 600))
+        )
+        
+        # BM25 index over title and content for citation lookups and hybrid search
+        self.lexical_index = BM25Index(path=os.getenv('LEXICAL_INDEX_PATH', 'cache/lexical_index.pkl'))
+        self.hybrid_candidates = int(os.getenv('HYBRID_CANDIDATES', 50))
+        
+        # Bounded fan-out for batch search lookups, shared by all requests
+        self.search_batch_fanout = int(os.getenv('SEARCH_BATCH_FANOUT', 8))
+        self.search_executor = ThreadPoolExecutor(max_workers=self.search_batch_fanout,
+                                                  thread_name_prefix='search')
+        
+        # Semantic search result cache, invalidated whenever the knowledge base changes
+        self.search_cache = LRUTTLCache(
+            max_entries=int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', 1024)),
+            max_bytes=int(os.getenv('SEARCH_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+            ttl=float(os.getenv('SEARCH_CACHE_TTL', 300)),
+            store=create_store(
+                os.getenv('SEARCH_CACHE_BACKEND', 'memory'),
+                path=os.getenv('SEARCH_CACHE_PATH', 'cache/search_cache.db'),
+                redis_url=os.getenv('REDIS_URL'),
+                prefix='legalease:search:'
+            )
+        )
+        
+        # Agent answer cache with single-flight coalescing of identical questions
+        self.agent_cache = LRUTTLCache(
+            max_entries=int(os.getenv('AGENT_CACHE_MAX_ENTRIES', 512)),
+            max_bytes=int(os.getenv('AGENT_CACHE_MAX_BYTES', 16 * 1024 * 1024)),
+            ttl=float(os.getenv('AGENT_CACHE_TTL', 3600)),
+            store=create_store(
+                os.getenv('SEARCH_CACHE_BACKEND', 'memory'),
+                path=os.getenv('AGENT_CACHE_PATH', 'cache/agent_cache.db'),
+                redis_url=os.getenv('REDIS_URL'),
+                prefix='legalease:agent:'
+            )
+        )
+        self.agent_flight = SingleFlight()
+        
+        # Gemini reranking: default mode, candidate pool size, score margin for 'auto'
+        # and a cache of reranked orderings per (query, candidate set)
+        self.rerank_mode = os.getenv('RERANK_MODE', 'always').lower()
+        if self.rerank_mode not in self.RERANK_MODES:
+            logger.warning(f"Unknown RERANK_MODE '{self.rerank_mode}', using always")
+            self.rerank_mode = 'always'
+        self.rerank_candidates = int(os.getenv('RERANK_CANDIDATES', 20))
+        self.rerank_score_margin = float(os.getenv('RERANK_SCORE_MARGIN', 0.02))
+        self.rerank_cache = LRUTTLCache(
+            max_entries=int(os.getenv('RERANK_CACHE_MAX_ENTRIES', 1024)),
+            max_bytes=int(os.getenv('RERANK_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+            ttl=float(os.getenv('RERANK_CACHE_TTL', 3600))
+        )
+        
+        # Embedding cache; MindsDB reaches it through the /ollama proxy route when
+        # EMBEDDING_PROXY_URL points the knowledge base there
+        self.embedding_model = os.getenv('EMBEDDING_MODEL', 'mxbai-embed-large')
+        self.embedding_base_url = os.getenv('EMBEDDING_PROXY_URL') or self.ollama_base_url
+        self.embedder = CachedEmbedder(
+            EmbeddingCache(
+                directory=os.getenv('EMBEDDING_CACHE_DIR', 'cache/embeddings'),
+                max_entries=int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', 100000))
+            ),
+            self.ollama_base_url,
+            model=self.embedding_model,
+            timeout=float(os.getenv('EMBEDDING_TIMEOUT', 120))
+        )
+        
+        # Local vector store, kept in step with ingestion unless MindsDB is the only backend
+        self.local_search = None
+        if self.search_backend != 'mindsdb':
+            self.local_search = LocalSearchBackend(
+                LocalVectorStore(
+                    directory=os.getenv('VECTOR_STORE_DIR', 'cache/vector_store'),
+                    index_type=os.getenv('VECTOR_INDEX', 'flat'),
+                    ann_min_rows=int(os.getenv('VECTOR_ANN_MIN_ROWS', 20000))
+                ),
+                self.embedder
+            )
+        
+        # Jobs list served from a short-lived snapshot; the working listing query is
+        # detected once per process and kept until it stops working
+        self.jobs_cache_ttl = float(os.getenv('JOBS_CACHE_TTL', 30))
+        self._jobs_query = None
+        self._jobs_snapshot = None  # (jobs, fetched_at)
+        self._jobs_lock = threading.Lock()
+        self.jobs_flight = SingleFlight()
+        
+        # Scheduled job runs polled incrementally into SQLite for /api/jobs/<id>/runs
+        self._job_history_query = None
+        self.job_alert_thresholds = {
+            'failure_alert': int(os.getenv('JOB_ALERT_FAILURES', 3)),
+            'interval_ratio': float(os.getenv('JOB_ALERT_INTERVAL_RATIO', 0.8)),
+            'slowdown_ratio': float(os.getenv('JOB_ALERT_SLOWDOWN_RATIO', 1.5))
+        }
+        self.job_history = JobHistoryMonitor(
+            self.fetch_job_runs,
+            JobHistoryStore(os.getenv('JOB_HISTORY_PATH', 'cache/job_history.db')),
+            interval=float(os.getenv('JOB_HISTORY_INTERVAL', 60)),
+            retention_days=float(os.getenv('JOB_HISTORY_RETENTION_DAYS', 90)),
+            count_documents=self.count_external_documents,
+            # Scheduled ingest writes to the knowledge base outside insert_documents
+            on_ingest=self.invalidate_caches
+        )
+        
+        self._register_gauges()
+        
+    def _register_gauges(self):
+        """Expose pool, cache and index sizes as scrape-time gauges, and their running totals as counters"""
+        caches = {'search': self.search_cache, 'agent': self.agent_cache, 'rerank': self.rerank_cache}
+        
+        def cache_stat(field):
+            values = {(name,): cache.stats()[field] for name, cache in caches.items()}
+            values[('embedding',)] = self.embedder.cache.stats()[field]
+            return values
+        
+        def pool_state():
+            stats = self.pool.stats()
+            return {(state,): stats[state] for state in ('size', 'idle', 'in_use')}
+        
+        def dependency_failures():
+            return {(name,): breaker.total_failures for name, breaker in self.health.breakers.items()}
+        
+        REGISTRY.gauge('legalease_pool_connections', 'MindsDB connection pool slots by state', ('state',),
+                       callback=pool_state)
+        REGISTRY.gauge('legalease_pool_healthy', 'Whether MindsDB answered the last health check',
+                       callback=lambda: int(self.pool.healthy))
+        REGISTRY.gauge('legalease_cache_entries', 'Entries held per cache', ('cache',),
+                       callback=lambda: cache_stat('entries'))
+        REGISTRY.gauge('legalease_cache_hit_ratio', 'Hit ratio per cache since startup', ('cache',),
+                       callback=lambda: cache_stat('hit_ratio'))
+        REGISTRY.counter('legalease_cache_evictions_total', 'Evictions per cache since startup', ('cache',),
+                         callback=lambda: cache_stat('evictions'))
+        REGISTRY.counter('legalease_pool_reconnects_total', 'MindsDB connections replaced after a failed check or error',
+                         callback=lambda: self.pool.stats()['reconnects'])
+        REGISTRY.counter('legalease_pool_evicted_total', 'Idle MindsDB connections closed after the idle timeout',
+                         callback=lambda: self.pool.stats()['evicted'])
+        REGISTRY.counter('legalease_pool_failed_health_checks_total', 'Failed pings of idle MindsDB connections',
+                         callback=lambda: self.pool.stats()['failed_health_checks'])
+        REGISTRY.counter('legalease_dependency_failures_total', 'Failed health probes per dependency since startup',
+                         ('dependency',), callback=dependency_failures)
+        REGISTRY.gauge('legalease_lexical_index_documents', 'Documents in the BM25 index',
+                       callback=lambda: len(self.lexical_index))
+        if self.local_search:
+            REGISTRY.gauge('legalease_vector_store_documents', 'Documents in the local vector store',
+                           callback=lambda: len(self.local_search.store))
+    
+    @property
+    def connected(self):
+        """Whether the last attempt to reach MindsDB succeeded"""
+        return self.pool.healthy
+    
     def _log_query(self, query, operation="query"):
         """Log executed query for transparency"""
-        self.last_queries.append({
+        # The deque keeps only the last 10 queries
+        entry = {
             'operation': operation,
             'query': query,
             'timestamp': time.time()
-        })
-        # Keep only last 10 queries
-        if len(self.last_queries) > 10:
-            self.last_queries = self.last_queries[-10:]
+        }
+        with self._queries_lock:
+            self.last_queries.append(entry)
+        return entry
+    
+    @contextmanager
+    def _connection(self):
+        """Check out a pooled connection for the current thread.
+        
+        Re-entrant: nested calls reuse the connection already held by the thread,
+        so multi-statement operations (``USE`` then ``SHOW JOBS``) share a session.
+        """
+        server = getattr(self._local, 'server', None)
+        if server is not None:
+            yield server
+            return
+        
+        with self.pool.connection() as server:
+            self._local.server = server
+            try:
+                yield server
+            finally:
+                self._local.server = None
+    
+    def _run_query(self, sql, operation=None, timeout=None):
+        """Execute a query and return its DataFrame as soon as it is ready.
         
+        mindsdb_sdk runs the statement on every ``fetch()``, so only read-only
+        statements are re-fetched, with exponential backoff while MindsDB
+        reports the result as not ready and until ``timeout`` seconds have
+        passed. INSERT, DELETE, CREATE etc. are executed exactly once.
+        """
+        entry = self._log_query(sql, operation) if operation else None
+        label = operation or 'query'
+        
+        deadline = time.time() + (timeout or self.query_timeout)
+        retry_not_ready = is_read_only(sql)
+        delay = self.poll_initial_delay
+        started = time.perf_counter()
+        waited = 0.0
+        with self._connection() as server:
+            checked_out = time.perf_counter()
+            QUERY_STAGE_SECONDS.observe(checked_out - started, operation=label, stage='checkout')
+            try:
+                result = server.query(sql)
+                while True:
+                    try:
+                        return result.fetch()
+                    except Exception as e:
+                        if not retry_not_ready or not is_not_ready_error(e) or time.time() + delay > deadline:
+                            raise
+                        time.sleep(delay)
+                        waited += delay
+                        delay = min(delay * 2, self.poll_max_delay)
+            finally:
+                finished = time.perf_counter()
+                QUERY_STAGE_SECONDS.observe(finished - checked_out - waited, operation=label, stage='fetch')
+                if waited:
+                    QUERY_STAGE_SECONDS.observe(waited, operation=label, stage='wait')
+                if entry is not None:
+                    entry['duration_ms'] = round((finished - started) * 1000, 1)
+    
     def connect(self):
-        """Connect to MindsDB server"""
+        """Connect to MindsDB server by pinging a pooled connection"""
         try:
-            connection_url = f'http://{self.mindsdb_host}:{self.mindsdb_port}'
-            self.server = mindsdb_sdk.connect(connection_url)
-            self.connected = True
-            logger.info(f"Connected to MindsDB at {connection_url}")
+            self._run_query("SELECT 1;")
+            self.pool.healthy = True
+            logger.info(f"Connected to MindsDB at {self.pool.url}")
             return True
         except Exception as e:
             logger.error(f"MindsDB connection failed: {e}")
-            self.connected = False
+            self.pool.healthy = False
             return False
     
-    def check_ollama_connection(self):
-        """Check if Ollama is running and accessible"""
+    def _probe_mindsdb(self):
+        # Dedicated connection, so a fully checked-out pool isn't mistaken for an
+        # outage; also marks the pool healthy or not, which ``connected`` reports
         try:
-            ollama_tags_url = f"{self.ollama_base_url}/api/tags"
-            response = requests.get(ollama_tags_url, timeout=5)
-            return response.status_code == 200
-        except:
-            return False
+            with self.pool.dedicated_connection('health-mindsdb') as server:
+                server.query("SELECT 1;").fetch()
+        except Exception:
+            self.pool.healthy = False
+            raise
+        self.pool.healthy = True
+    
+    def _probe_pgvector(self):
+        """Round trip to Postgres through MindsDB's pgvector integration (not logged as a query)"""
+        with self.pool.dedicated_connection('health-pgvector') as server:
+            server.query(f"SELECT * FROM {identifier(self.pgvector_database)} (SELECT 1);").fetch()
+    
+    def _probe_ollama(self):
+        response = requests.get(f"{self.ollama_base_url}/api/tags", timeout=self.health_timeout)
+        response.raise_for_status()
+        return {'models': len(response.json().get('models', []))}
+    
+    def _probe_gemini(self):
+        if not self.google_api_key:
+            raise Exception("GOOGLE_API_KEY is not set")
+        # Key in a header so it never shows up in error messages
+        response = requests.get(self.gemini_health_url, params={'pageSize': 1},
+                                headers={'x-goog-api-key': self.google_api_key}, timeout=self.health_timeout)
+        if response.status_code in (400, 401, 403):
+            raise Exception(f"API key rejected (HTTP {response.status_code})")
+        response.raise_for_status()
     
     def check_status(self):
-        """Check system status"""
-        mindsdb_status = self.connect() if not self.connected else True
-        ollama_status = self.check_ollama_connection()
+        """System status from the health monitor's last checks, without upstream calls.
         
-        return {
+        Only the first call checks synchronously, when the background monitor
+        hasn't finished a round yet.
+        """
+        self.health.ensure_checked()
+        dependencies = self.health.snapshot()
+        mindsdb_status = bool(dependencies['mindsdb']['ok'])
+        ollama_status = bool(dependencies['ollama']['ok'])
+        
+        status = {
             'mindsdb': mindsdb_status,
             'ollama': ollama_status,
-            'overall': mindsdb_status and ollama_status
+            'pgvector': bool(dependencies['pgvector']['ok']),
+            'overall': mindsdb_status and ollama_status and dependencies['pgvector']['ok'] is not False,
+            'dependencies': dependencies,
+            'checked_at': self.health.checked_at,
+            'pool': self.pool.stats(),
+            'search_backend': self.search_backend
         }
+        if 'gemini' in dependencies:
+            status['gemini'] = bool(dependencies['gemini']['ok'])
+        if self.local_search:
+            status['vector_store'] = self.local_search.store.stats()
+            # Reads keep working offline as long as queries can still be embedded
+            local_ready = ollama_status and len(self.local_search.store) > 0
+            if self.search_backend == 'local':
+                status['overall'] = ollama_status
+            elif not mindsdb_status and local_ready:
+                status['degraded'] = True
+        return status
     
     @retry_on_error(max_retries=3, delay=3, backoff=2)
+    @with_connection
     def initialize_system(self):
         """Initialize knowledge base and agent"""
         if not self.connected:
@@ -117,20 +515,19 @@ class MindsDBHandler:
 USING
     embedding_model = {{
         "provider": "ollama",
-        "model_name": "mxbai-embed-large",
-        "base_url": "{self.ollama_base_url}"
+        "model_name": "{self.embedding_model}",
+        "base_url": "{self.embedding_base_url}"
     }},
     reranking_model = {{
         "provider": "gemini",
         "model_name": "gemini-2.0-flash"
     }},
-    storage = my_pgvector.legal_kb_pg_storage,
+    storage = {self.pgvector_database}.legal_kb_pg_storage,
     metadata_columns = ['title', 'category'],
     content_columns = ['content'],
     id_column = 'doc_id';"""
             
-            result = self.server.query(kb_query)
-            self._log_query(kb_query, operation="create_knowledge_base")
+            self._run_query(kb_query, "create_knowledge_base")
             results.append({'step': 'knowledge_base', 'status': 'success'})
         except Exception as e:
             if 'already exists' in str(e).lower():
@@ -142,7 +539,7 @@ USING
             agent_query = f"""CREATE AGENT legal_gemini_agent
 USING
     model = 'gemini-2.0-flash',
-    google_api_key = '{self.google_api_key}',
+    google_api_key = '{escape_text(self.google_api_key)}',
     include_knowledge_bases = ['{self.database_name}.legal_kb_pg'],
     prompt_template = '
         You are LegalEase AI, a legal assistant. Use the legal knowledge base to answer questions.
@@ -150,8 +547,7 @@ USING
         Question: {{{{question}}}}
     ';"""
             
-            result = self.server.query(agent_query)
-            self._log_query(agent_query, operation="create_agent")
+            self._run_query(agent_query, "create_agent")
             results.append({'step': 'agent', 'status': 'success'})
         except Exception as e:
             if 'already exists' in str(e).lower():
@@ -161,8 +557,7 @@ USING
           # Create index
         try:
             index_query = f"CREATE INDEX ON KNOWLEDGE_BASE {self.database_name}.legal_kb_pg;"
-            result = self.server.query(index_query)
-            self._log_query(index_query, operation="create_index")
+            self._run_query(index_query, "create_index")
             results.append({'step': 'index', 'status': 'success'})
         except Exception as e:
             if 'already exists' in str(e).lower():
@@ -171,65 +566,474 @@ USING
         
         return {'success': True, 'results': results}
     
+    def insert_documents(self, df, batch_size=None, max_batch_bytes=None, on_batch=None):
+        """Insert documents from DataFrame into the configured search backend"""
+        if self.search_backend == 'local':
+            return self._insert_local(df, batch_size, on_batch)
+        # One throttle across retries, so backoff from a connection error carries over
+        throttle = AdaptiveThrottle(target_latency=self.insert_target_latency)
+        return self._insert_knowledge_base(df, batch_size, max_batch_bytes, on_batch, throttle)
+    
     @retry_on_error(max_retries=3, delay=2, backoff=2)
-    def insert_documents(self, df):
-        """Insert documents from DataFrame into knowledge base"""
+    @with_connection
+    def _insert_knowledge_base(self, df, batch_size=None, max_batch_bytes=None, on_batch=None, throttle=None):
+        """Insert documents from DataFrame into knowledge base using multi-row batches"""
         if not self.connected:
             if not self.connect():
                 raise Exception("Failed to connect to MindsDB")
         
-        inserted_count = 0
+        batch_size = batch_size or self.insert_batch_size
+        max_batch_bytes = max_batch_bytes or self.insert_batch_max_bytes
+        throttle = throttle or AdaptiveThrottle(target_latency=self.insert_target_latency)
         
-        for _, row in df.iterrows():
+        report = {
+            'inserted': 0,
+            'failed': 0,
+            'batches': [],
+            'failed_rows': []
+        }
+        
+        rows, chunks = df, None
+        if self.chunker:
+            with OPERATION_SECONDS.time(operation='chunk_documents'):
+                chunks, unchunkable = self.chunker.split(df)
+            rows = chunks
+        
+        for batch, rejected in iter_insert_batches(rows, batch_size, max_batch_bytes, text_ids=chunks is not None):
+            for row in rejected:
+                logger.warning(f"Skipping malformed document {row['doc_id']}: {row['error']}")
+            
+            started = time.time()
+            with OPERATION_SECONDS.time(operation='insert_batch'):
+                inserted, failed_rows = self._insert_batch(batch, throttle) if batch else (0, [])
+            failed_rows = rejected + failed_rows
+            
+            batch_report = {
+                'batch': len(report['batches']) + 1,
+                'rows': len(batch) + len(rejected),
+                'inserted': inserted,
+                'failed': len(failed_rows),
+                'duration_ms': round((time.time() - started) * 1000, 1)
+            }
+            report['batches'].append(batch_report)
+            report['inserted'] += inserted
+            report['failed'] += len(failed_rows)
+            report['failed_rows'].extend(failed_rows)
+            
+            if on_batch:
+                on_batch(batch_report)
+        
+        if chunks is not None:
+            report = self._finish_chunked_insert(report, chunks, unchunkable)
+        
+        if report['inserted']:
+            self._record_inserted(df, [row['doc_id'] for row in report['failed_rows']])
+        
+        return report
+    
+    def _finish_chunked_insert(self, report, chunks, unchunkable):
+        """Turn a chunk-level insert report into a document-level one and update the chunk map.
+        
+        A document counts as failed when any of its chunks failed. For a new
+        document, the chunks that did get in are deleted again so a retry starts
+        clean. For an update, they are kept and mapped: they already overwrote
+        the old chunks with the same ids, so deleting them would leave gaps.
+        The document stays whole (old text at the failed chunks) until the
+        retry rewrites it. Chunks left over from a longer previous version of
+        a fully inserted document are deleted.
+        """
+        parents = dict(zip(chunks['doc_id'].astype(str), chunks['parent_id'].astype(str)))
+        failed = {str(row['doc_id']): dict(row, doc_id=str(row['doc_id'])) for row in unchunkable}
+        failed_chunks = set()
+        for row in report['failed_rows']:
+            failed_chunks.add(str(row['doc_id']))
+            doc_id = parents.get(str(row['doc_id']), str(row['doc_id']))
+            failed.setdefault(doc_id, {'doc_id': doc_id, 'error': row['error']})
+        
+        parent_ids = chunks['parent_id'].astype(str)
+        failed_docs = parent_ids.isin(failed)
+        inserted = ~chunks['doc_id'].astype(str).isin(failed_chunks)
+        updates = failed_docs & parent_ids.isin(self.chunk_map.chunk_ids(parent_ids[failed_docs].unique()))
+        stale = self.chunk_map.replace(chunks[~failed_docs])
+        self.chunk_map.add(chunks[updates & inserted])
+        stale += chunks.loc[failed_docs & ~updates & inserted, 'doc_id'].tolist()
+        for start in range(0, len(stale), 500):
             try:
-                insert_query = f"""INSERT INTO legalease.legal_kb_pg (doc_id, title, category, content) VALUES
-({row['doc_id']}, '{row['title'].replace("'", "''")}', '{row['category'].replace("'", "''")}', '{row['content'].replace("'", "''")}');"""
-                
-                # Log the query for transparency
-                self._log_query(insert_query, "insert_document")
-                
-                result = self.server.query(insert_query)
-                inserted_count += 1
-                time.sleep(0.5)  # Small delay between inserts
-                
+                self._delete_from_knowledge_base(stale[start:start + 500])
+            except Exception as e:
+                logger.warning(f"Could not delete {len(stale[start:start + 500])} stale chunks: {e}")
+        
+        report['chunks'] = {'inserted': report['inserted'], 'failed': report['failed']}
+        report['inserted'] = int(chunks.loc[~failed_docs, 'parent_id'].nunique())
+        report['failed'] = len(failed)
+        report['failed_rows'] = list(failed.values())
+        return report
+    
+    def _insert_local(self, df, batch_size=None, on_batch=None):
+        """Embed and store documents in the local vector store only"""
+        batch_size = batch_size or self.insert_batch_size
+        report = {
+            'inserted': 0,
+            'failed': 0,
+            'batches': [],
+            'failed_rows': []
+        }
+        
+        for start in range(0, len(df), batch_size):
+            batch = df.iloc[start:start + batch_size]
+            started = time.time()
+            try:
+                with OPERATION_SECONDS.time(operation='insert_batch'):
+                    self.local_search.add_documents(batch)
+                inserted, failed_rows = len(batch), []
             except Exception as e:
-                logger.warning(f"Failed to insert document {row.get('doc_id', 'unknown')}: {e}")
+                logger.warning(f"Failed to embed documents for the local vector store: {e}")
+                inserted = 0
+                failed_rows = [{'doc_id': str(doc_id), 'error': str(e)} for doc_id in batch['doc_id']]
+            
+            batch_report = {
+                'batch': len(report['batches']) + 1,
+                'rows': len(batch),
+                'inserted': inserted,
+                'failed': len(failed_rows),
+                'duration_ms': round((time.time() - started) * 1000, 1)
+            }
+            report['batches'].append(batch_report)
+            report['inserted'] += inserted
+            report['failed'] += len(failed_rows)
+            report['failed_rows'].extend(failed_rows)
+            
+            if on_batch:
+                on_batch(batch_report)
+        
+        if report['inserted']:
+            self._record_inserted(df, [row['doc_id'] for row in report['failed_rows']], stored_locally=True)
         
-        return inserted_count
+        return report
+    
+    def _record_inserted(self, df, failed_ids, stored_locally=False):
+        """Update the manifest, indexes and caches after documents were inserted"""
+        added, replaced = self.manifest.record(df, failed_ids=failed_ids)
+        self.category_index.apply_changes(added, replaced)
+        inserted = df[~df['doc_id'].astype(str).isin({str(doc_id) for doc_id in failed_ids})]
+        self.lexical_index.add_documents(inserted)
+        if self.local_search and not stored_locally:
+            try:
+                self.local_search.add_documents(inserted)
+            except Exception as e:
+                # The knowledge base has the documents; the fallback store just lags behind
+                logger.warning(f"Could not add documents to the local vector store: {e}")
+        self.invalidate_caches()
+    
+    def _insert_batch(self, batch, throttle):
+        """Insert one batch, bisecting on failure so a bad row only fails itself.
+        
+        Only row/data errors are bisected, without backing off: they say nothing
+        about MindsDB's load. Connection errors and timeouts do, so they raise
+        the throttle's delay and are re-raised for retry_on_error.
+        """
+        insert_query = build_insert_query(f"{self.database_name}.legal_kb_pg", [values for _, values in batch])
+        
+        throttle.wait()
+        started = time.time()
+        try:
+            # Logged for transparency
+            self._run_query(insert_query, "insert_documents")
+        except Exception as e:
+            if is_connection_error(e) or is_retryable_error(e):
+                throttle.record_error()
+                raise
+            if len(batch) == 1:
+                doc_id = batch[0][0]
+                logger.warning(f"Failed to insert document {doc_id}: {e}")
+                return 0, [{'doc_id': doc_id, 'error': str(e)}]
+            
+            middle = len(batch) // 2
+            left_inserted, left_failed = self._insert_batch(batch[:middle], throttle)
+            right_inserted, right_failed = self._insert_batch(batch[middle:], throttle)
+            return left_inserted + right_inserted, left_failed + right_failed
+        
+        throttle.record_success(time.time() - started)
+        return len(batch), []
+    
+    def delete_documents(self, doc_ids, batch_size=500):
+        """Delete documents from the search backends by doc_id"""
+        doc_ids = list(doc_ids)
+        for start in range(0, len(doc_ids), batch_size):
+            chunk = doc_ids[start:start + batch_size]
+            if self.search_backend != 'local':
+                kb_ids = self._knowledge_base_ids(chunk)
+                for kb_start in range(0, len(kb_ids), batch_size):
+                    self._delete_from_knowledge_base(kb_ids[kb_start:kb_start + batch_size])
+            if self.chunk_map:
+                self.chunk_map.remove(chunk)
+            self.category_index.apply_changes(removed=self.manifest.remove(chunk))
+            self.lexical_index.remove_documents(chunk)
+            if self.local_search:
+                self.local_search.remove_documents(chunk)
+        
+        if doc_ids:
+            self.invalidate_caches()
+            self.lexical_index.save_if_dirty()
+        return len(doc_ids)
     
     @retry_on_error(max_retries=3, delay=2, backoff=2)
-    def semantic_search(self, query, category=None, limit=5):
-        """Perform semantic search on knowledge base"""
+    def _delete_from_knowledge_base(self, doc_ids):
+        """Delete one chunk of documents from the knowledge base"""
         if not self.connected:
             if not self.connect():
                 raise Exception("Failed to connect to MindsDB")
         
-        # Build search query
-        search_query = f"""SELECT
-  id,
-  metadata,
-  chunk_content,
-  relevance
-FROM legalease.legal_kb_pg
-WHERE content LIKE '{query}'"""
+        delete_query = DELETE_DOCUMENTS.render(table=f"{self.database_name}.legal_kb_pg",
+                                               ids=[str(doc_id) for doc_id in doc_ids])
+        self._run_query(delete_query, "delete_documents")
+    
+    def semantic_search(self, query, category=None, limit=5, mode='semantic', rerank=None):
+        """Perform search on knowledge base, served from cache when possible.
+        
+        ``mode`` is 'semantic' (vector lookup on the search backend), 'lexical' (local BM25
+        only) or 'hybrid' (exact titles short-circuit, otherwise BM25 candidates
+        narrow the vector lookup and both rankings are fused).
+        
+        ``rerank`` is 'off', 'always' or 'auto' (only when the top scores are too
+        close to call) and defaults to ``RERANK_MODE``. Each result carries a
+        ``reranked`` flag.
+        """
+        rerank = rerank or self.rerank_mode
+        with OPERATION_SECONDS.time(operation='semantic_search'):
+            cache_key = make_search_key(query, category, limit, mode=mode, rerank=rerank)
+            hit, results = self.search_cache.get(cache_key)
+            if hit:
+                return results
+            
+            if mode == 'lexical':
+                results = self._lexical_search(query, category, limit)
+            elif mode == 'hybrid':
+                results = self._hybrid_search(query, category, limit, rerank=rerank)
+            else:
+                results = self._semantic_search(query, category, limit, rerank=rerank)
+            self.search_cache.set(cache_key, results)
+            return results
+    
+    def _lexical_result(self, doc_id, relevance, match='lexical'):
+        """Build a search result from the lexical index's stored copy of a document"""
+        doc = self.lexical_index.document(doc_id)
+        return {
+            'id': str(doc_id),
+            'content': doc['snippet'],
+            'relevance': float(relevance),
+            'metadata': json.dumps({'title': doc['title'], 'category': doc['category']}),
+            'match': match,
+            'reranked': False
+        }
+    
+    def _lexical_search(self, query, category=None, limit=5):
+        """Rank documents with the local BM25 index only"""
+        ranked = self.lexical_index.search(query, limit, category)
+        top_score = ranked[0][1] if ranked else 1.0
+        return [self._lexical_result(doc_id, score / top_score) for doc_id, score in ranked]
+    
+    def _hybrid_search(self, query, category=None, limit=5, rrf_k=60, rerank=None):
+        """Exact-title short circuit, then BM25-narrowed vector search fused by reciprocal rank"""
+        title_hits = self.lexical_index.find_title(query, category)
+        if title_hits:
+            return [self._lexical_result(doc_id, 1.0, match='title') for doc_id in title_hits[:limit]]
+        
+        lexical = self.lexical_index.search(query, self.hybrid_candidates, category)
+        if not lexical:
+            return self._semantic_search(query, category, limit, rerank=rerank)
+        
+        candidate_ids = [doc_id for doc_id, _ in lexical]
+        semantic = self._semantic_search(query, category, len(candidate_ids), doc_ids=candidate_ids, rerank=rerank)
+        
+        fused = {}
+        for rank, result in enumerate(semantic):
+            result = dict(result, match='hybrid')
+            fused.setdefault(result['id'], [0.0, result])[0] += 1.0 / (rrf_k + rank + 1)
+        top_score = lexical[0][1]
+        for rank, (doc_id, score) in enumerate(lexical):
+            if doc_id not in fused:
+                fused[doc_id] = [0.0, self._lexical_result(doc_id, score / top_score)]
+            fused[doc_id][0] += 1.0 / (rrf_k + rank + 1)
+        
+        ranked = sorted(fused.values(), key=lambda item: item[0], reverse=True)[:limit]
+        return [dict(result, score=round(score, 6)) for score, result in ranked]
+    
+    def semantic_search_batch(self, searches):
+        """Run many searches at once, returning results in request order with timings.
+        
+        ``searches`` is a list of dicts with ``query`` and optional ``category``
+        and ``limit``. When the lookups embed through the embedding cache (local
+        backend, or EMBEDDING_PROXY_URL routing the knowledge base through the
+        proxy), all query texts are embedded in one call up front so the lookups
+        find them cached. Lookups then run concurrently on the shared search
+        executor.
+        """
+        started = time.time()
+        if self.search_backend == 'local' or self.embedding_base_url != self.ollama_base_url:
+            try:
+                self.embedder.embed(list(dict.fromkeys(item['query'] for item in searches)))
+            except Exception as e:
+                logger.warning(f"Batch embedding pre-pass failed, searches will embed individually: {e}")
+        embed_ms = round((time.time() - started) * 1000, 1)
+        
+        def run(item):
+            item_started = time.time()
+            outcome = {
+                'query': item['query'],
+                'category': item.get('category') or None,
+                'limit': item.get('limit', 5)
+            }
+            try:
+                outcome['results'] = self.semantic_search(item['query'], item.get('category'), item.get('limit', 5),
+                                                          mode=item.get('mode', 'semantic'),
+                                                          rerank=item.get('rerank'))
+                outcome['reranked'] = any(result.get('reranked') for result in outcome['results'])
+                outcome['success'] = True
+            except Exception as e:
+                logger.warning(f"Batch search failed for '{item['query']}': {e}")
+                outcome['results'] = []
+                outcome['success'] = False
+                outcome['error'] = str(e)
+            outcome['elapsed_ms'] = round((time.time() - item_started) * 1000, 1)
+            return outcome
+        
+        results = list(self.search_executor.map(run, searches))
+        return {
+            'results': results,
+            'embedding_ms': embed_ms,
+            'elapsed_ms': round((time.time() - started) * 1000, 1)
+        }
+    
+    def _semantic_search(self, query, category=None, limit=5, doc_ids=None, rerank=None):
+        """Run vector search on the configured backend.
         
-        if category:
-            search_query += f" AND JSON_EXTRACT(metadata, '$.category') = '{category}'"
+        In 'auto' mode the local vector store answers while MindsDB is
+        unreachable or when a knowledge base search fails. The local store has
+        no reranker, so its results are never reranked.
+        """
+        if self.search_backend == 'local':
+            return self._local_search(query, category, limit, doc_ids)
         
-        search_query += f" ORDER BY relevance DESC LIMIT {limit};"
+        can_fall_back = self.search_backend == 'auto' and len(self.local_search.store) > 0
+        if can_fall_back and not self.connected:
+            return self._local_search(query, category, limit, doc_ids)
+        try:
+            return self._knowledge_base_search(query, category, limit, doc_ids, rerank or self.rerank_mode)
+        except Exception as e:
+            if not can_fall_back:
+                raise
+            logger.warning(f"Knowledge base search failed, serving from the local vector store: {e}")
+            return self._local_search(query, category, limit, doc_ids)
+    
+    def _local_search(self, query, category=None, limit=5, doc_ids=None):
+        results = self.local_search.semantic_search(query, category, limit, doc_ids)
+        return [dict(result, reranked=False) for result in results]
+    
+    @retry_on_error(max_retries=3, delay=2, backoff=2)
+    def _knowledge_base_search(self, query, category=None, limit=5, doc_ids=None, rerank='always'):
+        """Run semantic search against the knowledge base.
         
-        # Log the query for transparency
-        self._log_query(search_query, "semantic_search")
+        Unless reranking is off, a vector-only query first fetches a bounded
+        candidate pool; the reranker then orders just those candidates, and its
+        ordering is cached per (query, candidate set).
+        """
+        if not self.connected:
+            if not self.connect():
+                raise Exception("Failed to connect to MindsDB")
+        
+        kb_ids = self._knowledge_base_ids(doc_ids)
+        kb_limit = self.knowledge_base_limit(limit)
+        if rerank == 'off':
+            search_query = self.build_search_query(query, category, kb_limit, kb_ids, reranking=False)
+            # Logged for transparency
+            df = self._run_query(search_query, "semantic_search")
+            return self.mark_reranked(self.resolve_chunks(self.parse_search_results(df), limit), False)
+        
+        pool_query = self.build_search_query(query, category, max(kb_limit, self.rerank_candidates), kb_ids,
+                                             reranking=False)
+        candidates = self.parse_search_results(self._run_query(pool_query, "semantic_search"))
+        if not self.needs_rerank(candidates, limit, rerank):
+            return self.mark_reranked(self.resolve_chunks(candidates, limit), False)
+        
+        cache_key = make_rerank_key(query, [result['id'] for result in candidates], limit)
+        hit, results = self.rerank_cache.get(cache_key)
+        if not hit:
+            rerank_query = self.build_rerank_query(query, candidates, kb_limit)
+            with OPERATION_SECONDS.time(operation='rerank'):
+                results = self.parse_search_results(self._run_query(rerank_query, "rerank"))
+            self.rerank_cache.set(cache_key, results)
+        return self.mark_reranked(self.resolve_chunks(results, limit), True)
+    
+    def _knowledge_base_ids(self, doc_ids):
+        """Knowledge base row ids for doc_ids: their chunk ids when chunking is on"""
+        if not self.chunk_map or not doc_ids:
+            return doc_ids
+        chunk_ids = self.chunk_map.chunk_ids(doc_ids)
+        return [kb_id for doc_id in doc_ids for kb_id in chunk_ids.get(str(doc_id), [doc_id])]
+    
+    def knowledge_base_limit(self, limit):
+        """Rows to fetch for ``limit`` documents; chunked documents can take several rows each"""
+        return limit * self.chunk_search_fanout if self.chunk_map else limit
+    
+    def resolve_chunks(self, results, limit):
+        """Collapse chunk hits into documents, keeping each document's best chunk.
         
-        result = self.server.query(search_query)
-        time.sleep(1)  # Allow processing
-        df = result.fetch()
+        Results keep their order, take the doc_id as ``id`` and gain a
+        ``chunk`` entry (chunk id, index and character offsets in the document).
+        """
+        if not self.chunk_map:
+            return results[:limit]
+        spans = self.chunk_map.lookup([result['id'] for result in results])
+        resolved, seen = [], set()
+        for result in results:
+            span = spans.get(result['id'])
+            if span is None:
+                doc_id, chunk = result['id'], None
+            else:
+                doc_id, index, start, end = span
+                chunk = {'id': result['id'], 'index': index, 'start': start, 'end': end}
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            resolved.append(dict(result, id=doc_id, chunk=chunk))
+            if len(resolved) == limit:
+                break
+        return resolved
+    
+    def needs_rerank(self, candidates, limit, rerank):
+        """Decide whether a candidate pool is worth a reranker call.
         
-        # Convert to list of dictionaries
+        'auto' reranks only when the vector scores around the cut-off (the top
+        ``limit`` plus the first excluded candidate) lie within
+        ``rerank_score_margin`` of each other, i.e. the ordering is a toss-up.
+        """
+        if rerank == 'off' or len(candidates) < 2:
+            return False
+        if rerank == 'always':
+            return True
+        scores = [result['relevance'] for result in candidates[:limit + 1]]
+        return max(scores) - min(scores) < self.rerank_score_margin
+    
+    def build_rerank_query(self, query, candidates, limit):
+        """Build the reranked search statement over an already retrieved candidate pool"""
+        return self.build_search_query(query, None, limit, [result['id'] for result in candidates])
+    
+    @staticmethod
+    def mark_reranked(results, reranked):
+        return [dict(result, reranked=reranked) for result in results]
+    
+    def build_search_query(self, query, category=None, limit=5, doc_ids=None, reranking=True):
+        """Build the knowledge base search statement, optionally restricted to candidate doc_ids"""
+        return build_search('legalease.legal_kb_pg', query, category, limit, doc_ids, reranking)
+    
+    @staticmethod
+    def parse_search_results(df):
+        """Convert a knowledge base result DataFrame to a list of dictionaries"""
         results = []
         for _, row in df.iterrows():
             results.append({
-                'id': row.get('id', ''),
+                'id': str(row.get('id', '')),
                 'content': row.get('chunk_content', ''),
                 'relevance': float(row.get('relevance', 0)),
                 'metadata': row.get('metadata', '{}')
@@ -237,6 +1041,38 @@ WHERE content LIKE '{query}'"""
         
         return results
     
+    def invalidate_caches(self):
+        """Drop cached search results and agent answers after the knowledge base changed"""
+        self.search_cache.invalidate()
+        self.agent_cache.invalidate()
+        self.rerank_cache.invalidate()
+    
+    def ask_agent_cached(self, question, ttl=None):
+        """Ask the agent through the answer cache, coalescing identical in-flight questions.
+        
+        Returns ``(answer, source)`` where source is 'cache', 'coalesced' or 'agent'.
+        """
+        cache_key = make_agent_key(question)
+        hit, answer = self.agent_cache.get(cache_key)
+        if hit:
+            return answer, 'cache'
+        
+        def fetch_answer():
+            answer = self.ask_agent(question)
+            if answer != self.NO_ANSWER:
+                self.agent_cache.set(cache_key, answer, ttl)
+            return answer
+        
+        answer, shared = self.agent_flight.do(cache_key, fetch_answer)
+        return answer, 'coalesced' if shared else 'agent'
+    
+    def purge_agent_cache(self, question=None):
+        """Remove one cached answer, or every cached answer when no question is given"""
+        if question:
+            self.agent_cache.delete(make_agent_key(question))
+        else:
+            self.agent_cache.invalidate()
+    
     @retry_on_error(max_retries=3, delay=3, backoff=2)
     def ask_agent(self, question):
         """Ask the AI agent a question"""
@@ -244,21 +1080,76 @@ WHERE content LIKE '{query}'"""
             if not self.connect():
                 raise Exception("Failed to connect to MindsDB")
         
-        agent_query = f"""SELECT answer
-FROM legalease.legal_gemini_agent
-WHERE question = '{question.replace("'", "''")}';"""
+        agent_query = self.build_agent_query(question)
         
-        # Log the query for transparency
-        self._log_query(agent_query, "ask_agent")
-        
-        result = self.server.query(agent_query)
-        time.sleep(2)  # Allow processing
-        df = result.fetch()
+        # Logged for transparency
+        with OPERATION_SECONDS.time(operation='ask_agent'):
+            df = self._run_query(agent_query, "ask_agent", timeout=self.agent_timeout)
         
         if not df.empty:
             return df.iloc[0]['answer']
         else:
-            return "No answer received from the agent."
+            return self.NO_ANSWER
+    
+    def stream_agent(self, question):
+        """Yield the agent's answer in text chunks as MindsDB produces them.
+        
+        Uses the SDK's streaming agent completion; closing the generator (for
+        example when the client disconnects) closes the upstream stream. A fully
+        streamed, non-empty answer is stored in the agent cache. SDK versions without
+        streaming fall back to one chunk holding the whole answer.
+        """
+        if not self.connected:
+            if not self.connect():
+                raise Exception("Failed to connect to MindsDB")
+        
+        # Logged for transparency
+        self._log_query(self.build_agent_query(question), "ask_agent_stream")
+        
+        chunks = []
+        with self._connection() as server:
+            agent = server.get_project(self.database_name).agents.get('legal_gemini_agent')
+            if not hasattr(agent, 'completion_stream'):
+                answer = self.ask_agent(question)
+                if answer and answer != self.NO_ANSWER:
+                    self.agent_cache.set(make_agent_key(question), answer)
+                yield answer
+                return
+            
+            stream = agent.completion_stream([{'question': question, 'answer': None}])
+            try:
+                for chunk in stream:
+                    text = self.chunk_text(chunk)
+                    if text:
+                        chunks.append(text)
+                        yield text
+            finally:
+                close = getattr(stream, 'close', None)
+                if close:
+                    close()
+        
+        answer = ''.join(chunks)
+        if answer.strip():
+            self.agent_cache.set(make_agent_key(question), answer)
+    
+    @staticmethod
+    def chunk_text(chunk):
+        """Extract answer text from a streamed completion chunk"""
+        if isinstance(chunk, str):
+            return chunk
+        if isinstance(chunk, dict):
+            if chunk.get('type') == 'error':
+                raise Exception(chunk.get('error') or chunk.get('content') or 'Agent stream failed')
+            # Start/end and step chunks carry no answer text
+            for field in ('output', 'content', 'text', 'answer'):
+                if isinstance(chunk.get(field), str):
+                    return chunk[field]
+            return ''
+        return str(getattr(chunk, 'content', '') or '')
+    
+    def build_agent_query(self, question):
+        """Build the agent question statement"""
+        return AGENT_QUESTION.render(agent='legalease.legal_gemini_agent', question=question)
     
     @retry_on_error(max_retries=2, delay=1, backoff=1)
     def get_categories(self):
@@ -268,24 +1159,46 @@ WHERE question = '{question.replace("'", "''")}';"""
                 raise Exception("Failed to connect to MindsDB")
         
         try:
-            category_query = """SELECT DISTINCT JSON_EXTRACT(metadata, '$.category') as category
-FROM legalease.legal_kb_pg
-WHERE JSON_EXTRACT(metadata, '$.category') IS NOT NULL
-ORDER BY category;"""
-            
-            result = self.server.query(category_query)
-            df = result.fetch()
+            df = self._run_query(self.CATEGORY_QUERY)
             categories = [row['category'] for _, row in df.iterrows() if row['category']]
             return categories
         except Exception as e:
             logger.warning(f"Could not fetch categories: {e}")
-            return ['Criminal Law', 'Civil Rights', 'Constitutional Law', 'Contract Law', 'Corporate Law']
+            return list(self.DEFAULT_CATEGORIES)
+    
+    @retry_on_error(max_retries=2, delay=1, backoff=1)
+    def get_category_counts(self):
+        """Get per-category document counts from the knowledge base"""
+        if not self.connected:
+            if not self.connect():
+                raise Exception("Failed to connect to MindsDB")
+        
+        try:
+            df = self._run_query(self.CATEGORY_COUNT_QUERY)
+            # JSON_EXTRACT may return the JSON-quoted string
+            return {str(row['category']).strip('"'): int(row['documents']) for _, row in df.iterrows() if row['category']}
+        except Exception as e:
+            # Older MindsDB versions can't aggregate knowledge base metadata
+            logger.warning(f"Could not count categories, falling back to DISTINCT: {e}")
+            df = self._run_query(self.CATEGORY_QUERY)
+            return {str(row['category']).strip('"'): 1 for _, row in df.iterrows() if row['category']}
+    
+    def _load_category_counts(self):
+        """Category counts from the knowledge base, or from the manifest when searching locally.
+        
+        The manifest is also used when chunking, since knowledge base rows are chunks then.
+        """
+        if self.search_backend == 'local' or self.chunk_map:
+            return self.manifest.category_counts()
+        return self.get_category_counts()
     
     def get_last_queries(self, limit=5):
         """Get the last executed queries for transparency"""
-        return self.last_queries[-limit:] if self.last_queries else []
+        with self._queries_lock:
+            return list(self.last_queries)[-limit:]
     
     @retry_on_error(max_retries=3, delay=2, backoff=2)
+    @with_connection
     def create_job(self, job_name, job_type, schedule, custom_query=None):
         """Create a new MindsDB job"""
         if not self.connected:
@@ -294,16 +1207,23 @@ ORDER BY category;"""
         
         logger.info(f"Starting job creation - Name: {job_name}, Type: {job_type}, Schedule: {schedule}")
         
+        try:
+            identifier(job_name)
+        except ValueError:
+            return {
+                'success': False,
+                'error': f'Invalid job name "{job_name}": use letters, digits and underscores'
+            }
+        
         # Switch to legalease project first
         try:
             switch_query = "USE legalease;"
-            self.server.query(switch_query)
+            self._run_query(switch_query)
             logger.info("Switched to legalease project for job creation")
             
             # Verify current project
             verify_query = "SELECT DATABASE();"
-            verify_result = self.server.query(verify_query)
-            current_db = verify_result.fetch()
+            current_db = self._run_query(verify_query)
             logger.info(f"Current database after switch: {current_db}")
             
         except Exception as e:
@@ -352,36 +1272,10 @@ AS (
         self._log_query(job_query, "create_job")
         
         try:
-            result = self.server.query(job_query)
-            logger.info(f"Job creation query executed, result type: {type(result)}")
+            result_df = self._run_query(job_query)
+            logger.info(f"Job creation result DataFrame: {result_df}")
             
-            # Try to get more details about the result
-            try:
-                result_df = result.fetch()
-                logger.info(f"Job creation result DataFrame: {result_df}")
-            except Exception as fetch_e:
-                logger.info(f"Could not fetch result DataFrame: {fetch_e}")
-            
-            time.sleep(2)  # Allow more processing time
-              # Immediately verify the job was created by checking SHOW JOBS from legalease
-            try:
-                verify_jobs_query = "SHOW JOBS FROM legalease;"
-                verify_result = self.server.query(verify_jobs_query)
-                verify_df = verify_result.fetch()
-                logger.info(f"Verification: SHOW JOBS FROM legalease returned {len(verify_df)} jobs after creation")
-                if len(verify_df) > 0:
-                    job_names = verify_df['NAME'].tolist() if 'NAME' in verify_df.columns else []
-                    logger.info(f"Jobs found in legalease: {job_names}")
-                    if job_name in job_names:
-                        logger.info(f"SUCCESS: Job '{job_name}' found in legalease project!")
-                    else:
-                        logger.warning(f"WARNING: Job '{job_name}' NOT found in legalease project!")
-                        logger.info(f"Expected job name: {job_name}")
-                        logger.info(f"Available jobs: {job_names}")
-                else:
-                    logger.warning("WARNING: No jobs found in legalease project after creation!")
-            except Exception as verify_e:
-                logger.error(f"Could not verify job creation in legalease: {verify_e}")
+            self._update_jobs_snapshot(add=self._job_entry(job_name, 'legalease', job_query, schedule))
             
             logger.info(f"Job creation completed for: {job_name}")
             return {
@@ -402,96 +1296,212 @@ AS (
             else:
                 raise e
     
+    def list_jobs(self, refresh=False):
+        """List all active MindsDB jobs.
+        
+        Served from a snapshot for ``JOBS_CACHE_TTL`` seconds; ``create_job`` and
+        ``stop_job`` update it in place, and concurrent refreshes share one fetch.
+        """
+        if not refresh:
+            with self._jobs_lock:
+                snapshot = self._jobs_snapshot
+            if snapshot is not None and time.time() - snapshot[1] < self.jobs_cache_ttl:
+                return [dict(job) for job in snapshot[0]]
+        
+        try:
+            jobs, _ = self.jobs_flight.do('jobs', self._fetch_jobs)
+        except Exception as e:
+            logger.error(f"Could not fetch jobs: {e}")
+            # Keep showing the last known jobs rather than an empty page
+            with self._jobs_lock:
+                snapshot = self._jobs_snapshot
+            return [dict(job) for job in snapshot[0]] if snapshot else []
+        return [dict(job) for job in jobs]
+    
     @retry_on_error(max_retries=2, delay=1, backoff=1)
-    def list_jobs(self):
-        """List all active MindsDB jobs"""
+    @with_connection
+    def _fetch_jobs(self):
+        """Fetch jobs with the detected listing query and store them as the snapshot"""
         if not self.connected:
             if not self.connect():
                 raise Exception("Failed to connect to MindsDB")
         
-        try:
-            # First, switch to legalease project
-            switch_query = "USE legalease;"
-            self.server.query(switch_query)
-            logger.info("Switched to legalease project")
-            
-            # Check current project
-            project_query = "SELECT DATABASE();"
-            result = self.server.query(project_query)
-            current_project = result.fetch()
-            logger.info(f"Current project after switch: {current_project}")
-              # Try different variations of SHOW JOBS with more comprehensive queries, prioritizing legalease project
-            queries_to_try = [
-                "SHOW JOBS FROM legalease;",  # Try legalease project first
-                "SHOW JOBS;",
-                "SHOW JOBS FROM mindsdb;",
-                "SELECT * FROM legalease.information_schema.jobs;",
-                "SELECT * FROM information_schema.jobs;",
-                "SELECT * FROM mindsdb.information_schema.jobs;",
-                "SELECT * FROM mindsdb.jobs;",
-                "SHOW FULL JOBS;"
-            ]
-            
-            jobs = []
-            for query in queries_to_try:
-                try:
-                    logger.info(f"Trying query: {query}")
-                    self._log_query(query, "list_jobs")
-                    
-                    result = self.server.query(query)
-                    time.sleep(1)  # Allow processing
-                    df = result.fetch()
-                    
-                    logger.info(f"Query '{query}' returned {len(df)} rows")
-                    if len(df) > 0:
-                        logger.info(f"DataFrame columns: {df.columns.tolist()}")
-                        logger.info(f"Sample data: {df.head().to_dict()}")
-                    
-                    if len(df) > 0:
-                        # Found jobs, process them
-                        for _, row in df.iterrows():
-                            logger.info(f"Processing job row: {row.to_dict()}")
-                            
-                            # Map MindsDB column names to our format using the actual column names
-                            job_name = (row.get('NAME') or row.get('name') or 
-                                       row.get('job_name') or row.get('JOB_NAME') or str(row.iloc[0] if len(row) > 0 else ''))
-                            
-                            job_project = (row.get('PROJECT') or row.get('project') or '')
-                            job_schedule = (row.get('SCHEDULE_STR') or row.get('schedule_str') or 
-                                          row.get('SCHEDULE') or row.get('schedule') or '')
-                            
-                            job_query = (row.get('QUERY') or row.get('query') or '')
-                            job_status = (row.get('STATUS') or row.get('status') or 'active')
-                            
-                            # Only include jobs if they have a name
-                            if job_name and job_name.strip():
-                                jobs.append({
-                                    'id': job_name,
-                                    'name': job_name,
-                                    'project': job_project,
-                                    'type': str(job_query)[:50] + '...' if len(str(job_query)) > 50 else str(job_query),
-                                    'status': str(job_status) if job_status else 'active',
-                                    'schedule': str(job_schedule),
-                                    'created_at': str(row.get('START_AT') or row.get('start_at') or ''),
-                                    'last_run': str(row.get('NEXT_RUN_AT') or row.get('next_run_at') or '')
-                                })
-                        
-                        logger.info(f"Successfully found {len(jobs)} jobs using query: {query}")
-                        if jobs:  # Only break if we actually found jobs
-                            break
-                        
-                except Exception as query_e:
-                    logger.warning(f"Query '{query}' failed: {query_e}")
-                    continue
-            
-            logger.info(f"Returning {len(jobs)} jobs")
-            return jobs
-            
-        except Exception as e:
-            logger.error(f"Could not fetch jobs: {e}")
-            logger.error(f"Exception type: {type(e)}")
-            # Return empty list instead of mock data to see the real issue
+        jobs = None
+        if self._jobs_query is not None:
+            try:
+                jobs = self._run_jobs_query(*self._jobs_query)
+            except Exception as e:
+                logger.warning(f"Job listing query '{self._jobs_query[0]}' stopped working, re-detecting: {e}")
+                self._jobs_query = None
+        if jobs is None:
+            jobs = self._detect_jobs_query()
+        
+        with self._jobs_lock:
+            self._jobs_snapshot = (jobs, time.time())
+        return jobs
+    
+    def _run_jobs_query(self, query, scoped):
+        if scoped:
+            self._run_query("USE legalease;")
+        with OPERATION_SECONDS.time(operation='list_jobs'):
+            df = self._run_query(query, "list_jobs")
+        return [job for job in (self._job_from_row(row) for _, row in df.iterrows()) if job]
+    
+    def _detect_jobs_query(self):
+        """Find the job listing query this MindsDB accepts.
+        
+        The first query that returns jobs wins; when no jobs exist yet the first
+        query that ran without error is remembered instead.
+        """
+        first_working = None
+        for query, scoped in self.JOB_LISTING_QUERIES:
+            try:
+                with OPERATION_SECONDS.time(operation='list_jobs_probe'):
+                    jobs = self._run_jobs_query(query, scoped)
+            except Exception as e:
+                logger.debug(f"Job listing query '{query}' rejected: {e}")
+                continue
+            if jobs:
+                first_working = (query, scoped, jobs)
+                break
+            if first_working is None:
+                first_working = (query, scoped, jobs)
+        
+        if first_working is None:
+            raise Exception("MindsDB rejected every job listing query")
+        query, scoped, jobs = first_working
+        self._jobs_query = (query, scoped)
+        logger.info(f"Using '{query}' to list jobs")
+        return jobs
+    
+    @staticmethod
+    def _job_entry(name, project, query, schedule, status='active', created_at='', last_run=''):
+        query = str(query)
+        return {
+            'id': name,
+            'name': name,
+            'project': project,
+            'type': query[:50] + '...' if len(query) > 50 else query,
+            'status': str(status) if status else 'active',
+            'schedule': str(schedule),
+            'created_at': str(created_at),
+            'last_run': str(last_run)
+        }
+    
+    @classmethod
+    def _job_from_row(cls, row):
+        """Map a job listing row (column names vary by MindsDB version) to our format"""
+        name = (row.get('NAME') or row.get('name') or
+                row.get('job_name') or row.get('JOB_NAME') or str(row.iloc[0] if len(row) > 0 else ''))
+        if not name or not str(name).strip():
+            return None
+        return cls._job_entry(
+            str(name),
+            row.get('PROJECT') or row.get('project') or '',
+            row.get('QUERY') or row.get('query') or '',
+            row.get('SCHEDULE_STR') or row.get('schedule_str') or row.get('SCHEDULE') or row.get('schedule') or '',
+            status=row.get('STATUS') or row.get('status') or 'active',
+            created_at=row.get('START_AT') or row.get('start_at') or '',
+            last_run=row.get('NEXT_RUN_AT') or row.get('next_run_at') or ''
+        )
+    
+    def _update_jobs_snapshot(self, add=None, remove=None):
+        """Apply a created or dropped job to the snapshot without re-listing"""
+        with self._jobs_lock:
+            if self._jobs_snapshot is None:
+                return
+            jobs, fetched_at = self._jobs_snapshot
+            names = {remove, add['name'] if add else None} - {None}
+            jobs = [job for job in jobs if job['name'] not in names]
+            if add:
+                jobs.append(add)
+            self._jobs_snapshot = (jobs, fetched_at)
+    
+    @retry_on_error(max_retries=2, delay=1, backoff=1)
+    @with_connection
+    def fetch_job_runs(self, since=None):
+        """Return job runs from MindsDB's job history that started at or after ``since``"""
+        since_clause = ''
+        if since:
+            since_clause = RUN_START_SINCE.render(since=str(since))
+        
+        candidates = self.JOB_HISTORY_QUERIES
+        if self._job_history_query is not None:
+            candidates = (self._job_history_query,)
+        last_error = None
+        for template in candidates:
+            try:
+                with OPERATION_SECONDS.time(operation='job_history'):
+                    df = self._run_query(template.format(since=since_clause))
+            except Exception as e:
+                logger.debug(f"Job history query '{template}' rejected: {e}")
+                last_error = e
+                continue
+            self._job_history_query = template
+            return self._job_runs_from_frame(df)
+        
+        # The remembered table may be gone after an upgrade; probe again next poll
+        self._job_history_query = None
+        raise Exception(f"Could not read job history: {last_error}")
+    
+    @staticmethod
+    def _job_runs_from_frame(df):
+        """Map job history rows to run dicts with epoch timestamps, vectorized over the frame"""
+        if df is None or df.empty:
             return []
+        df = df.rename(columns=str.lower)
+        for column in ('name', 'project', 'run_start', 'run_end', 'error', 'query'):
+            if column not in df.columns:
+                df[column] = None
+        df = df[df['name'].notna() & df['run_start'].notna()]
+        
+        epoch = pd.Timestamp(0, tz='UTC')
+        started = (pd.to_datetime(df['run_start'], errors='coerce', utc=True) - epoch).dt.total_seconds()
+        finished = (pd.to_datetime(df['run_end'], errors='coerce', utc=True) - epoch).dt.total_seconds()
+        duration = (finished - started).clip(lower=0)
+        is_ingest = df['query'].fillna('').astype(str).str.contains(r'\bINSERT\s+INTO\b', case=False, regex=True)
+        errors = df['error'].where(df['error'].notna() & (df['error'].astype(str).str.strip() != ''), None)
+        
+        def value(item):
+            return None if pd.isna(item) else item
+        
+        return [
+            {
+                'job_name': str(name),
+                'project': value(project),
+                'run_start': str(run_start),
+                'run_end': None if value(run_end) is None else str(run_end),
+                'started_at': value(start),
+                'finished_at': value(end),
+                'duration_s': value(seconds),
+                'rows_affected': None,
+                'error': None if value(error) is None else str(error),
+                'is_ingest': int(ingest)
+            }
+            for name, project, run_start, run_end, start, end, seconds, error, ingest in zip(
+                df['name'], df['project'], df['run_start'], df['run_end'],
+                started, finished, duration, errors, is_ingest
+            )
+        ]
+    
+    def count_external_documents(self):
+        """Knowledge base rows not written through this app (scheduled ingest jobs).
+        
+        ``None`` when the knowledge base can't be counted, e.g. with the local backend.
+        """
+        if self.search_backend == 'local':
+            return None
+        df = self._run_query("SELECT COUNT(*) AS documents FROM legalease.legal_kb_pg;")
+        if df.empty:
+            return None
+        written = self.chunk_map.count() if self.chunk_map else self.manifest.count()
+        return int(df.iloc[0, 0]) - written
+    
+    def get_job_runs(self, job_name, limit=50, refresh=False):
+        """Runs, run-time statistics, duration trend and alerts for one job"""
+        if refresh or self.job_history.polled_at is None:
+            self.job_history.poll()
+        return self.job_history.report(job_name, limit, **self.job_alert_thresholds)
     
     @retry_on_error(max_retries=2, delay=1, backoff=1)
     def stop_job(self, job_name):
@@ -507,21 +1517,25 @@ AS (
             else:
                 full_job_name = job_name
                 
-            stop_query = f"DROP JOB {full_job_name};"
+            stop_query = DROP_JOB.render(job=full_job_name)
             logger.info(f"Attempting to stop job with query: {stop_query}")
             
-            self._log_query(stop_query, "stop_job")
-            
-            result = self.server.query(stop_query)
-            time.sleep(1)  # Allow processing
+            self._run_query(stop_query, "stop_job")
+            self._update_jobs_snapshot(remove=full_job_name.split('.', 1)[1])
             
             return {
                 'success': True,
                 'message': f'Job "{job_name}" stopped successfully'
             }
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': f'Invalid job name "{job_name}": {e}'
+            }
         except Exception as e:
             logger.error(f"Failed to stop job '{job_name}': {e}")
             if 'does not exist' in str(e).lower():
+                self._update_jobs_snapshot(remove=full_job_name.split('.', 1)[1])
                 return {
                     'success': False,
                     'error': f'Job "{job_name}" does not exist'
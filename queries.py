@@ -3,6 +3,8 @@ import time
 from functools import wraps
 import requests
 
+from query_builder import escape_text
+
 def retry_on_litellm_error(max_retries=3, delay=2, backoff=2):
     """Decorator to retry function calls when litellm errors occur"""
     def decorator(func):
@@ -233,7 +235,7 @@ def run_semantic_search(server, question):
   chunk_content,
   relevance
 FROM legalease.legal_kb_pg
-WHERE content LIKE '{question}'
+WHERE content LIKE '{escape_text(question)}'
 ORDER BY relevance DESC
 LIMIT 5;"""
     
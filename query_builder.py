@@ -0,0 +1,211 @@
+"""
+LegalEase AI typed SQL statement templates for MindsDB
+"""
+import re
+import string
+
+import pandas as pd
+
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*")
+
+# A run of backslashes right before a quote, or at the end of the text. MindsDB's
+# lexer pairs a backslash with whatever follows it, so these runs are the only
+# places where content could end or escape the surrounding literal.
+_BACKSLASH_RUN = re.compile(r"(\\*)(['\"]|\Z)")
+
+
+def _escape_run(match):
+    run, char = len(match.group(1)), match.group(2)
+    if char == "'":
+        # Even runs keep pairing among themselves, so the quote gets its own
+        # backslash; odd runs get one more backslash and a doubled quote
+        if run == 0:
+            return "''"
+        return '\\' * run + ("\\'" if run % 2 == 0 else "\\''")
+    if char == '"':
+        # The parser turns \" into ", which would eat one backslash of the run
+        return '\\' * (run + 1 if run else 0) + '"'
+    # End of text: keep the run even so it can't escape the closing quote.
+    # An even run loses one backslash, which the parser cannot represent.
+    return '\\' * (run + 1 if run % 2 else run)
+
+
+def escape_text(text):
+    """Escape text for use inside a single-quoted MindsDB string literal"""
+    text = str(text)
+    if '\\' not in text:
+        return text.replace("'", "''")
+    return _BACKSLASH_RUN.sub(_escape_run, text)
+
+
+def quote(value):
+    """Render a string literal"""
+    return f"'{escape_text(value)}'"
+
+
+def quote_series(series):
+    """Render a whole column of string literals at once.
+
+    Quotes are doubled with one vectorized replace; only values containing a
+    backslash take the slower per-value path.
+    """
+    values = series.astype(str)
+    escaped = values.str.replace("'", "''", regex=False)
+    has_backslash = values.str.contains('\\', regex=False)
+    if has_backslash.any():
+        escaped = escaped.mask(has_backslash, values[has_backslash].map(escape_text))
+    return "'" + escaped + "'"
+
+
+def identifier(name):
+    """Validate a (dot-qualified) identifier such as ``legalease.legal_kb_pg``"""
+    name = str(name)
+    if not IDENTIFIER_PATTERN.fullmatch(name):
+        raise ValueError(f"Invalid identifier: {name!r}")
+    return name
+
+
+def integer(value):
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid integer: {value!r}")
+    return str(int(value))
+
+
+def boolean(value):
+    return 'true' if value else 'false'
+
+
+def string_list(values):
+    """Render ``'a', 'b', ...`` for an IN list"""
+    values = list(values)
+    if not values:
+        raise ValueError("Empty IN list")
+    return ', '.join(quote(value) for value in values)
+
+
+def sql(fragment):
+    """Trusted SQL built by another template (or a fixed clause); passed through as is"""
+    return '' if fragment is None else str(fragment)
+
+
+RENDERERS = {
+    'str': quote,
+    'int': integer,
+    'bool': boolean,
+    'ident': identifier,
+    'str_list': string_list,
+    'sql': sql
+}
+
+
+class Template:
+    """A SQL statement compiled once into literal parts and typed placeholders.
+
+    Placeholders are written ``{name:type}`` with a type from ``RENDERERS``;
+    every value is rendered by its type, so user input always ends up inside
+    a literal or is rejected with ``ValueError``.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self._parts = []
+        self.fields = {}
+        for literal, name, kind, conversion in string.Formatter().parse(text):
+            if conversion:
+                raise ValueError(f"Conversions are not supported in SQL templates: {name}!{conversion}")
+            if name is None:
+                self._parts.append((literal, None, None))
+                continue
+            if kind not in RENDERERS:
+                raise ValueError(f"Unknown placeholder type '{kind}' for '{name}'")
+            self.fields[name] = kind
+            self._parts.append((literal, name, RENDERERS[kind]))
+
+    def render(self, **values):
+        missing = set(self.fields) - set(values)
+        if missing:
+            raise KeyError(f"Missing SQL template values: {', '.join(sorted(missing))}")
+        out = []
+        for literal, name, render in self._parts:
+            out.append(literal)
+            if name is not None:
+                out.append(render(values[name]))
+        return ''.join(out)
+
+
+SEARCH = Template("""SELECT
+  id,
+  metadata,
+  chunk_content,
+  relevance
+FROM {table:ident}
+WHERE content LIKE {query:str}{filters:sql} ORDER BY relevance DESC LIMIT {limit:int};""")
+CATEGORY_FILTER = Template(" AND JSON_EXTRACT(metadata, '$.category') = {category:str}")
+ID_FILTER = Template(" AND id IN ({ids:str_list})")
+NO_RERANKING = " AND reranking = false"
+
+AGENT_QUESTION = Template("""SELECT answer
+FROM {agent:ident}
+WHERE question = {question:str};""")
+
+INSERT_DOCUMENTS = Template("INSERT INTO {table:ident} (doc_id, title, category, content) VALUES\n{rows:sql};")
+DELETE_DOCUMENTS = Template("DELETE FROM {table:ident} WHERE id IN ({ids:str_list});")
+
+DROP_JOB = Template("DROP JOB {job:ident};")
+RUN_START_SINCE = Template(" AND run_start >= {since:str}")
+
+
+def build_search(table, query, category=None, limit=5, doc_ids=None, reranking=True):
+    filters = []
+    if category:
+        filters.append(CATEGORY_FILTER.render(category=category))
+    if doc_ids:
+        filters.append(ID_FILTER.render(ids=[str(doc_id) for doc_id in doc_ids]))
+    if not reranking:
+        filters.append(NO_RERANKING)
+    return SEARCH.render(table=table, query=query, filters=''.join(filters), limit=limit)
+
+
+DOCUMENT_TEXT_COLUMNS = ('title', 'category', 'content')
+
+
+def render_document_values(df, text_ids=False):
+    """Render every row of a document DataFrame as a VALUES tuple in one pass.
+
+    Returns ``(rows, rejected)``: ``rows`` is a DataFrame with ``doc_id``,
+    ``values`` (the SQL tuple) and ``size`` (UTF-8 bytes), ``rejected`` lists
+    ``{'doc_id', 'error'}`` for rows with a non-integer doc_id or a missing field.
+    With ``text_ids`` (chunk ids such as ``'42#0'``) doc_ids are rendered as
+    string literals instead and only need to be present.
+    """
+    if text_ids:
+        doc_ids = df['doc_id']
+        bad_id = doc_ids.isna()
+    else:
+        doc_ids = pd.to_numeric(df['doc_id'], errors='coerce')
+        bad_id = doc_ids.isna() | (doc_ids != doc_ids.round())
+    missing = pd.Series(False, index=df.index)
+    for column in DOCUMENT_TEXT_COLUMNS:
+        missing |= df[column].isna()
+
+    rejected = [
+        {'doc_id': doc_id, 'error': ('doc_id is missing' if text_ids else 'doc_id is not an integer')
+         if is_bad_id else 'missing title, category or content'}
+        for doc_id, is_bad_id in zip(df.loc[bad_id | missing, 'doc_id'], bad_id[bad_id | missing])
+    ]
+
+    valid = df[~(bad_id | missing)]
+    if text_ids:
+        values = '(' + quote_series(valid['doc_id'])
+    else:
+        values = '(' + doc_ids[valid.index].astype('int64').astype(str)
+    for column in DOCUMENT_TEXT_COLUMNS:
+        values = values + ', ' + quote_series(valid[column])
+    values = values + ')'
+
+    rows = pd.DataFrame({
+        'doc_id': valid['doc_id'],
+        'values': values,
+        'size': values.str.encode('utf-8').str.len()
+    })
+    return rows, rejected
@@ -0,0 +1,226 @@
+"""
+LegalEase AI text extraction for PDF, plain-text and zip uploads
+"""
+import hashlib
+import io
+import logging
+import os
+import re
+import zipfile
+from collections import deque
+
+import pandas as pd
+
+from chunking import worker_pool
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_EXTENSIONS = ('pdf', 'txt')
+ARCHIVE_EXTENSIONS = ('zip',)
+TEXT_ENCODINGS = ('utf-8-sig', 'cp1252', 'latin-1')
+
+# Extracted documents get negative doc_ids, a range CSV uploads may not use,
+# with magnitudes that survive JSON number round trips
+HASHED_ID_BITS = 52
+LEADING_ID = re.compile(r'^(\d{1,15})(?=$|[\s_.\-])')
+HYPHENATED_BREAK = re.compile(r'(?<=[a-z])-\n(?=[a-z])')
+
+
+def extension(name):
+    return name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+
+
+def is_document_upload(filename):
+    """Whether an upload goes through text extraction rather than the CSV reader"""
+    return extension(filename) in DOCUMENT_EXTENSIONS + ARCHIVE_EXTENSIONS
+
+
+def pdf_support():
+    """Whether the optional ``pypdf`` package is installed"""
+    try:
+        import pypdf  # noqa: F401  optional dependency, only needed for PDF uploads
+    except ImportError:
+        return False
+    return True
+
+
+def list_sources(filepath, filename, max_member_bytes=None):
+    """Return ``(sources, skipped)`` for an upload.
+
+    ``sources`` are ``(member, size)`` pairs (member is None for a single file);
+    ``skipped`` lists archive members that won't be extracted, with a reason.
+    """
+    if extension(filename) not in ARCHIVE_EXTENSIONS:
+        return [(None, os.path.getsize(filepath))], []
+
+    sources, skipped = [], []
+    with zipfile.ZipFile(filepath) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            base = name.rsplit('/', 1)[-1]
+            if info.is_dir() or name.startswith('__MACOSX/') or base.startswith('.'):
+                continue
+            if extension(name) not in DOCUMENT_EXTENSIONS:
+                skipped.append({'file': name, 'reason': 'unsupported file type'})
+            elif max_member_bytes and info.file_size > max_member_bytes:
+                skipped.append({'file': name, 'reason': f'larger than {max_member_bytes} bytes uncompressed'})
+            else:
+                sources.append((name, info.compress_size))
+    return sources, skipped
+
+
+def read_text(data):
+    """Decode a plain-text document, falling back through common legacy encodings"""
+    for encoding in TEXT_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='replace')
+
+
+def read_pdf(data):
+    """Return ``(text, pages, title)`` for a PDF; pages are joined by blank lines"""
+    import pypdf  # optional dependency, only needed for PDF uploads
+
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    pages = [page.extract_text() or '' for page in reader.pages]
+    title = None
+    try:
+        title = reader.metadata.title if reader.metadata else None
+    except Exception:
+        pass
+    text = HYPHENATED_BREAK.sub('', '\n\n'.join(page.strip() for page in pages))
+    return text, len(pages), title
+
+
+def extract_source(filepath, member=None):
+    """Process pool entry point: extract one file or archive member.
+
+    Returns a dict with ``name``, ``text``, ``pages`` and ``title`` (from PDF
+    metadata), or ``name`` and ``error`` when the file can't be read.
+    """
+    name = member or os.path.basename(filepath)
+    try:
+        if member is None:
+            with open(filepath, 'rb') as handle:
+                data = handle.read()
+        else:
+            with zipfile.ZipFile(filepath) as archive:
+                data = archive.read(member)
+
+        if extension(name) == 'pdf':
+            text, pages, title = read_pdf(data)
+        else:
+            text, title = read_text(data), None
+            # Form feeds separate pages in text exports of opinions
+            pages = text.count('\f') + 1
+            text = text.replace('\f', '\n\n')
+        return {'name': name, 'text': text, 'pages': pages, 'title': title}
+    except ImportError:
+        return {'name': name, 'error': 'PDF extraction needs the pypdf package'}
+    except Exception as e:
+        return {'name': name, 'error': f'could not extract text: {e}'}
+
+
+def document_id(name):
+    """Negative doc_id from a stable hash of the file path, so re-uploads replace the document"""
+    digest = hashlib.blake2b(name.lower().encode('utf-8'), digest_size=8).digest()
+    return -1 - (int.from_bytes(digest, 'big') >> (64 - HASHED_ID_BITS))
+
+
+def is_extracted_id(doc_id):
+    """Whether a doc_id is in the namespace of extracted documents"""
+    return str(doc_id).startswith('-')
+
+
+def document_title(name, text, metadata_title=None):
+    """Title from PDF metadata, else the file name, else the first line of text"""
+    if metadata_title and metadata_title.strip():
+        return metadata_title.strip()
+    stem = os.path.splitext(os.path.basename(name))[0]
+    stem = LEADING_ID.sub('', stem)
+    stem = re.sub(r'[_\s]+', ' ', stem).strip(' -.')
+    if re.search(r'[^\W\d]', stem):
+        return stem
+    for line in text.splitlines():
+        if line.strip():
+            return line.strip()[:200]
+    return stem or name
+
+
+def document_category(name, default_category):
+    """Category from the innermost archive folder, else the upload's default"""
+    folder = os.path.dirname(name).rsplit('/', 1)[-1].strip()
+    return folder.replace('_', ' ') if folder else default_category
+
+
+class DocumentExtractor:
+    """Extract text from uploaded documents on a process pool.
+
+    Files are extracted on the shared worker pool with a few per worker in
+    flight, and come back in upload order as document rows
+    ready for validation and the regular knowledge base insert path.
+    """
+
+    def __init__(self, workers=None, max_member_bytes=256 * 1024 * 1024, default_category='General'):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_member_bytes = max_member_bytes
+        self.default_category = default_category
+
+    def _extracted(self, filepath, sources):
+        """Yield ``(extracted, size)`` per source in order, keeping a few per worker in flight"""
+        if self.workers <= 1 or len(sources) < 2:
+            for member, size in sources:
+                yield extract_source(filepath, member), size
+            return
+
+        pool = worker_pool(self.workers)
+        pending = deque()
+        for member, size in sources:
+            pending.append((pool.submit(extract_source, filepath, member), size))
+            if len(pending) >= self.workers * 4:
+                future, done_size = pending.popleft()
+                yield future.result(), done_size
+        while pending:
+            future, done_size = pending.popleft()
+            yield future.result(), done_size
+
+    def iter_chunks(self, filepath, filename, chunk_rows=500, category=None):
+        """Yield ``(chunk, bytes_read, bytes_total, pages, rejected)`` like a CSV upload.
+
+        ``chunk`` has the knowledge base columns plus ``source`` (the file
+        name); ``rejected`` lists files that produced no document, with a reason.
+        """
+        category = category or self.default_category
+        sources, skipped = list_sources(filepath, filename, self.max_member_bytes)
+        bytes_total = sum(size for _, size in sources) or 1
+        rejected = [{'row': None, 'doc_id': None, 'file': row['file'], 'reason': row['reason']} for row in skipped]
+        rows, pages, bytes_read = [], 0, 0
+
+        for extracted, size in self._extracted(filepath, sources):
+            bytes_read += size
+            name = filename if len(sources) == 1 and sources[0][0] is None else extracted['name']
+            doc_id = document_id(name)
+            if 'error' in extracted:
+                rejected.append({'row': None, 'doc_id': str(doc_id), 'file': name, 'reason': extracted['error']})
+            elif not extracted['text'].strip():
+                reason = 'no extractable text (scanned PDF?)' if extension(name) == 'pdf' else 'empty file'
+                rejected.append({'row': None, 'doc_id': str(doc_id), 'file': name, 'reason': reason})
+            else:
+                pages += extracted['pages']
+                rows.append({
+                    'doc_id': doc_id,
+                    'title': document_title(name, extracted['text'], extracted['title']),
+                    'category': document_category(name, category),
+                    'content': extracted['text'],
+                    'source': name
+                })
+
+            if len(rows) >= chunk_rows:
+                yield pd.DataFrame(rows), bytes_read, bytes_total, pages, rejected
+                rows, pages, rejected = [], 0, []
+
+        if rows or rejected:
+            chunk = pd.DataFrame(rows, columns=['doc_id', 'title', 'category', 'content', 'source'])
+            yield chunk, bytes_read, bytes_total, pages, rejected
@@ -0,0 +1,282 @@
+"""
+LegalEase AI background ingestion jobs
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from ingest import iter_csv_chunks
+from ingest_validation import DocumentValidator, RejectionReport, coerce_ids
+from text_extraction import is_document_upload, is_extracted_id
+
+logger = logging.getLogger(__name__)
+
+JOB_COLUMNS = [
+    'id', 'filename', 'status', 'rows_parsed', 'batches_sent', 'documents_embedded',
+    'failures', 'failed_rows', 'error', 'created_at', 'started_at', 'finished_at',
+    'bytes_read', 'bytes_total', 'mode', 'changes', 'rows_rejected', 'rejected', 'category', 'pages_extracted'
+]
+
+# Columns added after the table was first created
+MIGRATED_COLUMNS = {
+    'bytes_read': 'INTEGER DEFAULT 0',
+    'bytes_total': 'INTEGER DEFAULT 0',
+    'mode': "TEXT DEFAULT 'full'",
+    'changes': 'TEXT',
+    'rows_rejected': 'INTEGER DEFAULT 0',
+    'rejected': 'TEXT',
+    'category': 'TEXT',
+    'pages_extracted': 'INTEGER DEFAULT 0',
+    'owner': 'TEXT'
+}
+
+UPLOAD_MODES = ('full', 'delta', 'validate')
+
+
+def process_alive(pid):
+    """Whether a process with this pid exists on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class UploadJobManager:
+    """Run CSV and document uploads on an in-process worker pool and track them in SQLite.
+    
+    PDF, text and zip uploads go through ``extractor`` (a ``DocumentExtractor``)
+    and then follow the same validation and insert path as CSV rows.
+    """
+
+    def __init__(self, mindsdb_handler, db_path='uploads/upload_jobs.db', workers=2, chunk_rows=500,
+                 validation_limits=None, extractor=None):
+        self.mindsdb_handler = mindsdb_handler
+        self.extractor = extractor
+        self.db_path = db_path
+        self.chunk_rows = chunk_rows
+        self.validation_limits = validation_limits or {}
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest')
+        self._lock = threading.Lock()
+        # Jobs record the process running them, so a restart only interrupts its own orphans
+        self.host = socket.gethostname()
+        self.owner = f"{self.host}:{os.getpid()}"
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        """Create the job table and mark jobs whose process has died as interrupted"""
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        with self._lock, self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS upload_jobs (
+    id TEXT PRIMARY KEY,
+    filename TEXT,
+    status TEXT,
+    rows_parsed INTEGER DEFAULT 0,
+    batches_sent INTEGER DEFAULT 0,
+    documents_embedded INTEGER DEFAULT 0,
+    failures INTEGER DEFAULT 0,
+    failed_rows TEXT DEFAULT '[]',
+    error TEXT,
+    created_at REAL,
+    started_at REAL,
+    finished_at REAL
+)""")
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(upload_jobs)")}
+            for column, definition in MIGRATED_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE upload_jobs ADD COLUMN {column} {definition}")
+            unfinished = conn.execute(
+                "SELECT id, owner FROM upload_jobs WHERE status IN ('queued', 'running')"
+            ).fetchall()
+            orphaned = [(time.time(), job_id) for job_id, owner in unfinished if self._orphaned(owner)]
+            conn.executemany(
+                "UPDATE upload_jobs SET status = 'interrupted', finished_at = ? WHERE id = ?", orphaned
+            )
+
+    def _orphaned(self, owner):
+        """Whether the process that owns a job is gone; jobs on other hosts are left alone"""
+        if not owner:
+            # Recorded before jobs had owners
+            return True
+        host, _, pid = owner.rpartition(':')
+        if host != self.host:
+            return False
+        return not process_alive(int(pid))
+
+    def _update(self, job_id, **fields):
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE upload_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def submit(self, filepath, filename, mode='full', category=None):
+        """Queue an uploaded CSV or document file for ingestion and return its job id.
+        
+        ``mode='delta'`` treats the upload as a full snapshot: only new and changed
+        rows are inserted and documents missing from it are deleted.
+        ``mode='validate'`` only validates the rows and reports rejections.
+        ``category`` applies to extracted documents outside an archive folder.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO upload_jobs (id, filename, status, created_at, mode, category, owner) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, filename, time.time(), mode, category, self.owner)
+            )
+        self.executor.submit(self._run, job_id, filepath, mode, filename, category)
+        logger.info(f"Queued upload job {job_id} for {filename}")
+        return job_id
+
+    def get(self, job_id):
+        """Return job progress, or None when the job id is unknown"""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM upload_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        job = dict(zip(JOB_COLUMNS, row))
+        job['failed_rows'] = json.loads(job['failed_rows'] or '[]')
+        job['changes'] = json.loads(job['changes']) if job['changes'] else None
+        job['rejected'] = json.loads(job['rejected']) if job['rejected'] else None
+
+        elapsed = None
+        if job['started_at']:
+            elapsed = (job['finished_at'] or time.time()) - job['started_at']
+        job['elapsed_seconds'] = round(elapsed, 2) if elapsed is not None else None
+        job['throughput_docs_per_sec'] = (
+            round(job['documents_embedded'] / elapsed, 2) if elapsed else 0.0
+        )
+        job['throughput_pages_per_sec'] = (
+            round(job['pages_extracted'] / elapsed, 2) if elapsed and job['pages_extracted'] else 0.0
+        )
+        # Total row count is unknown while streaming, so progress follows bytes read
+        if job['status'] == 'completed':
+            job['progress'] = 100.0
+        elif job['bytes_total']:
+            job['progress'] = round(100.0 * (job['bytes_read'] or 0) / job['bytes_total'], 1)
+        else:
+            job['progress'] = 0.0
+        return job
+
+    def _validator(self, documents=False):
+        """Validator seeded with the known category spellings; ``documents`` allows extracted doc_ids"""
+        categories = list(self.mindsdb_handler.DEFAULT_CATEGORIES)
+        category_index = self.mindsdb_handler.category_index
+        if category_index.ready:
+            categories.extend(category_index.snapshot()[0])
+        return DocumentValidator(categories, negative_ids=documents, **self.validation_limits)
+
+    def _chunks(self, filepath, filename, category=None):
+        """Yield ``(chunk, bytes_read, bytes_total, pages, rejected)`` for a CSV or document upload"""
+        if filename and is_document_upload(filename):
+            if self.extractor is None:
+                raise ValueError("Document uploads are not enabled")
+            yield from self.extractor.iter_chunks(filepath, filename, self.chunk_rows, category)
+            return
+        for chunk, bytes_read, bytes_total in iter_csv_chunks(filepath, self.chunk_rows):
+            yield chunk, bytes_read, bytes_total, 0, []
+
+    def _run(self, job_id, filepath, mode='full', filename=None, category=None):
+        """Worker entry point: stream the upload in chunks, validate each and insert it batch by batch"""
+        self._update(job_id, status='running', started_at=time.time())
+        progress = {'rows_parsed': 0, 'batches_sent': 0, 'documents_embedded': 0, 'failures': 0,
+                    'rows_rejected': 0, 'pages_extracted': 0}
+        failed_rows = []
+        manifest = self.mindsdb_handler.manifest
+        changes = {'inserted': [], 'updated': [], 'deleted': [], 'unchanged': 0}
+        seen_ids = set()
+        documents = bool(filename) and is_document_upload(filename)
+        validator = self._validator(documents)
+        rejections = RejectionReport()
+        accepted_ids = set()
+        # Batch counters as of the current insert_documents call
+        call_start = {}
+
+        def on_batch(batch_report):
+            if batch_report['batch'] == 1:
+                # A retried insert starts over at batch 1; drop the failed attempt's batches
+                progress.update(call_start)
+            progress['batches_sent'] += 1
+            progress['documents_embedded'] += batch_report['inserted']
+            progress['failures'] += batch_report['failed']
+            self._update(job_id, **progress)
+
+        try:
+            for chunk, bytes_read, bytes_total, pages, unreadable in self._chunks(filepath, filename, category):
+                row_offset = progress['rows_parsed']
+                progress['rows_parsed'] += len(chunk)
+                progress['pages_extracted'] += pages
+                if unreadable:
+                    rejections.add(unreadable)
+                    progress['rows_rejected'] = rejections.count
+                if mode == 'delta':
+                    # Rejected rows still count as present, so they are not deleted
+                    seen_ids.update(str(doc_id) for doc_id in coerce_ids(chunk['doc_id']).dropna())
+
+                # Rejected rows never reach an upstream call
+                sources = chunk['source'].tolist() if 'source' in chunk else None
+                chunk, rejected = validator.validate(chunk, row_offset=row_offset, seen_ids=accepted_ids)
+                if sources:
+                    # Extracted documents are identified by file, not CSV row
+                    for row in rejected:
+                        row['file'] = sources[row['row'] - 2 - row_offset]
+                if rejected:
+                    rejections.add(rejected)
+                    progress['rows_rejected'] = rejections.count
+                self._update(job_id, bytes_total=bytes_total, rejected=json.dumps(rejections.to_dict()), **progress)
+
+                if mode == 'validate':
+                    self._update(job_id, bytes_read=bytes_read)
+                    continue
+                if mode == 'delta':
+                    chunk, inserted_ids, updated_ids, unchanged = manifest.diff(chunk)
+                    changes['inserted'].extend(inserted_ids)
+                    changes['updated'].extend(updated_ids)
+                    changes['unchanged'] += unchanged
+
+                if len(chunk):
+                    call_start.update((key, progress[key]) for key in ('batches_sent', 'documents_embedded', 'failures'))
+                    report = self.mindsdb_handler.insert_documents(chunk, on_batch=on_batch)
+                    failed_rows.extend(report['failed_rows'])
+                self._update(job_id, bytes_read=bytes_read)
+
+            if mode == 'delta':
+                # A snapshot only covers its own kind of upload: CSV rows or extracted documents
+                deleted_ids = [doc_id for doc_id in manifest.missing_from(seen_ids)
+                               if is_extracted_id(doc_id) == documents]
+                self.mindsdb_handler.delete_documents(deleted_ids)
+                changes['deleted'] = deleted_ids
+
+            self._update(
+                job_id,
+                status='completed',
+                failed_rows=json.dumps(failed_rows, default=str),
+                changes=json.dumps(changes) if mode == 'delta' else None,
+                rejected=json.dumps(rejections.to_dict()),
+                finished_at=time.time()
+            )
+            logger.info(
+                f"Upload job {job_id} finished: {progress['documents_embedded']} inserted, "
+                f"{progress['failures']} failed, {progress['rows_rejected']} rejected"
+                + (f", {progress['pages_extracted']} pages extracted" if progress['pages_extracted'] else '')
+            )
+        except Exception as e:
+            logger.error(f"Upload job {job_id} failed: {e}")
+            self._update(job_id, status='failed', error=str(e), finished_at=time.time())
+        finally:
+            self.mindsdb_handler.lexical_index.save_if_dirty()
+            if os.path.exists(filepath):
+                os.remove(filepath)
@@ -0,0 +1,354 @@
+"""
+LegalEase AI local vector store: an offline search backend that works without MindsDB
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(vectors):
+    """L2-normalize vectors so a dot product is cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class IVFIndex:
+    """Inverted-file ANN index: k-means centroids, search only the closest lists"""
+
+    def __init__(self, nlist=256, nprobe=8, iterations=10, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = None
+        self.lists = []
+
+    def build(self, matrix, rows):
+        """Cluster ``matrix[rows]`` and assign each row to its nearest centroid"""
+        rows = np.asarray(rows)
+        data = matrix[rows]
+        nlist = max(1, min(self.nlist, len(rows)))
+        rng = np.random.default_rng(self.seed)
+        centroids = data[rng.choice(len(rows), nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignment = np.argmax(data @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = data[assignment == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = normalize_rows(centroids)
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.lists = [rows[assignment == cluster] for cluster in range(nlist)]
+
+    def candidates(self, query):
+        """Rows in the ``nprobe`` lists closest to the query"""
+        nprobe = min(self.nprobe, len(self.lists))
+        closest = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.lists[cluster] for cluster in closest])
+
+
+class HNSWIndex:
+    """Graph ANN index backed by the optional ``hnswlib`` package"""
+
+    def __init__(self, dim, ef=64, m=16):
+        import hnswlib  # optional dependency, only needed for this index type
+        self.index = hnswlib.Index(space='ip', dim=dim)
+        self.ef = ef
+        self.m = m
+
+    def build(self, matrix, rows):
+        rows = np.asarray(rows)
+        self.index.init_index(max_elements=max(1, len(rows)), ef_construction=200, M=self.m)
+        if len(rows):
+            self.index.add_items(matrix[rows], rows)
+        self.index.set_ef(self.ef)
+
+    def candidates(self, query, k=200):
+        count = self.index.get_current_count()
+        if not count:
+            return np.array([], dtype=np.int64)
+        labels, _ = self.index.knn_query(query, k=min(k, count))
+        return labels[0].astype(np.int64)
+
+
+class LocalVectorStore:
+    """Contiguous float32 vectors in a memory-mapped file with exact or ANN top-k search.
+
+    Rows are L2-normalized on insert so search is a single matrix-vector
+    product. Deleted rows are zeroed and their slots reused. ``index_type``
+    may be 'flat' (exact), 'ivf' or 'hnsw' (requires hnswlib); ANN indexes are
+    rebuilt lazily after writes and only used above ``ann_min_rows`` rows.
+
+    Several processes (e.g. gunicorn workers) may share one directory: writes
+    allocate slots under SQLite's write lock after reloading rows written
+    elsewhere, and bump a generation counter that readers check before
+    searching.
+    """
+
+    def __init__(self, directory='cache/vector_store', index_type='flat', ann_min_rows=20000,
+                 initial_capacity=1024):
+        self.directory = directory
+        self.index_type = index_type
+        self.ann_min_rows = ann_min_rows
+        self.initial_capacity = initial_capacity
+        self.dim = None
+        self.capacity = 0
+        self._matrix = None
+        self._ann = None
+        self._ann_stale = True
+        self._active = None  # (sorted occupied slots, their categories), rebuilt after writes
+        self._generation = None  # meta generation the in-memory rows reflect
+        self._lock = threading.RLock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, 'rows.db'), timeout=30, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS rows (
+    slot INTEGER PRIMARY KEY,
+    doc_id TEXT UNIQUE,
+    title TEXT,
+    category TEXT,
+    content TEXT
+)""")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+        with self._lock:
+            self._sync()
+
+    @property
+    def _matrix_path(self):
+        return os.path.join(self.directory, 'vectors.f32')
+
+    def _map(self, dim, capacity):
+        """Map (and grow if needed) the vector file to ``capacity`` rows"""
+        size = capacity * dim * np.dtype(np.float32).itemsize
+        with open(self._matrix_path, 'ab') as handle:
+            if handle.tell() < size:
+                handle.truncate(size)
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode='r+', shape=(capacity, dim))
+        self.dim = dim
+        self.capacity = capacity
+
+    def _sync(self):
+        """Reload rows (and remap a grown file) when another process wrote since we last looked"""
+        meta = dict(self._db.execute("SELECT name, value FROM meta").fetchall())
+        generation = int(meta.get('generation', 0))
+        if generation == self._generation:
+            return
+        if 'dim' in meta and (self._matrix is None or int(meta['capacity']) != self.capacity):
+            self._map(int(meta['dim']), int(meta['capacity']))
+        self._load_rows()
+        self._generation = generation
+
+    @contextmanager
+    def _write(self):
+        """Hold SQLite's write lock across processes for one batch of changes; caller holds _lock"""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._sync()
+            yield
+            if self._matrix is not None:
+                self._matrix.flush()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                [('dim', str(self.dim)), ('capacity', str(self.capacity)), ('generation', str(self._generation + 1))]
+            )
+            self._db.commit()
+            self._generation += 1
+        except Exception:
+            self._db.rollback()
+            # In-memory rows may be ahead of the database now
+            self._generation = None
+            raise
+
+    def _load_rows(self):
+        self._slots = dict(self._db.execute("SELECT doc_id, slot FROM rows").fetchall())
+        self._doc_ids = {slot: doc_id for doc_id, slot in self._slots.items()}
+        self._categories = {
+            slot: category for slot, category in self._db.execute("SELECT slot, category FROM rows")
+        }
+        used = set(self._doc_ids)
+        self._free = [slot for slot in range(self.capacity - 1, -1, -1) if slot not in used]
+        self._ann_stale = True
+        self._active = None
+
+    def __len__(self):
+        with self._lock:
+            self._sync()
+            return len(self._slots)
+
+    def _allocate(self):
+        if not self._free:
+            old_capacity = self.capacity
+            self._matrix.flush()
+            self._map(self.dim, max(self.initial_capacity, old_capacity * 2))
+            self._free = list(range(old_capacity, self.capacity))
+        return self._free.pop()
+
+    def add(self, doc_ids, vectors, documents):
+        """Insert or replace vectors; ``documents`` holds title/category/content dicts"""
+        vectors = normalize_rows(vectors)
+        with self._lock, self._write():
+            if self._matrix is None:
+                self._map(vectors.shape[1], self.initial_capacity)
+                self._free = list(range(self.capacity - 1, -1, -1))
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match store dimension {self.dim}")
+
+            rows = []
+            for doc_id, vector, document in zip(doc_ids, vectors, documents):
+                doc_id = str(doc_id)
+                slot = self._slots.get(doc_id)
+                if slot is None:
+                    slot = self._allocate()
+                self._matrix[slot] = vector
+                self._slots[doc_id] = slot
+                self._doc_ids[slot] = doc_id
+                self._categories[slot] = document.get('category')
+                rows.append((slot, doc_id, document.get('title'), document.get('category'), document.get('content')))
+
+            self._db.executemany(
+                "INSERT OR REPLACE INTO rows (slot, doc_id, title, category, content) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._ann_stale = True
+            self._active = None
+
+    def remove(self, doc_ids):
+        """Delete vectors by doc_id"""
+        with self._lock, self._write():
+            for doc_id in doc_ids:
+                slot = self._slots.pop(str(doc_id), None)
+                if slot is None:
+                    continue
+                self._matrix[slot] = 0.0
+                self._doc_ids.pop(slot, None)
+                self._categories.pop(slot, None)
+                self._free.append(slot)
+                self._db.execute("DELETE FROM rows WHERE slot = ?", (slot,))
+            self._ann_stale = True
+            self._active = None
+
+    def _candidate_rows(self, query):
+        """Rows worth scoring: everything, or the ANN index's candidates on large stores"""
+        if self.index_type == 'flat' or len(self._slots) < self.ann_min_rows:
+            return None
+        if self._ann is None or self._ann_stale:
+            rows = sorted(self._doc_ids)
+            try:
+                self._ann = HNSWIndex(self.dim) if self.index_type == 'hnsw' else IVFIndex()
+            except ImportError:
+                logger.warning("hnswlib is not installed, using the IVF index instead")
+                self.index_type = 'ivf'
+                self._ann = IVFIndex()
+            self._ann.build(self._matrix, rows)
+            self._ann_stale = False
+        return self._ann.candidates(query)
+
+    def _active_rows(self):
+        if self._active is None:
+            slots = np.array(sorted(self._doc_ids), dtype=np.int64)
+            categories = np.array([self._categories.get(int(slot)) for slot in slots], dtype=object)
+            self._active = (slots, categories)
+        return self._active
+
+    def search(self, vector, limit=5, category=None, doc_ids=None):
+        """Return ``[(doc_id, cosine), ...]`` for the nearest stored vectors"""
+        query = normalize_rows(vector)
+        with self._lock:
+            self._sync()
+            if self._matrix is None or not self._slots:
+                return []
+
+            if doc_ids is not None:
+                rows = np.array([self._slots[str(d)] for d in doc_ids if str(d) in self._slots], dtype=np.int64)
+            else:
+                rows = self._candidate_rows(query)
+
+            if rows is None:
+                # Exact search: one pass over the contiguous matrix, no row gather
+                slots, categories = self._active_rows()
+                rows = slots[categories == category] if category else slots
+                if not len(rows):
+                    return []
+                scores = (self._matrix @ query)[rows]
+            else:
+                if category:
+                    rows = rows[np.array([self._categories.get(int(row)) == category for row in rows], dtype=bool)]
+                if not len(rows):
+                    return []
+                scores = self._matrix[rows] @ query
+
+            k = min(limit, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._doc_ids[int(rows[i])], float(scores[i])) for i in top]
+
+    def documents(self, doc_ids):
+        """Return stored title/category/content for doc_ids"""
+        doc_ids = [str(doc_id) for doc_id in doc_ids]
+        if not doc_ids:
+            return {}
+        placeholders = ', '.join('?' for _ in doc_ids)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT doc_id, title, category, content FROM rows WHERE doc_id IN ({placeholders})", doc_ids
+            ).fetchall()
+        return {doc_id: {'title': title, 'category': category, 'content': content}
+                for doc_id, title, category, content in rows}
+
+    def stats(self):
+        with self._lock:
+            self._sync()
+        return {
+            'documents': len(self._slots),
+            'dim': self.dim,
+            'capacity': self.capacity,
+            'index_type': self.index_type
+        }
+
+
+class LocalSearchBackend:
+    """Semantic search over the local vector store, same result format as MindsDBHandler"""
+
+    def __init__(self, store, embedder):
+        self.store = store
+        self.embedder = embedder
+
+    def add_documents(self, df):
+        """Embed (through the embedding cache) and store documents"""
+        if not len(df):
+            return
+        contents = [str(content) for content in df['content']]
+        vectors = self.embedder.embed(contents)
+        documents = [
+            {'title': str(title), 'category': str(category), 'content': content}
+            for title, category, content in zip(df['title'], df['category'], contents)
+        ]
+        self.store.add(list(df['doc_id']), np.vstack(vectors), documents)
+
+    def remove_documents(self, doc_ids):
+        self.store.remove(doc_ids)
+
+    def semantic_search(self, query, category=None, limit=5, doc_ids=None):
+        vector = self.embedder.embed([query])[0]
+        ranked = self.store.search(vector, limit, category or None, doc_ids)
+        documents = self.store.documents([doc_id for doc_id, _ in ranked])
+        results = []
+        for doc_id, score in ranked:
+            document = documents.get(doc_id, {})
+            results.append({
+                'id': doc_id,
+                'content': document.get('content', ''),
+                'relevance': score,
+                'metadata': json.dumps({'title': document.get('title'), 'category': document.get('category')})
+            })
+        return results